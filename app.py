@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+# STARTUP_PROFILE=1 のときだけ import・初期化の所要時間を計測して起動完了時にログへ出す（無効時は何もしない）
+# この後の import・初期化が例外になった場合は、次の import の呼び出し時にフックを外す（owner）
+from lib.startup_profiler import startup_profiler
+startup_profiler.start(owner=__name__)
+
 import os
 import uuid
 import threading
@@ -10,15 +15,22 @@ import psutil
 import time
 import logging
 import hashlib
+import hmac
+import atexit
+import itertools
 import re
 import json
 import io
+import mimetypes
+from collections import OrderedDict
 from datetime import datetime
 from flask import Flask, request, jsonify, render_template, send_file, Response, redirect, g, has_request_context
 from werkzeug.exceptions import NotFound, MethodNotAllowed
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-from utils import allowed_file, create_template_excel, create_previous_month_template_excel
+from utils import allowed_file, create_template_excel, create_previous_month_template_excel, create_job_log_buffer
+from lib.job_log_buffer import JobLogBuffer, records_to_jsonl, select_logs_since
+startup_profiler.checkpoint('imports.core')
 from lib.seo import (
     build_breadcrumb_items,
     get_article_schema,
@@ -31,9 +43,15 @@ from lib.seo import (
 from lib.amazon_creators import (
     build_lightweight_amazon_sections,
     build_rotating_theme_cards as build_amazon_rotating_theme_cards,
+    current_rotation_bucket as current_amazon_rotation_bucket,
+    describe_circuit_breaker as describe_amazon_circuit_breaker,
+    describe_search_cache as describe_amazon_search_cache,
     get_recommendations as get_amazon_recommendations,
+    sweep_search_cache as sweep_amazon_search_cache,
+    warm_recommendation_cache as warm_amazon_recommendation_cache,
 )
 from lib.a8_affiliate_map import build_a8_lightweight_sections
+startup_profiler.checkpoint('imports.seo_affiliate_maps')
 
 # P1-1: 計測ログユーティリティ（循環import回避）
 try:
@@ -67,9 +85,28 @@ MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "10"))
 PDF_LOCK_MAX_FILE_SIZE_MB = int(os.getenv("PDF_LOCK_MAX_FILE_SIZE_MB", "20"))
 # Jobcan AutoFill uses Playwright/Chrome, so the safe default is one active run.
 # Local/dev can still override this with MAX_ACTIVE_SESSIONS when needed.
-MAX_ACTIVE_SESSIONS = int(os.getenv("MAX_ACTIVE_SESSIONS", "1"))
+# ADAPTIVE_ADMISSION=1（既定）では実測メモリから枠数を自動調整し、MAX_ACTIVE_SESSIONS はその上限になる
+# （未設定時の上限は ADMISSION_MAX_SLOTS）。既定の MEMORY_LIMIT_MB では実測しても 1 枠に収まる。
+ADAPTIVE_ADMISSION_ENABLED = os.getenv("ADAPTIVE_ADMISSION", "1").lower() not in ("0", "false", "no")
+MAX_ACTIVE_SESSIONS = int(os.getenv(
+    "MAX_ACTIVE_SESSIONS",
+    os.getenv("ADMISSION_MAX_SLOTS", "4") if ADAPTIVE_ADMISSION_ENABLED else "1",
+))
+# 1 ジョブ（Chromium 含む）の初期見積もりと、ワーカー用に残しておく余白
+ADMISSION_DEFAULT_JOB_MB = float(os.getenv("ADMISSION_DEFAULT_JOB_MB", "300"))
+ADMISSION_RESERVE_MB = float(os.getenv("ADMISSION_RESERVE_MB", "50"))
+ADMISSION_SAMPLE_INTERVAL_SEC = float(os.getenv("ADMISSION_SAMPLE_INTERVAL_SEC", "5"))
 # ジョブ全体のハードタイムアウト（秒）。超過でstatus=timeoutに遷移
 JOB_TIMEOUT_SEC = int(os.getenv("JOB_TIMEOUT_SEC", "300"))  # 5分
+# AutoFill の実行方式。thread（既定）: ワーカー内スレッド / process: 事前起動した子プロセスで 1 ジョブずつ実行
+AUTOMATION_EXECUTOR = os.getenv("AUTOMATION_EXECUTOR", "thread").strip().lower()
+# process 時: 子プロセスツリー（Chromium 含む）の RSS 上限。超過で強制終了（0 で MEMORY_LIMIT_MB）
+JOB_PROCESS_MEMORY_CAP_MB = int(os.getenv("JOB_PROCESS_MEMORY_CAP_MB", "0")) or MEMORY_LIMIT_MB
+# process 時: 子プロセス自身の RLIMIT_AS（MB）。Chromium は大きな仮想領域を予約するため既定は無効
+JOB_PROCESS_RLIMIT_AS_MB = int(os.getenv("JOB_PROCESS_RLIMIT_AS_MB", "0"))
+# process 時: JOB_TIMEOUT_SEC 超過後、協調タイムアウトを待ってから kill するまでの猶予
+JOB_PROCESS_KILL_GRACE_SEC = float(os.getenv("JOB_PROCESS_KILL_GRACE_SEC", "10"))
+JOB_PROCESS_PREWARM = int(os.getenv("JOB_PROCESS_PREWARM", "1"))
 
 app = Flask(__name__)
 
@@ -177,7 +214,9 @@ def validate_startup():
         logger.info("startup_validation_passed all checks OK")
 
 # 起動時に検証を実行
+startup_profiler.checkpoint('app_init')
 validate_startup()
+startup_profiler.checkpoint('validate_startup')
 
 # アップロードフォルダの設定
 UPLOAD_FOLDER = 'uploads'
@@ -186,8 +225,9 @@ if not os.path.exists(UPLOAD_FOLDER):
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-# === Phase 5: インメモリレート制限（固定窓） ===
-from collections import deque as _deque
+# === Phase 5: レート制限（GCRA。キーごとに float 1 つ・ストライプ単位のロック・アイドルキー削除） ===
+# RATE_LIMIT_BACKEND=sqlite で同一ホストの全ワーカーが 1 つの上限を共有する（既定はワーカーごと）
+from lib.rate_limit import create_rate_limiter
 
 def _rate_limit_path_group(path, method):
     """path と method からレート制限グループを返す。除外なら None。"""
@@ -205,29 +245,15 @@ def _rate_limit_path_group(path, method):
         return 'api'
     return None
 
-class RateLimiter:
-    """固定窓: (key -> deque of timestamps)。窓秒を超えた古いものを捨ててから件数判定。"""
-    def __init__(self, window_sec=60):
-        self.window_sec = window_sec
-        self._data = {}
-        self._lock = threading.Lock()
-
-    def is_allowed(self, key, max_per_window):
-        with self._lock:
-            now = time.time()
-            if key not in self._data:
-                self._data[key] = _deque(maxlen=max_per_window * 2)
-            q = self._data[key]
-            while q and now - q[0] > self.window_sec:
-                q.popleft()
-            if len(q) >= max_per_window:
-                return False, self.window_sec
-            q.append(now)
-            return True, self.window_sec
-
 # 制限値（弱めから）: upload 10/min, status 120/min, api 60/min
 _RATE_LIMITS = {'upload': 10, 'status': 120, 'api': 60}
-_rate_limiter = RateLimiter(window_sec=60)
+RATE_LIMIT_STRIPES = int(os.getenv("RATE_LIMIT_STRIPES", "16"))
+RATE_LIMIT_MAX_KEYS_PER_STRIPE = int(os.getenv("RATE_LIMIT_MAX_KEYS_PER_STRIPE", "8192"))
+_rate_limiter = create_rate_limiter(
+    window_sec=60,
+    stripes=RATE_LIMIT_STRIPES,
+    max_keys_per_stripe=RATE_LIMIT_MAX_KEYS_PER_STRIPE,
+)
 
 @app.before_request
 def rate_limit_check():
@@ -240,31 +266,23 @@ def rate_limit_check():
     client_ip = request.remote_addr or 'unknown'
     key = f"{client_ip}:{group}"
     max_per = _RATE_LIMITS.get(group, 60)
-    allowed, window_sec = _rate_limiter.is_allowed(key, max_per)
+    allowed, retry_after_sec = _rate_limiter.is_allowed(key, max_per)
     if not allowed:
         resp = jsonify(
             error='リクエストが多すぎます。しばらく待ってからお試しください。',
             error_code='RATE_LIMIT_EXCEEDED',
-            retry_after_sec=window_sec
+            retry_after_sec=retry_after_sec
         )
         resp.status_code = 429
-        resp.headers['Retry-After'] = str(int(window_sec))
+        resp.headers['Retry-After'] = str(int(retry_after_sec))
+        RATE_LIMIT_REJECTIONS.inc(group)
         return resp
     return None
 
 # === リクエストロギングミドルウェア ===
-# P1: prune_jobs実行頻度制御（メモリ最適化）
-_last_prune_time = 0
-PRUNE_INTERVAL_SECONDS = 300  # 5分ごとにprune_jobsを実行
-# get_status 内での prune 間引き（ポーリング負荷軽減）
-_last_status_prune_time = 0
-STATUS_PRUNE_INTERVAL_SEC = 30  # 30秒に1回まで
-
 @app.before_request
 def before_request():
     """リクエスト開始時の処理"""
-    global _last_prune_time
-    
     g.start_time = time.time()
     g.request_id = request.headers.get('X-Request-ID', str(uuid.uuid4())[:8])
 
@@ -275,18 +293,10 @@ def before_request():
     if redirect_target:
         return redirect(redirect_target, code=301)
     
-    # P1: 定期的にprune_jobsを実行（メモリ最適化）
-    # ヘルスチェックや静的ファイルリクエストは除外
-    if not request.path.startswith(('/healthz', '/livez', '/readyz', '/static')):
-        current_time = time.time()
-        if current_time - _last_prune_time >= PRUNE_INTERVAL_SECONDS:
-            try:
-                prune_jobs(current_time=current_time)
-                _last_prune_time = current_time
-            except Exception as prune_error:
-                # prune_jobsのエラーはログに記録するが、リクエスト処理は続行
-                logger.warning(f"prune_jobs_error in before_request: {prune_error}")
-    
+    # prune_jobs 等はメンテナンススレッドで実行する。ここでは生存確認だけ（落ちていれば再起動）
+    maintenance_runner.ensure_running()
+    resource_sampler_runner.ensure_running()
+
     # ヘルスチェック以外のリクエストをログ（Phase 5: ua/ref 追加、200文字で切る）
     if not request.path.startswith(('/healthz', '/livez', '/readyz')):
         ua = (request.headers.get('User-Agent') or '')[:200]
@@ -301,6 +311,9 @@ def after_request(response):
     """リクエスト終了時の処理"""
     if hasattr(g, 'start_time') and hasattr(g, 'request_id'):
         duration_ms = (time.time() - g.start_time) * 1000
+        # ラベルは URL ではなくルートのテンプレート（/status/<job_id> 等）にして種類を抑える
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_LATENCY.observe(duration_ms / 1000, route, request.method, response.status_code)
         response.headers['X-Request-ID'] = g.request_id
         deploy_commit = (os.getenv('RENDER_GIT_COMMIT') or os.getenv('GIT_COMMIT') or '').strip()
         if deploy_commit:
@@ -319,8 +332,8 @@ def after_request(response):
             if duration_ms > 5000:
                 logger.warning(f"SLOW_REQUEST rid={g.request_id} path={request.path} ms={duration_ms:.1f}")
     
-    # キャッシュ対策: text/html のみ no-store（静的ファイルには適用しない）
-    if not request.path.startswith('/static/'):
+    # キャッシュ対策: text/html のみ no-store（静的ファイルと、ETag で再検証させるページキャッシュ応答は除く）
+    if not request.path.startswith('/static/') and not getattr(g, 'page_cache_served', False):
         ct = response.content_type or ''
         if 'text/html' in ct:
             response.headers['Cache-Control'] = 'no-store, max-age=0'
@@ -491,6 +504,55 @@ def _env_list(name, default=None):
     return [item.strip() for item in value.split(',') if item.strip()]
 
 
+# フィンガープリント付き静的ファイル（scripts/build_static_assets.py の出力）。
+# マニフェストがあれば url_for('static') をハッシュ付きの名前にし、immutable で配信する
+from lib.page_cache import choose_encoding
+from lib.static_assets import IMMUTABLE_MAX_AGE, StaticAssetManifest
+
+STATIC_ASSETS_BUILD_DIR = os.getenv(
+    'STATIC_ASSETS_BUILD_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build', 'static'),
+)
+static_manifest = StaticAssetManifest.load(STATIC_ASSETS_BUILD_DIR) if _env_flag('STATIC_ASSETS_FINGERPRINT', True) else None
+if static_manifest is not None:
+    logger.info("static_manifest_loaded files=%s dir=%s", len(static_manifest), STATIC_ASSETS_BUILD_DIR)
+
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    if endpoint != 'static' or static_manifest is None:
+        return
+    filename = values.get('filename')
+    hashed = static_manifest.hashed_filename(filename) if filename else None
+    if hashed:
+        values['filename'] = hashed
+
+
+def serve_static_asset(filename):
+    """ハッシュ付きの名前なら圧縮済みファイルを immutable で返す。それ以外は Flask 既定の static 配信。"""
+    resolved = static_manifest.resolve(filename) if static_manifest is not None else None
+    if resolved is None:
+        return app.send_static_file(filename)
+    source_name, encodings = resolved
+    encoding = choose_encoding(request.accept_encodings, encodings)
+    mimetype = mimetypes.guess_type(source_name)[0] or 'application/octet-stream'
+    response = send_file(
+        static_manifest.file_path(filename, encoding),
+        mimetype=mimetype,
+        conditional=True,
+        max_age=IMMUTABLE_MAX_AGE,
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if encodings:
+        response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
+
+
+app.view_functions['static'] = serve_static_asset
+
+
 def _normalize_affiliate_network(value):
     normalized = (value or 'rakuten').strip().lower()
     if normalized in ('rakuten', 'rakuten_widget'):
@@ -952,70 +1014,203 @@ def persist_affiliate_history_cookie(response):
     return response
 
 
+def _read_app_version():
+    try:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'package.json'), 'r', encoding='utf-8') as f:
+            return json.load(f).get('version', '1.0.0')
+    except Exception:
+        return '1.0.0'
+
+
+# package.json はデプロイ単位で不変なので起動時に 1 回だけ読む
+APP_VERSION = _read_app_version()
+
+# テンプレートコンテキストのうちパスと環境変数だけで決まる部分（静的部分）のキャッシュ。
+# キーは (path, 環境変数の世代)。Cookie 由来の閲覧履歴・Amazon 枠・ローテーション枠は毎リクエスト作る。
+TEMPLATE_CONTEXT_CACHE_MAX_PATHS = int(os.getenv('TEMPLATE_CONTEXT_CACHE_MAX_PATHS', '256'))
+_TEMPLATE_CONTEXT_ENV_KEYS = (
+    'BASE_URL',
+    'ADSENSE_ENABLED',
+    'GA_MEASUREMENT_ID',
+    'GSC_VERIFICATION_CONTENT',
+    'OPERATOR_NAME',
+    'OPERATOR_EMAIL',
+    'OPERATOR_LOCATION',
+    'OPERATOR_NOTE',
+    'AFFILIATE_ENABLED',
+    'AFFILIATE_TEXTLINKS_ENABLED',
+    'AFFILIATE_BANNERS_ENABLED',
+    'AFFILIATE_STACK_ONLY',
+    'AFFILIATE_NETWORK',
+    'AFFILIATE_EXCLUDE_PATHS',
+    'AFFILIATE_ALLOWED_PAGE_TYPES',
+    'AFFILIATE_WIDGET_DESKTOP_ENABLED',
+    'AFFILIATE_WIDGET_TABLET_ENABLED',
+    'AFFILIATE_WIDGET_MOBILE_ENABLED',
+    'AFFILIATE_ROTATION_BANNER_ENABLED',
+)
+_template_context_cache = OrderedDict()
+_template_context_cache_lock = threading.Lock()
+_template_context_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def _template_context_env_generation():
+    """静的部分に影響する環境変数の現在値（変わればキャッシュキーも変わる）。"""
+    return tuple(os.environ.get(name) for name in _TEMPLATE_CONTEXT_ENV_KEYS)
+
+
+def clear_template_context_cache():
+    """静的コンテキストのキャッシュを捨てる（products_catalog や SEO 定義を差し替えたとき用）。"""
+    with _template_context_cache_lock:
+        _template_context_cache.clear()
+
+
+def describe_template_context_cache():
+    with _template_context_cache_lock:
+        return {
+            'paths': len(_template_context_cache),
+            'max_paths': TEMPLATE_CONTEXT_CACHE_MAX_PATHS,
+            **_template_context_cache_stats,
+        }
+
+
+def _build_static_template_context(current_path):
+    """パスと環境変数だけで決まるテンプレートコンテキスト。"""
+    from lib.products_catalog import PRODUCTS
+    from lib.nav import get_nav_sections, get_footer_columns
+
+    affiliate_settings = get_affiliate_settings()
+    affiliate_page_type = get_affiliate_page_type(current_path)
+    seo_defaults = get_seo_defaults(current_path)
+    base_url = os.getenv('BASE_URL', 'https://jobcan-automation.onrender.com').rstrip('/')
+    seo_page_description = seo_defaults.get('description', '')
+    web_application_schema = get_web_application_schema(
+        current_path,
+        seo_defaults.get('title', ''),
+        seo_page_description,
+        base_url,
+    )
+    article_schema = get_article_schema(
+        current_path,
+        base_url,
+        seo_defaults.get('title', ''),
+        seo_page_description,
+    )
+    seo_breadcrumb_items = build_breadcrumb_items(
+        current_path,
+        page_title='',
+        breadcrumb_title=seo_defaults.get('breadcrumb_title', ''),
+    )
+
+    products_list = _simplified_products(PRODUCTS)
+    if not isinstance(products_list, list):
+        logger.warning(
+            f"context_processor products_catalog not a list type={type(products_list).__name__} - using []"
+        )
+        products_list = []
+    products_catalog = [p for p in products_list if isinstance(p, dict) and p.get('status') == 'available']
+    adsense_enabled = os.getenv('ADSENSE_ENABLED', 'false').lower() == 'true'
+
+    return {
+        'ADSENSE_ENABLED': adsense_enabled,
+        'ADSENSE_ALLOWED': adsense_enabled and current_path in ADSENSE_ALLOWED_PATHS and not is_noindex_path(current_path),
+        'app_version': APP_VERSION,
+        'products': products_list,
+        'products_catalog': products_catalog,
+        'nav_sections': get_nav_sections(),
+        'footer_columns': get_footer_columns(),
+        'BASE_URL': base_url,
+        'GA_MEASUREMENT_ID': os.getenv('GA_MEASUREMENT_ID', ''),
+        'GSC_VERIFICATION_CONTENT': os.getenv('GSC_VERIFICATION_CONTENT', ''),
+        'OPERATOR_NAME': os.getenv('OPERATOR_NAME', ''),
+        'OPERATOR_EMAIL': os.getenv('OPERATOR_EMAIL', ''),
+        'OPERATOR_LOCATION': os.getenv('OPERATOR_LOCATION', ''),
+        'OPERATOR_NOTE': os.getenv('OPERATOR_NOTE', ''),
+        'seo_page_defaults': seo_defaults,
+        'seo_page_description': seo_page_description,
+        'seo_page_robots': seo_defaults.get('robots', 'index,follow'),
+        'seo_page_kind': get_page_kind(current_path),
+        'seo_breadcrumb_items': seo_breadcrumb_items,
+        'seo_web_application_schema': web_application_schema,
+        'seo_article_schema': article_schema,
+        'build_breadcrumb_items': build_breadcrumb_items,
+        'split_visible_sentences': split_visible_sentences,
+        'related_content_section': get_related_content(current_path),
+        'blog_articles': [],
+        'AFFILIATE_ENABLED': affiliate_settings['enabled'],
+        'AFFILIATE_TEXTLINKS_ENABLED': affiliate_settings['textlinks_enabled'],
+        'AFFILIATE_BANNERS_ENABLED': affiliate_settings['banners_enabled'],
+        'AFFILIATE_STACK_ONLY': affiliate_settings['stack_only'],
+        'AFFILIATE_NETWORK': affiliate_settings['network'],
+        'AFFILIATE_EXCLUDE_PATHS': affiliate_settings['exclude_paths'],
+        'AFFILIATE_ALLOWED_PAGE_TYPES': affiliate_settings['allowed_page_types'],
+        'AFFILIATE_WIDGET_DESKTOP_ENABLED': affiliate_settings['widget_desktop_enabled'],
+        'AFFILIATE_WIDGET_TABLET_ENABLED': affiliate_settings['widget_tablet_enabled'],
+        'AFFILIATE_WIDGET_MOBILE_ENABLED': affiliate_settings['widget_mobile_enabled'],
+        'AFFILIATE_ROTATION_BANNER_ENABLED': affiliate_settings['rotation_banner_enabled'],
+        'affiliate_page_type': affiliate_page_type,
+        'affiliate_path_excluded': affiliate_is_path_excluded(current_path),
+        'affiliate_top_slot_id': affiliate_top_slot_id(current_path),
+        'affiliate_top_slot_mode': affiliate_top_slot_mode(current_path),
+        'affiliate_footer_slot_id': affiliate_footer_slot_id(current_path),
+        'affiliate_side_rail_enabled': affiliate_side_rail_enabled(current_path),
+        'affiliate_can_render_textlinks': affiliate_can_render_textlinks,
+        'affiliate_can_render_slot': affiliate_can_render_slot,
+        'affiliate_get_slot_config': affiliate_get_slot_config,
+        # 動的部分（Amazon 枠のタグ）の入力。テンプレートからは使わない
+        '_amazon_tags': _build_affiliate_page_tags(current_path, seo_defaults, products_list),
+    }
+
+
+def get_static_template_context(current_path):
+    """静的コンテキストを (path, 環境変数の世代) 単位でメモ化して返す（呼び出し側で書き換えないこと）。"""
+    key = (current_path, _template_context_env_generation())
+    with _template_context_cache_lock:
+        cached = _template_context_cache.get(key)
+        if cached is not None:
+            _template_context_cache.move_to_end(key)
+            _template_context_cache_stats['hits'] += 1
+            return cached
+        _template_context_cache_stats['misses'] += 1
+    # 組み立てはロック外（同じパスを同時に組み立てても結果は同じなので後勝ちでよい）
+    context = _build_static_template_context(current_path)
+    with _template_context_cache_lock:
+        _template_context_cache[key] = context
+        _template_context_cache.move_to_end(key)
+        while len(_template_context_cache) > max(1, TEMPLATE_CONTEXT_CACHE_MAX_PATHS):
+            _template_context_cache.popitem(last=False)
+            _template_context_cache_stats['evictions'] += 1
+    return context
+
+
 # 環境変数をテンプレートコンテキストに注入（AdSense / Affiliate 設定用）
 @app.context_processor
 def inject_env_vars():
-    """環境変数をテンプレートで使えるようにする。製品一覧は products_catalog から取得（外部依存なし）。"""
-    try:
-        import json
-        from lib.products_catalog import PRODUCTS
-
-        app_version = '1.0.0'
-        try:
-            with open('package.json', 'r', encoding='utf-8') as f:
-                package_data = json.load(f)
-                app_version = package_data.get('version', '1.0.0')
-        except Exception:
-            pass
+    """環境変数をテンプレートで使えるようにする。製品一覧は products_catalog から取得（外部依存なし）。
 
-        affiliate_settings = get_affiliate_settings()
+    パス単位で不変な部分は get_static_template_context() のキャッシュを使い、
+    Cookie の閲覧履歴に依存する Amazon 枠とローテーション枠だけを毎回組み立てる。
+    """
+    try:
         current_path = request.path if has_request_context() else '/'
-        affiliate_page_type = get_affiliate_page_type(current_path)
-        recent_affiliate_history = _load_recent_affiliate_history()
-        seo_defaults = get_seo_defaults(current_path)
-        base_url = os.getenv('BASE_URL', 'https://jobcan-automation.onrender.com').rstrip('/')
-        seo_page_description = seo_defaults.get('description', '')
-        seo_page_robots = seo_defaults.get('robots', 'index,follow')
-        seo_page_kind = get_page_kind(current_path)
-        web_application_schema = get_web_application_schema(
-            current_path,
-            seo_defaults.get('title', ''),
-            seo_page_description,
-            base_url,
-        )
-        article_schema = get_article_schema(
-            current_path,
-            base_url,
-            seo_defaults.get('title', ''),
-            seo_page_description,
-        )
-        seo_breadcrumb_items = build_breadcrumb_items(
-            current_path,
-            page_title='',
-            breadcrumb_title=seo_defaults.get('breadcrumb_title', ''),
-        )
-        related_content_section = get_related_content(current_path)
-        blog_articles = []
+        static_context = get_static_template_context(current_path)
+        context = dict(static_context)
+        amazon_tags = context.pop('_amazon_tags')
+        affiliate_page_type = static_context['affiliate_page_type']
+        page_title = static_context['seo_page_defaults'].get('title', '')
 
-        products_list = _simplified_products(PRODUCTS)
-        if not isinstance(products_list, list):
-            logger.warning(
-                f"context_processor products_catalog not a list type={type(products_list).__name__} - using []"
-            )
-            products_list = []
-        products_catalog = [p for p in products_list if isinstance(p, dict) and p.get('status') == 'available']
-        amazon_tags = _build_affiliate_page_tags(current_path, seo_defaults, products_list)
+        recent_affiliate_history = _load_recent_affiliate_history()
         amazon_affiliate = _safe_get_amazon_affiliate(
             path=current_path,
             page_type=affiliate_page_type,
-            title=seo_defaults.get('title', ''),
+            title=page_title,
             tags=amazon_tags,
             recent_history=recent_affiliate_history,
         )
         amazon_affiliate_upper_items = build_amazon_rotating_theme_cards(
             path=current_path,
             page_type=affiliate_page_type,
-            title=seo_defaults.get('title', ''),
+            title=page_title,
             tags=amazon_tags,
             recent_history=recent_affiliate_history,
             slot_id='upper-amazon',
@@ -1029,13 +1224,14 @@ def inject_env_vars():
         amazon_affiliate_mid_items = build_amazon_rotating_theme_cards(
             path=current_path,
             page_type=affiliate_page_type,
-            title=seo_defaults.get('title', ''),
+            title=page_title,
             tags=amazon_tags,
             recent_history=recent_affiliate_history,
             slot_id='mid-amazon',
             count=3,
             exclude_theme_ids=upper_theme_ids,
         )
+        # ローテーション（日替わり等）と A8 の承認済みリンク設定に依存するため毎回作る
         amazon_lightweight_sections = build_lightweight_amazon_sections(
             path=current_path,
             page_type=affiliate_page_type,
@@ -1048,47 +1244,7 @@ def inject_env_vars():
             history=recent_affiliate_history,
         )
 
-        from lib.nav import get_nav_sections, get_footer_columns
-        nav_sections = get_nav_sections()
-        footer_columns = get_footer_columns()
-
-        return {
-            'ADSENSE_ENABLED': os.getenv('ADSENSE_ENABLED', 'false').lower() == 'true',
-            'ADSENSE_ALLOWED': (os.getenv('ADSENSE_ENABLED', 'false').lower() == 'true') and current_path in ADSENSE_ALLOWED_PATHS and not is_noindex_path(current_path),
-            'app_version': app_version,
-            'products': products_list,
-            'products_catalog': products_catalog,
-            'nav_sections': nav_sections,
-            'footer_columns': footer_columns,
-            'BASE_URL': base_url,
-            'GA_MEASUREMENT_ID': os.getenv('GA_MEASUREMENT_ID', ''),
-            'GSC_VERIFICATION_CONTENT': os.getenv('GSC_VERIFICATION_CONTENT', ''),
-            'OPERATOR_NAME': os.getenv('OPERATOR_NAME', ''),
-            'OPERATOR_EMAIL': os.getenv('OPERATOR_EMAIL', ''),
-            'OPERATOR_LOCATION': os.getenv('OPERATOR_LOCATION', ''),
-            'OPERATOR_NOTE': os.getenv('OPERATOR_NOTE', ''),
-            'seo_page_defaults': seo_defaults,
-            'seo_page_description': seo_page_description,
-            'seo_page_robots': seo_page_robots,
-            'seo_page_kind': seo_page_kind,
-            'seo_breadcrumb_items': seo_breadcrumb_items,
-            'seo_web_application_schema': web_application_schema,
-            'seo_article_schema': article_schema,
-            'build_breadcrumb_items': build_breadcrumb_items,
-            'split_visible_sentences': split_visible_sentences,
-            'related_content_section': related_content_section,
-            'blog_articles': blog_articles,
-            'AFFILIATE_ENABLED': affiliate_settings['enabled'],
-            'AFFILIATE_TEXTLINKS_ENABLED': affiliate_settings['textlinks_enabled'],
-            'AFFILIATE_BANNERS_ENABLED': affiliate_settings['banners_enabled'],
-            'AFFILIATE_STACK_ONLY': affiliate_settings['stack_only'],
-            'AFFILIATE_NETWORK': affiliate_settings['network'],
-            'AFFILIATE_EXCLUDE_PATHS': affiliate_settings['exclude_paths'],
-            'AFFILIATE_ALLOWED_PAGE_TYPES': affiliate_settings['allowed_page_types'],
-            'AFFILIATE_WIDGET_DESKTOP_ENABLED': affiliate_settings['widget_desktop_enabled'],
-            'AFFILIATE_WIDGET_TABLET_ENABLED': affiliate_settings['widget_tablet_enabled'],
-            'AFFILIATE_WIDGET_MOBILE_ENABLED': affiliate_settings['widget_mobile_enabled'],
-            'AFFILIATE_ROTATION_BANNER_ENABLED': affiliate_settings['rotation_banner_enabled'],
+        context.update({
             'AMAZON_AFFILIATE_ENABLED': bool(amazon_affiliate.get('enabled')),
             'amazon_affiliate': amazon_affiliate,
             'amazon_affiliate_items': amazon_affiliate.get('items', []),
@@ -1097,20 +1253,15 @@ def inject_env_vars():
             'amazon_affiliate_mid_items': amazon_affiliate_mid_items,
             'amazon_lightweight_sections': amazon_lightweight_sections,
             'a8_lightweight_sections': a8_lightweight_sections,
-            'affiliate_page_type': affiliate_page_type,
-            'affiliate_path_excluded': affiliate_is_path_excluded(current_path),
-            'affiliate_top_slot_id': affiliate_top_slot_id(current_path),
-            'affiliate_top_slot_mode': affiliate_top_slot_mode(current_path),
-            'affiliate_footer_slot_id': affiliate_footer_slot_id(current_path),
-            'affiliate_side_rail_enabled': affiliate_side_rail_enabled(current_path),
-            'affiliate_can_render_textlinks': affiliate_can_render_textlinks,
-            'affiliate_can_render_slot': affiliate_can_render_slot,
-            'affiliate_get_slot_config': affiliate_get_slot_config
-        }
+        })
+        return context
     except Exception as e:
         request_id = getattr(g, 'request_id', 'unknown') if hasattr(g, 'request_id') else 'unknown'
         import traceback
         current_path = request.path if has_request_context() else '/'
+        if has_request_context():
+            # フォールバック表示はページキャッシュに載せない
+            g.template_context_degraded = True
         affiliate_settings = get_affiliate_settings()
         logger.exception(
             f"context_processor_error rid={request_id} products_empty_reason={type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
@@ -1210,15 +1361,103 @@ def add_noindex_for_dynamic(response):
     return response
 
 
-# ジョブの状態を管理（スレッドセーフな辞書）
-jobs = {}
-jobs_lock = threading.Lock()
+# 静的なマーケティングページのレンダリング結果キャッシュ（既定は無効）
+from lib.page_cache import PageCache
+
+PAGE_CACHE_ENABLED = _env_flag('PAGE_CACHE_ENABLED', False)
+PAGE_CACHE_PATHS = frozenset(('/', '/autofill', '/faq', '/about', '/privacy', '/terms', '/tools', '/tools/pdf'))
+page_cache = PageCache(
+    max_entries=int(os.getenv('PAGE_CACHE_MAX_ENTRIES', '128')),
+    max_bytes=int(os.getenv('PAGE_CACHE_MAX_MB', '8')) * 1024 * 1024,
+    ttl_sec=int(os.getenv('PAGE_CACHE_TTL_SEC', '300')),
+)
+
+
+def _recent_history_bucket():
+    """閲覧履歴 Cookie を正規化した値のハッシュ（履歴なしは ''）。Amazon 枠の出力はこれで決まる。"""
+    history = _load_recent_affiliate_history()
+    if not history:
+        return ''
+    normalized = json.dumps(history, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def _page_cache_key(path):
+    # テンプレートが参照するリクエスト値は request.path だけ。クエリ文字列は出力に影響しない
+    return (
+        path,
+        _template_context_env_generation(),
+        current_amazon_rotation_bucket(),
+        _recent_history_bucket(),
+    )
+
+
+def _page_cache_response(entry, cache_status):
+    encoding = choose_encoding(request.accept_encodings, entry.variants)
+    body, content_encoding, etag = entry.variant(encoding)
+    g.page_cache_served = True
+    g.amazon_recent_history_cookie = entry.cookie
+    if any(request.if_none_match.contains_weak(tag) for tag in entry.etags()):
+        response = Response(status=304)
+    else:
+        response = Response(body, status=200, content_type=entry.mimetype)
+        if content_encoding:
+            response.headers['Content-Encoding'] = content_encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding, Cookie'
+    response.headers['X-Page-Cache'] = cache_status
+    return response
+
+
+@app.before_request
+def serve_cached_page():
+    if not PAGE_CACHE_ENABLED or request.method not in ('GET', 'HEAD'):
+        return None
+    if request.path not in PAGE_CACHE_PATHS:
+        return None
+    key = _page_cache_key(request.path)
+    entry = page_cache.get(key)
+    if entry is not None:
+        return _page_cache_response(entry, 'HIT')
+    g.page_cache_key = key
+    return None
+
+
+@app.after_request
+def store_cached_page(response):
+    key = getattr(g, 'page_cache_key', None)
+    if key is None or getattr(g, 'page_cache_served', False):
+        return response
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or 'text/html' not in (response.content_type or '')
+        or response.headers.get('X-Degraded-Mode')
+        or 'Set-Cookie' in response.headers
+        or getattr(g, 'template_context_degraded', False)
+    ):
+        return response
+    entry = page_cache.put(
+        key,
+        response.get_data(),
+        response.content_type,
+        cookie=getattr(g, 'amazon_recent_history_cookie', None),
+    )
+    return _page_cache_response(entry, 'MISS')
 
-# 直列実行＋待機キュー（インメモリFIFO）。サーバ再起動でキューは消える
-from collections import deque
-job_queue = deque()
+
+# ジョブの状態を管理（ステータス別インデックス付きレジストリ）
+startup_profiler.checkpoint('rate_limit_static_template_caches')
+from lib.job_registry import JobRegistry
+job_registry = JobRegistry()
+jobs = job_registry.jobs
+jobs_lock = job_registry.lock
+
+# 直列実行＋待機キュー（インメモリFIFO・位置O(1)）。サーバ再起動でキューは消える
+job_queue = job_registry.queue
 # queued ジョブの実行用パラメータ（start時にpopして使用。資格情報はstart後即参照しない）
-queued_job_params = {}
+queued_job_params = job_registry.queued_params
 # queued の最大待機時間（超過でtimeout扱い・ファイル削除）
 QUEUED_MAX_WAIT_SEC = int(os.getenv("QUEUED_MAX_WAIT_SEC", "1800"))  # 30分
 MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "3"))  # キュー上限（メモリ保護）
@@ -1228,12 +1467,153 @@ ACTIVE_CLIENT_STALE_WARNING_SEC = int(os.getenv("ACTIVE_CLIENT_STALE_WARNING_SEC
 
 # P0-3: 完了ジョブの保持期間（秒）
 JOB_RETENTION_SECONDS = 1800  # 30分
+# 登録から一定時間経過したセッションを期限切れとする（/cleanup-sessions と定期掃除で共通）
+SESSION_MAX_AGE_SEC = 1800  # 30分
+
+# メンテナンススレッドの実行間隔（prune は期限到来分だけ処理するので短めでよい）
+MAINTENANCE_THREAD_ENABLED = os.getenv("MAINTENANCE_THREAD_ENABLED", "1").lower() not in ("0", "false", "no")
+MAINTENANCE_PRUNE_INTERVAL_SEC = float(os.getenv("MAINTENANCE_PRUNE_INTERVAL_SEC", "15"))
+MAINTENANCE_SESSION_CLEANUP_INTERVAL_SEC = float(os.getenv("MAINTENANCE_SESSION_CLEANUP_INTERVAL_SEC", "300"))
+MAINTENANCE_TEMP_SWEEP_INTERVAL_SEC = float(os.getenv("MAINTENANCE_TEMP_SWEEP_INTERVAL_SEC", "600"))
+MAINTENANCE_RATE_LIMIT_SWEEP_INTERVAL_SEC = float(os.getenv("MAINTENANCE_RATE_LIMIT_SWEEP_INTERVAL_SEC", "120"))
+MAINTENANCE_AMAZON_CACHE_SWEEP_INTERVAL_SEC = float(os.getenv("MAINTENANCE_AMAZON_CACHE_SWEEP_INTERVAL_SEC", "300"))
+# 一時ファイル掃除の対象とする最終更新からの経過秒（待機上限 + 実行上限 + 保持期間より十分長く）
+TEMP_SWEEP_MAX_AGE_SEC = int(os.getenv("TEMP_SWEEP_MAX_AGE_SEC", "7200"))
 
 # P1: ジョブログの上限設定（メモリ最適化）。utils.MAX_JOB_LOGSと同期（500）
 MAX_JOB_LOGS = 500  # 1ジョブあたりの最大ログ件数
 TERMINAL_JOB_STATUSES = frozenset(('completed', 'error', 'timeout', 'cancelled', 'expired', 'failed'))
 QUEUE_LIVE_STATUSES = frozenset(('queued', 'running'))
-queue_identity_index = {}
+queue_identity_index = job_registry.identity_index
+
+# ワーカー間共有ストア。JOB_STORE_BACKEND=sqlite で同一ホストの全ワーカーが 1 つの FIFO・実行枠を共有する。
+# 既定（memory）は従来どおりプロセス内だけで判定する。
+from lib.job_store import ADMIT_FULL, ADMIT_QUEUED, create_job_store
+job_store = create_job_store(job_registry, retention_sec=JOB_RETENTION_SECONDS)
+JOB_STORE_SYNC_INTERVAL_SEC = float(os.getenv("JOB_STORE_SYNC_INTERVAL_SEC", "2"))
+# 共有ストアへ載せるログ件数（/status の別ワーカー応答用）
+JOB_STORE_SNAPSHOT_LOGS = int(os.getenv("JOB_STORE_SNAPSHOT_LOGS", "200"))
+
+
+def _release_job_store_slot(job_id, old_status, new_status):
+    """ローカルでジョブが終了・削除されたら共有ストア側の枠も解放する。"""
+    if new_status is None or new_status in TERMINAL_JOB_STATUSES:
+        job_store.release(job_id, new_status or 'expired')
+
+
+# 共有ストアへスナップショットを載せ直す必要があるジョブ（ステータス遷移したもの）
+_job_store_pending_publish = set()
+
+
+def _mark_job_store_publish(job_id, old_status, new_status):
+    if new_status is not None:
+        _job_store_pending_publish.add(job_id)
+
+
+if job_store.shared:
+    job_registry.add_listener(_release_job_store_slot)
+    job_registry.add_listener(_mark_job_store_publish)
+
+# ジョブごとの次回見直し時刻（lease 切れ・待機上限・disconnect 猶予・stale 警告・保持期限）。
+# prune_jobs は期限が来たジョブだけを判定し直すため、掃除コストは O(期限到来件数) になる。
+from lib.deadline_scheduler import DeadlineScheduler
+job_deadlines = DeadlineScheduler()
+# 書き換わると期限が変わるキー（automation.py やテストからの直接代入も拾う）
+_JOB_DEADLINE_FIELDS = ('queued_at', 'last_heartbeat_at', 'lease_expires_at', 'disconnect_hint_at', 'end_time', 'start_time', 'client_stale_warned')
+
+
+def next_job_deadline(job_info):
+    """prune_jobs で次に判定が変わり得る時刻。判定不要なら None。
+
+    早めに返すぶんには prune_jobs が再判定して取り直すだけなので、各条件の最小値を返す。
+    """
+    if not job_info:
+        return None
+    status = job_info.get('status')
+    if status == 'queued':
+        queued_at = job_info.get('queued_at') or job_info.get('start_time') or 0
+        last_heartbeat_at = job_info.get('last_heartbeat_at') or queued_at
+        lease_expires_at = job_info.get('lease_expires_at') or (last_heartbeat_at + QUEUE_HEARTBEAT_TIMEOUT_SEC)
+        deadline = min(lease_expires_at, queued_at + QUEUED_MAX_WAIT_SEC)
+        disconnect_hint_at = job_info.get('disconnect_hint_at')
+        if disconnect_hint_at and last_heartbeat_at <= disconnect_hint_at:
+            deadline = min(deadline, disconnect_hint_at + QUEUE_DISCONNECT_GRACE_SEC)
+        return deadline
+    if status == 'running':
+        if job_info.get('client_stale_warned'):
+            return None
+        last_heartbeat_at = job_info.get('last_heartbeat_at') or job_info.get('start_time') or time.time()
+        return last_heartbeat_at + ACTIVE_CLIENT_STALE_WARNING_SEC
+    if status in TERMINAL_JOB_STATUSES:
+        end_time = job_info.get('end_time')
+        if end_time is None:
+            start_time = job_info.get('start_time', 0)
+            if not start_time or start_time <= 0:
+                return None
+            return start_time + JOB_RETENTION_SECONDS
+        return end_time + JOB_RETENTION_SECONDS
+    return None
+
+
+def _schedule_job_deadline_on_status(job_id, old_status, new_status):
+    if new_status is None:
+        job_deadlines.cancel(job_id)
+        return
+    job_deadlines.schedule(job_id, next_job_deadline(jobs.get(job_id)))
+
+
+def _schedule_job_deadline_on_field(job_id, key, job_info):
+    job_deadlines.schedule(job_id, next_job_deadline(job_info))
+
+
+job_registry.add_listener(_schedule_job_deadline_on_status)
+job_registry.watch_fields(_JOB_DEADLINE_FIELDS, _schedule_job_deadline_on_field)
+
+# === Prometheus メトリクス（/metrics。METRICS_TOKEN を設定したときだけ公開） ===
+# 値はワーカーごと。更新は dict 引きと小さなロックでの加算だけなのでリクエスト経路に置く
+from lib import metrics
+METRICS_TOKEN = (os.getenv('METRICS_TOKEN') or '').strip()
+
+REQUEST_LATENCY = metrics.registry.histogram(
+    'jobcan_http_request_duration_seconds',
+    'HTTP request latency by route template, method and status.',
+    ('route', 'method', 'status'),
+)
+RATE_LIMIT_REJECTIONS = metrics.registry.counter(
+    'jobcan_rate_limit_rejections_total',
+    'Requests rejected with 429 by the rate limiter.',
+    ('group',),
+)
+JOB_DURATION = metrics.registry.histogram(
+    'jobcan_job_duration_seconds',
+    'AutoFill job duration from start to terminal status.',
+    ('status',),
+    buckets=(10, 30, 60, 120, 300, 600, 900, 1200, 1800, 3600),
+)
+metrics.registry.gauge('jobcan_job_queue_depth', 'Jobs waiting in the queue.', func=lambda: job_registry.count('queued'))
+metrics.registry.gauge('jobcan_jobs_running', 'Jobs currently running.', func=lambda: job_registry.count('running'))
+
+
+def _active_browser_count():
+    from diagnostics.runtime_metrics import get_browser_count
+    return get_browser_count()
+
+
+metrics.registry.gauge('jobcan_active_browsers', 'Playwright browsers currently open in this process.', func=_active_browser_count)
+
+
+def _observe_job_duration(job_id, old_status, new_status):
+    if new_status not in TERMINAL_JOB_STATUSES or old_status in TERMINAL_JOB_STATUSES:
+        return
+    job_info = jobs.get(job_id) or {}
+    start_time = job_info.get('start_time')
+    if not start_time:
+        return
+    end_time = job_info.get('end_time') or time.time()
+    JOB_DURATION.observe(max(0.0, end_time - start_time), new_status)
+
+
+job_registry.add_listener(_observe_job_duration)
 
 # セッション管理とリソース監視
 session_manager = {
@@ -1247,29 +1627,42 @@ session_manager = {
     }
 }
 
+# === リソースサンプラー ===
+# psutil の計測は専用スレッドで RESOURCE_SAMPLE_INTERVAL_SEC ごとに行い、リクエスト側は直近値を読むだけにする
+RESOURCE_SAMPLE_INTERVAL_SEC = float(os.getenv("RESOURCE_SAMPLE_INTERVAL_SEC", "2"))
+RESOURCE_SAMPLE_HISTORY = int(os.getenv("RESOURCE_SAMPLE_HISTORY", "60"))
+
+
+def _log_resource_sample(snapshot):
+    """メモリ使用量が危険域の場合はログに記録（計測 1 回につき 1 度）"""
+    memory_mb = snapshot['memory_mb']
+    if memory_mb > MEMORY_LIMIT_MB:
+        logger.error(f"memory_limit_exceeded memory_mb={memory_mb:.1f} limit={MEMORY_LIMIT_MB}")
+    elif memory_mb > MEMORY_WARNING_MB:
+        logger.warning(f"high_memory_usage memory_mb={memory_mb:.1f} warning_threshold={MEMORY_WARNING_MB}")
+
+
+from lib.resource_sampler import ResourceSampler
+resource_sampler = ResourceSampler(
+    history=RESOURCE_SAMPLE_HISTORY,
+    # サンプラースレッドが止まっていても数周期で呼び出し側が計測し直す
+    max_age_sec=max(5.0, RESOURCE_SAMPLE_INTERVAL_SEC * 3),
+    on_sample=_log_resource_sample,
+)
+
+
 def get_system_resources():
-    """システムリソースの使用状況を取得（強化版）"""
+    """システムリソースの使用状況（サンプラーの直近値。psutil は呼ばない）"""
     try:
-        import psutil
-        process = psutil.Process()
-        memory_info = process.memory_info()
-        memory_mb = memory_info.rss / 1024 / 1024
-        cpu_percent = process.cpu_percent()
-        
-        # メモリ使用量が危険域の場合はログに記録
-        if memory_mb > MEMORY_WARNING_MB:
-            logger.warning(f"high_memory_usage memory_mb={memory_mb:.1f} warning_threshold={MEMORY_WARNING_MB}")
-        if memory_mb > MEMORY_LIMIT_MB:
-            logger.error(f"memory_limit_exceeded memory_mb={memory_mb:.1f} limit={MEMORY_LIMIT_MB}")
-        
+        snapshot = resource_sampler.latest()
         return {
-            'memory_mb': memory_mb,
-            'cpu_percent': cpu_percent,
+            'memory_mb': snapshot['memory_mb'],
+            'cpu_percent': snapshot['cpu_percent'],
+            'children_rss_mb': snapshot['children_rss_mb'],
+            'system_available_mb': snapshot['system_available_mb'],
+            'sampled_at': snapshot['sampled_at'],
             'active_sessions': len(session_manager['active_sessions'])
         }
-    except ImportError:
-        logger.warning("psutil_not_available resource_monitoring_disabled")
-        return {'memory_mb': 0, 'cpu_percent': 0, 'active_sessions': len(session_manager['active_sessions'])}
     except Exception as e:
         logger.error(f"resource_monitoring_error error={str(e)}")
         return {'memory_mb': 0, 'cpu_percent': 0, 'active_sessions': len(session_manager['active_sessions'])}
@@ -1296,38 +1689,23 @@ def normalize_queue_identity(email, company_id):
 
 
 def compact_job_queue_locked():
-    """キュー内の欠損・重複・非queuedを取り除く。jobs_lock前提。"""
-    global job_queue
-
-    new_queue = deque()
-    seen_job_ids = set()
-    mutated = False
+    """キュー内の欠損・非queuedを取り除く。jobs_lock前提。
 
+    JobRegistry がステータス遷移・削除時にキューから外すため通常は何も起きない。
+    外部から直接書き換えられた場合の保険として残している（O(queue)）。
+    """
     for queued_job_id in list(job_queue):
-        if queued_job_id in seen_job_ids:
-            mutated = True
-            continue
-
         queued_job = jobs.get(queued_job_id)
         if not queued_job or queued_job.get('status') != 'queued':
+            job_queue.remove(queued_job_id)
             queued_job_params.pop(queued_job_id, None)
-            mutated = True
-            continue
-
-        seen_job_ids.add(queued_job_id)
-        new_queue.append(queued_job_id)
-
-    if mutated:
-        job_queue = new_queue
 
     return list(job_queue)
 
 
 def get_queue_position_locked(job_id):
-    qlist = compact_job_queue_locked()
-    if job_id in qlist:
-        return 1 + qlist.index(job_id)
-    return None
+    """queued 時のキュー内位置（1-based）。jobs_lock前提。共有ストア時は全ワーカー通しの位置。"""
+    return job_store.queue_position(job_id)
 
 
 def find_live_job_for_queue_key_locked(queue_key):
@@ -1343,8 +1721,9 @@ def find_live_job_for_queue_key_locked(queue_key):
         queue_identity_index.pop(queue_key, None)
 
     matches = []
-    for existing_job_id, job_info in jobs.items():
-        if job_info.get('queue_key') != queue_key:
+    for existing_job_id in job_registry.ids_with_status(*QUEUE_LIVE_STATUSES):
+        job_info = jobs.get(existing_job_id)
+        if not job_info or job_info.get('queue_key') != queue_key:
             continue
         if job_info.get('status') not in QUEUE_LIVE_STATUSES:
             continue
@@ -1361,6 +1740,16 @@ def find_live_job_for_queue_key_locked(queue_key):
     return job_id, job_info
 
 
+def find_remote_live_job_locked(queue_key):
+    """共有ストア上で別ワーカーが持つ同一待機キーの live ジョブを返す。jobs_lock前提。"""
+    if not job_store.shared or not queue_key:
+        return None, None
+    remote_job_id = job_store.find_live(queue_key)
+    if not remote_job_id or remote_job_id in jobs:
+        return None, None
+    return remote_job_id, job_store.load(remote_job_id) or {'status': 'queued'}
+
+
 def release_queue_identity_locked(job_id, job_info=None):
     """ジョブ終了時に待機キーの参照を外す。jobs_lock前提。"""
     job_info = job_info or jobs.get(job_id) or {}
@@ -1386,6 +1775,7 @@ def touch_job_lease_locked(job_info, current_time=None):
     job_info['disconnect_hint_at'] = None
     job_info['client_attached'] = True
     job_info['last_updated'] = current_time
+    job_store.touch(getattr(job_info, 'job_id', None), job_info['lease_expires_at'])
 
 
 def build_existing_job_response_locked(job_id, job_info):
@@ -1399,7 +1789,7 @@ def build_existing_job_response_locked(job_id, job_info):
         'status_url': f'/status/{job_id}',
         'retry_after_sec': 5 if status in QUEUE_LIVE_STATUSES else None,
         'queue_limit': MAX_QUEUE_SIZE,
-        'max_active_sessions': MAX_ACTIVE_SESSIONS,
+        'max_active_sessions': get_active_slot_limit(),
         'message': '既存の順番待ちを再利用しています。'
         if status == 'queued'
         else '既存の処理状態を再利用しています。'
@@ -1411,8 +1801,6 @@ def build_existing_job_response_locked(job_id, job_info):
 
 def expire_queued_job_locked(job_id, current_time, cleanup_targets, reason):
     """queued ジョブを expired に遷移させてキューから除外する。jobs_lock前提。"""
-    global job_queue
-
     job_info = jobs.get(job_id)
     if not job_info or job_info.get('status') != 'queued':
         return None
@@ -1423,7 +1811,7 @@ def expire_queued_job_locked(job_id, current_time, cleanup_targets, reason):
         'heartbeat_timeout': '一定時間操作が確認できなかったため、順番待ちは自動的に終了しました。',
     }
 
-    job_queue = deque([queued_job_id for queued_job_id in job_queue if queued_job_id != job_id])
+    job_queue.remove(job_id)
     queued_job_params.pop(job_id, None)
     job_info['status'] = 'expired'
     job_info['login_status'] = 'expired'
@@ -1442,13 +1830,26 @@ def expire_queued_job_locked(job_id, current_time, cleanup_targets, reason):
     }
 
 
+def cancel_queued_job_locked(job_id, current_time=None):
+    """queued ジョブを cancelled にしてキューから除外する。jobs_lock前提。(file_path, session_id) を返す。"""
+    current_time = current_time or time.time()
+    job = jobs[job_id]
+    job_queue.remove(job_id)
+    queued_job_params.pop(job_id, None)
+    job['status'] = 'cancelled'
+    job['login_status'] = 'cancelled'
+    job['end_time'] = current_time
+    job['login_message'] = 'キャンセルされました。'
+    job['last_updated'] = current_time
+    job['client_attached'] = False
+    release_queue_identity_locked(job_id, job)
+    return job.get('file_path'), job.get('session_id')
+
+
 def get_queue_position(job_id):
     """queued 時のキュー内位置（1-based）。見つからなければ None。jobs_lock で保護。"""
     with jobs_lock:
-        qlist = compact_job_queue_locked()
-        if job_id in qlist:
-            return 1 + qlist.index(job_id)
-    return None
+        return get_queue_position_locked(job_id)
 
 
 def log_job_event(event, job_id, status=None, queue_position=None, elapsed_sec=None, queue_length=None, running_count=None, extra=None):
@@ -1469,10 +1870,45 @@ def log_job_event(event, job_id, status=None, queue_position=None, elapsed_sec=N
     logger.info("autofill_event %s", payload)
 
 
+from lib.admission import AdaptiveAdmissionController
+admission_controller = AdaptiveAdmissionController(
+    memory_limit_mb=MEMORY_LIMIT_MB,
+    max_slots=MAX_ACTIVE_SESSIONS,
+    default_job_mb=ADMISSION_DEFAULT_JOB_MB,
+    reserve_mb=ADMISSION_RESERVE_MB,
+    # 子プロセス込みの RSS はリソースサンプラーが計測済みの値を使う
+    measure=resource_sampler.process_tree_mb,
+)
+
+
+def get_active_slot_limit():
+    """現在の同時実行枠。自動調整時は実測にもとづく枠数（MAX_ACTIVE_SESSIONS が上限）。"""
+    if not ADAPTIVE_ADMISSION_ENABLED:
+        return MAX_ACTIVE_SESSIONS
+    return min(MAX_ACTIVE_SESSIONS, admission_controller.slots())
+
+
+def sample_admission_once():
+    """ワーカー + Chromium 子プロセスのメモリを測って枠数を見直す（メンテナンススレッドから）。"""
+    if not ADAPTIVE_ADMISSION_ENABLED:
+        return
+    old_limit = get_active_slot_limit()
+    admission_controller.sample(job_registry.running_count())
+    if get_active_slot_limit() > old_limit and job_queue:
+        maybe_start_next_job()
+
+
+def describe_admission():
+    info = admission_controller.describe()
+    info['enabled'] = ADAPTIVE_ADMISSION_ENABLED
+    info['max_active_sessions'] = MAX_ACTIVE_SESSIONS
+    info['active_slot_limit'] = get_active_slot_limit()
+    return info
+
+
 def count_running_jobs():
-    """statusがrunningのジョブ数（同時実行数）を返す。"""
-    with jobs_lock:
-        return sum(1 for j in jobs.values() if j.get('status') == 'running')
+    """statusがrunningのジョブ数（同時実行数）を返す。共有ストア時は全ワーカー合計。"""
+    return job_store.running_count()
 
 def check_resource_limits():
     """リソース制限のチェック（readyz/sessions 等の健全性用）。上限超過時は RuntimeError を投げる。"""
@@ -1486,13 +1922,14 @@ def check_resource_limits():
     elif resources['memory_mb'] > MEMORY_WARNING_MB:
         warnings.append(f"メモリ使用量が高いです: {resources['memory_mb']:.1f}MB")
     
-    if running_count >= MAX_ACTIVE_SESSIONS:
+    slot_limit = get_active_slot_limit()
+    if running_count >= slot_limit:
         raise RuntimeError(
-            f"同時処理数の上限に達しています（実行中: {running_count}/{MAX_ACTIVE_SESSIONS}）。"
+            f"同時処理数の上限に達しています（実行中: {running_count}/{slot_limit}）。"
             f"しばらく待ってから再試行してください。"
         )
-    elif running_count > MAX_ACTIVE_SESSIONS * 0.8:
-        warnings.append(f"実行中ジョブが多いです: {running_count}/{MAX_ACTIVE_SESSIONS}件")
+    elif running_count > slot_limit * 0.8:
+        warnings.append(f"実行中ジョブが多いです: {running_count}/{slot_limit}件")
     if session_count != running_count:
         logger.warning(f"jobs_session_mismatch running_jobs={running_count} active_sessions={session_count}")
     
@@ -1507,8 +1944,9 @@ def get_resource_warnings():
         running_count = count_running_jobs()
         if resources['memory_mb'] > MEMORY_WARNING_MB:
             warnings.append(f"メモリ使用量が高いです: {resources['memory_mb']:.1f}MB")
-        if running_count > MAX_ACTIVE_SESSIONS * 0.8:
-            warnings.append(f"実行中ジョブが多いです: {running_count}/{MAX_ACTIVE_SESSIONS}件")
+        slot_limit = get_active_slot_limit()
+        if running_count > slot_limit * 0.8:
+            warnings.append(f"実行中ジョブが多いです: {running_count}/{slot_limit}件")
     except Exception as e:
         logger.warning(f"get_resource_warnings error: {e}")
     return warnings
@@ -1568,11 +2006,14 @@ def unregister_session(session_id):
 
 
 def maybe_start_next_job():
-    """running が 0 のときキュー先頭を running にしてスレッド起動。jobs_lock は内部で取得。"""
+    """running が上限未満のときキュー先頭を running にしてスレッド起動。jobs_lock は内部で取得。
+
+    共有ストア時は、ローカル先頭が全ワーカー通しの先頭で、かつ全体の空き枠がある場合だけ開始する。
+    """
     with jobs_lock:
-        compact_job_queue_locked()
-        running_count = sum(1 for j in jobs.values() if j.get('status') == 'running')
-        if running_count >= MAX_ACTIVE_SESSIONS:
+        slot_limit = get_active_slot_limit()
+        running_count = job_store.running_count()
+        if running_count >= slot_limit:
             return
         if not job_queue:
             return
@@ -1589,10 +2030,11 @@ def maybe_start_next_job():
         elapsed = None
 
         while job_queue:
-            next_job_id = job_queue.popleft()
-            next_params = queued_job_params.pop(next_job_id, None)
+            next_job_id = job_queue.peek()
             next_job = jobs.get(next_job_id)
-            if not next_params or not next_job or next_job.get('status') != 'queued':
+            if not queued_job_params.get(next_job_id) or not next_job or next_job.get('status') != 'queued':
+                job_queue.popleft()
+                queued_job_params.pop(next_job_id, None)
                 release_queue_identity_locked(next_job_id, next_job)
                 continue
 
@@ -1614,8 +2056,13 @@ def maybe_start_next_job():
                     log_job_event("job_expired", next_job_id, status="expired", elapsed_sec=expired_meta.get('elapsed_sec'), extra={'reason': 'duplicate_wait'})
                 continue
 
+            # 共有ストア: 全体先頭でない / 空き枠が無ければ他ワーカーの順番なので待つ
+            if not job_store.try_claim(next_job_id, slot_limit):
+                return
+
+            job_queue.popleft()
             job_id = next_job_id
-            params = next_params
+            params = queued_job_params.pop(next_job_id)
             jobs[job_id]['status'] = 'running'
             jobs[job_id]['step_name'] = 'initializing'
             jobs[job_id]['login_status'] = 'initializing'
@@ -1649,16 +2096,119 @@ def maybe_start_next_job():
     thread.start()
 
 
+# AUTOMATION_EXECUTOR=process のときだけ子プロセスを使う（thread 時は None）
+from lib import job_process
+job_executor = None
+if AUTOMATION_EXECUTOR == 'process':
+    job_executor = job_process.ProcessJobExecutor(
+        prewarm=JOB_PROCESS_PREWARM,
+        rlimit_as_mb=JOB_PROCESS_RLIMIT_AS_MB,
+        memory_cap_mb=JOB_PROCESS_MEMORY_CAP_MB,
+        kill_grace_sec=JOB_PROCESS_KILL_GRACE_SEC,
+    )
+    # automation の import を含む子プロセス起動は数秒かかるため、起動処理とは切り離して温めておく
+    threading.Thread(target=job_executor.warm, name='job-process-warm', daemon=True).start()
+elif AUTOMATION_EXECUTOR != 'thread':
+    logger.warning(f"unknown_automation_executor value={AUTOMATION_EXECUTOR} fallback=thread")
+
+
+def shutdown_job_executor():
+    if job_executor is not None:
+        job_executor.shutdown()
+
+
+atexit.register(shutdown_job_executor)
+
+
+def _apply_job_process_message(job_id, message):
+    """子プロセスからの更新を親のジョブレコードへ反映する。"""
+    kind = message[0]
+    if kind == job_process.MSG_METRIC:
+        metrics.observe(message[1], message[3], *message[2])
+        return
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            return
+        if kind == job_process.MSG_SET:
+            job[message[1]] = message[2]
+        elif kind == job_process.MSG_LOG:
+            logs = job.get('logs')
+            if not isinstance(logs, JobLogBuffer):
+                logs = create_job_log_buffer(logs or (), total_count=job.log_count)
+                job['logs'] = logs
+            logs.append(message[1])
+            jobs.mark_changed(job_id, logs_appended=1)
+        elif kind == job_process.MSG_LOGS:
+            # 丸ごと置き換えでも通番は巻き戻さない（SSE / since のカーソルを壊さない）
+            job['logs'] = create_job_log_buffer(message[1], total_count=job.log_count)
+
+
+def run_automation_in_process(job_id, email, password, file_path, session_dir, session_id, company_id):
+    """子プロセスでジョブを実行する。強制終了・異常終了時はここでジョブを終了状態にする。"""
+    with jobs_lock:
+        job = jobs.get(job_id) or {}
+        snapshot = {key: value for key, value in job.items() if key != 'logs'}
+    start_time = snapshot.get('start_time') or time.time()
+    kwargs = {
+        'email': email,
+        'password': password,
+        'file_path': file_path,
+        'session_dir': session_dir,
+        'session_id': session_id,
+        'company_id': company_id,
+        'job_timeout_sec': JOB_TIMEOUT_SEC,
+    }
+    outcome, detail = job_executor.run(
+        job_id,
+        snapshot,
+        kwargs,
+        lambda message: _apply_job_process_message(job_id, message),
+        timeout_sec=JOB_TIMEOUT_SEC,
+        log_maxlen=MAX_JOB_LOGS,
+        start_time=start_time,
+    )
+    if outcome == job_process.EXIT_DONE:
+        return
+    if outcome == job_process.EXIT_ERROR:
+        raise RuntimeError(detail)
+
+    if outcome == job_process.EXIT_TIMEOUT:
+        status = 'timeout'
+        message = f'処理が{JOB_TIMEOUT_SEC}秒を超えたため強制終了しました。'
+    elif outcome == job_process.EXIT_MEMORY:
+        status = 'error'
+        message = f'メモリ使用量が上限（{JOB_PROCESS_MEMORY_CAP_MB}MB）を超えたため処理を中断しました。'
+    else:
+        status = 'error'
+        message = '処理プロセスが異常終了しました。'
+    logger.warning(f"job_process_aborted job_id={job_id} outcome={outcome} detail={detail}")
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None or job.get('status') in TERMINAL_JOB_STATUSES:
+            return
+        job['status'] = status
+        job['login_status'] = status
+        job['login_message'] = message
+        from utils import add_job_log
+        add_job_log(job_id, f"❌ {message}" if status == 'error' else f"⏱ {message}", jobs)
+        job['last_updated'] = time.time()
+        job['end_time'] = time.time()
+
+
 def run_automation_impl(job_id, email, password, file_path, session_dir, session_id, company_id, file_size):
     """1ジョブ分の自動化実行。完了後 maybe_start_next_job で次を起動。"""
     bg_start_time = time.time()
     logger.info(f"bg_job_start job_id={job_id} session_id={session_id} file_size={file_size}")
     try:
-        from automation import process_jobcan_automation
-        process_jobcan_automation(
-            job_id, email, password, file_path, jobs, session_dir, session_id, company_id,
-            job_timeout_sec=JOB_TIMEOUT_SEC
-        )
+        if job_executor is not None:
+            run_automation_in_process(job_id, email, password, file_path, session_dir, session_id, company_id)
+        else:
+            from automation import process_jobcan_automation
+            process_jobcan_automation(
+                job_id, email, password, file_path, jobs, session_dir, session_id, company_id,
+                job_timeout_sec=JOB_TIMEOUT_SEC
+            )
         duration = time.time() - bg_start_time
         logger.info(f"bg_job_success job_id={job_id} duration_sec={duration:.1f}")
         with jobs_lock:
@@ -1693,8 +2243,8 @@ def run_automation_impl(job_id, email, password, file_path, session_dir, session
             if st in TERMINAL_JOB_STATUSES:
                 release_queue_identity_locked(job_id, j)
             el = get_elapsed_sec(j)
-            rcount = sum(1 for x in jobs.values() if x.get('status') == 'running')
-            qlen = len(compact_job_queue_locked())
+            rcount = job_registry.running_count()
+            qlen = len(job_queue)
         log_job_event("cleanup_started", job_id, status=st, elapsed_sec=el, running_count=rcount, queue_length=qlen)
         try:
             if os.path.exists(file_path):
@@ -1714,8 +2264,11 @@ def run_automation_impl(job_id, email, password, file_path, session_dir, session
 
 
 def prune_jobs(current_time=None, retention_sec=JOB_RETENTION_SECONDS):
-    """完了済み・失効済みジョブを掃除し、stale waiting を queue から除外する。"""
-    global job_queue
+    """完了済み・失効済みジョブを掃除し、stale waiting を queue から除外する。
+
+    job_deadlines から期限が来たジョブだけを取り出して判定するため、全ジョブは走査しない。
+    （queued の重複チェックのみキュー長 MAX_QUEUE_SIZE 分を見る）
+    """
     if current_time is None:
         current_time = time.time()
 
@@ -1724,13 +2277,11 @@ def prune_jobs(current_time=None, retention_sec=JOB_RETENTION_SECONDS):
     stale_active_job_ids = []
 
     with jobs_lock:
-        compact_job_queue_locked()
-
         # running 中の同一待機キーを優先し、queued の重複は stale 扱いで掃除する。
         running_queue_keys = {
-            job_info.get('queue_key')
-            for job_info in jobs.values()
-            if job_info.get('status') == 'running' and job_info.get('queue_key')
+            jobs[running_job_id].get('queue_key')
+            for running_job_id in job_registry.ids_with_status('running')
+            if jobs[running_job_id].get('queue_key')
         }
         seen_waiting_keys = set()
 
@@ -1752,10 +2303,18 @@ def prune_jobs(current_time=None, retention_sec=JOB_RETENTION_SECONDS):
             seen_waiting_keys.add(queue_key)
             queue_identity_index[queue_key] = queued_job_id
 
-        compact_job_queue_locked()
+        # 期限が来たジョブだけを判定し直す（queued の待機上限 / heartbeat 切れ / disconnect hint、
+        # running の stale 警告、終了済みの保持期限）
+        due_job_ids = job_deadlines.pop_due(current_time)
+        if retention_sec < JOB_RETENTION_SECONDS:
+            # 保持期間を短縮して呼ばれた場合は登録済み期限より前に消す必要がある
+            due_job_ids = set(due_job_ids).union(job_registry.ids_with_status(*TERMINAL_JOB_STATUSES))
 
-        # queued の最大待機時間 / heartbeat 切れ / disconnect hint を整理
-        for job_id, job_info in list(jobs.items()):
+        jobs_to_remove = []
+        for job_id in due_job_ids:
+            job_info = jobs.get(job_id)
+            if not job_info:
+                continue
             status = job_info.get('status')
             if status == 'queued':
                 queued_at = job_info.get('queued_at') or job_info.get('start_time') or 0
@@ -1776,7 +2335,7 @@ def prune_jobs(current_time=None, retention_sec=JOB_RETENTION_SECONDS):
                     continue
 
                 if current_time - queued_at > QUEUED_MAX_WAIT_SEC:
-                    job_queue = deque([queued_job_id for queued_job_id in job_queue if queued_job_id != job_id])
+                    job_queue.remove(job_id)
                     queued_job_params.pop(job_id, None)
                     jobs[job_id]['status'] = 'timeout'
                     jobs[job_id]['login_status'] = 'timeout'
@@ -1792,6 +2351,7 @@ def prune_jobs(current_time=None, retention_sec=JOB_RETENTION_SECONDS):
                     })
                     continue
 
+                queue_key = job_info.get('queue_key')
                 if queue_key:
                     queue_identity_index[queue_key] = job_id
 
@@ -1801,37 +2361,34 @@ def prune_jobs(current_time=None, retention_sec=JOB_RETENTION_SECONDS):
                     jobs[job_id]['client_stale_warned'] = True
                     jobs[job_id]['client_attached'] = False
                     stale_active_job_ids.append(job_id)
+                    continue
+
+            elif status in TERMINAL_JOB_STATUSES:
+                end_time = job_info.get('end_time')
+                if end_time is None:
+                    # end_timeがない場合はstart_timeから推定（処理時間が長い場合のフォールバック）
+                    start_time = job_info.get('start_time', 0)
+                    if start_time > 0 and current_time - start_time > retention_sec:
+                        jobs_to_remove.append(job_id)
+                        continue
+                elif current_time - end_time > retention_sec:
+                    # 完了/エラーから一定時間経過したジョブを削除対象に
+                    jobs_to_remove.append(job_id)
+                    continue
+
+            # まだ期限前（heartbeat で延長された等）なら次の期限で登録し直す
+            job_deadlines.schedule(job_id, next_job_deadline(job_info))
 
     removed_count = 0
     removed_job_ids = []
 
     with jobs_lock:
-        jobs_to_remove = []
-
-        for job_id, job_info in list(jobs.items()):
-            # completed / error / timeout / cancelled / expired を削除対象
-            if job_info.get('status') not in TERMINAL_JOB_STATUSES:
-                continue
-
-            # タイムスタンプを取得
-            end_time = job_info.get('end_time')
-            if end_time is None:
-                # end_timeがない場合はstart_timeから推定（処理時間が長い場合のフォールバック）
-                start_time = job_info.get('start_time', 0)
-                if start_time > 0:
-                    # 開始から30分以上経過していれば削除対象
-                    if current_time - start_time > retention_sec:
-                        jobs_to_remove.append(job_id)
-                continue
-            
-            # 完了/エラーから一定時間経過したジョブを削除対象に
-            if current_time - end_time > retention_sec:
-                jobs_to_remove.append(job_id)
-        
-            # 削除実行
+        # 削除実行
         for job_id in jobs_to_remove:
-            job_info = jobs.get(job_id, {})
-            log_count = len(job_info.get('logs', []))
+            job_info = jobs.get(job_id)
+            if not job_info or job_info.get('status') not in TERMINAL_JOB_STATUSES:
+                continue
+            log_count = getattr(job_info, 'log_count', len(job_info.get('logs') or ()))
             age_sec = current_time - job_info.get('end_time', current_time)
             release_queue_identity_locked(job_id, job_info)
             del jobs[job_id]
@@ -1877,6 +2434,232 @@ def prune_jobs(current_time=None, retention_sec=JOB_RETENTION_SECONDS):
 
     return removed_count
 
+def sync_job_store_once(current_time=None):
+    """
+    共有ストアとローカルジョブを同期する（共有ストア時のみ）。
+
+    - ワーカーの生存を記録し、所有する live ジョブのスナップショットを公開する
+    - 別ワーカー経由の heartbeat（lease 延長）・キャンセル・期限切れをローカルへ取り込む
+    - 全体の空き枠ができていればローカル先頭の開始を試みる
+    """
+    if not job_store.shared:
+        return
+    current_time = current_time or time.time()
+    with jobs_lock:
+        live_ids = job_registry.ids_with_status(*QUEUE_LIVE_STATUSES)
+    states = job_store.heartbeat_owner(live_ids)
+
+    cleanup_targets = []
+    remote_events = []
+    with jobs_lock:
+        for job_id, state in states.items():
+            job_info = jobs.get(job_id)
+            if not job_info or job_info.get('status') != 'queued':
+                continue
+            remote_status = state.get('status')
+            if remote_status == 'cancelled':
+                cleanup_targets.append(cancel_queued_job_locked(job_id, current_time))
+                remote_events.append(('cancelled', job_id, 'remote_cancel'))
+            elif remote_status not in QUEUE_LIVE_STATUSES:
+                if expire_queued_job_locked(job_id, current_time, cleanup_targets, reason='heartbeat_timeout'):
+                    remote_events.append(('job_expired', job_id, 'store_expired'))
+            elif (state.get('lease_expires_at') or 0) > (job_info.get('lease_expires_at') or 0):
+                job_info['lease_expires_at'] = state['lease_expires_at']
+                job_info['last_heartbeat_at'] = state['lease_expires_at'] - QUEUE_HEARTBEAT_TIMEOUT_SEC
+                job_info['disconnect_hint_at'] = None
+                job_info['client_attached'] = True
+
+        publish_ids = set(job_registry.ids_with_status(*QUEUE_LIVE_STATUSES))
+        pending = set(_job_store_pending_publish)
+        _job_store_pending_publish.difference_update(pending)
+        publish_ids.update(pending)
+        snapshots = [
+            (job_id, build_job_status_payload_locked(job_id, jobs[job_id], last_n=JOB_STORE_SNAPSHOT_LOGS))
+            for job_id in publish_ids
+            if job_id in jobs
+        ]
+        has_waiting = bool(job_queue)
+
+    for job_id, snapshot in snapshots:
+        job_store.publish(job_id, snapshot)
+
+    for fp, sid in cleanup_targets:
+        try:
+            if fp and os.path.exists(fp):
+                os.remove(fp)
+            if sid:
+                cleanup_user_session(sid)
+                unregister_session(sid)
+        except Exception as cleanup_error:
+            logger.warning(f"job_store_sync_cleanup_error error={cleanup_error}")
+    for event, job_id, reason in remote_events:
+        log_job_event(event, job_id, status='cancelled' if event == 'cancelled' else 'expired', extra={'reason': reason})
+
+    if has_waiting:
+        maybe_start_next_job()
+
+
+def cleanup_expired_sessions_once(current_time=None, max_age_sec=SESSION_MAX_AGE_SEC):
+    """登録から max_age_sec 以上経過したセッションを解除し、一時ディレクトリを削除する。
+
+    /cleanup-sessions とメンテナンススレッドの共通処理。(削除件数, 残り件数) を返す。
+    """
+    if current_time is None:
+        current_time = time.time()
+    expired_sessions = []
+    with session_manager['session_lock']:
+        for session_id, session_info in list(session_manager['active_sessions'].items()):
+            if current_time - session_info['start_time'] > max_age_sec:
+                expired_sessions.append(session_id)
+                del session_manager['active_sessions'][session_id]
+        remaining = len(session_manager['active_sessions'])
+
+    for session_id in expired_sessions:
+        cleanup_user_session(session_id)
+    if expired_sessions:
+        logger.info(f"session_cleanup expired={len(expired_sessions)} remaining={remaining}")
+    return len(expired_sessions), remaining
+
+
+def count_expired_sessions(current_time=None, max_age_sec=SESSION_MAX_AGE_SEC):
+    if current_time is None:
+        current_time = time.time()
+    with session_manager['session_lock']:
+        return sum(
+            1 for session_info in session_manager['active_sessions'].values()
+            if current_time - session_info['start_time'] > max_age_sec
+        )
+
+
+def _referenced_session_ids():
+    """このワーカーでまだ参照されている session_id（ジョブ・登録セッション）。"""
+    with jobs_lock:
+        session_ids = {job_info.get('session_id') for job_info in jobs.values() if job_info.get('session_id')}
+    with session_manager['session_lock']:
+        session_ids.update(session_manager['active_sessions'])
+    return session_ids
+
+
+def _iter_orphan_temp_paths(current_time, max_age_sec):
+    """どのジョブ・セッションからも参照されていない古い jobcan_session_* ディレクトリ。
+
+    /tmp は全ワーカーで共有されるため、他ワーカーのジョブを消さないよう
+    判定は mtime が max_age_sec（待機上限 + 実行上限 + 保持期間より長い）を超えたものに限る。
+    """
+    referenced = _referenced_session_ids()
+    temp_root = tempfile.gettempdir()
+    try:
+        entries = list(os.scandir(temp_root))
+    except OSError:
+        entries = []
+    for entry in entries:
+        if not entry.name.startswith('jobcan_session_'):
+            continue
+        if entry.name[len('jobcan_session_'):] in referenced:
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False) and current_time - entry.stat(follow_symlinks=False).st_mtime > max_age_sec:
+                yield entry.path
+        except OSError:
+            continue
+
+
+def sweep_temp_files_once(current_time=None, max_age_sec=None):
+    """異常終了などで取り残されたセッション一時ディレクトリを削除する。削除件数を返す。"""
+    if current_time is None:
+        current_time = time.time()
+    if max_age_sec is None:
+        max_age_sec = TEMP_SWEEP_MAX_AGE_SEC
+    removed = 0
+    for path in list(_iter_orphan_temp_paths(current_time, max_age_sec)):
+        try:
+            shutil.rmtree(path)
+            removed += 1
+        except OSError as sweep_error:
+            logger.warning(f"temp_sweep_error path={path} error={sweep_error}")
+    if removed:
+        logger.info(f"temp_sweep removed={removed}")
+    return removed
+
+
+# === メンテナンススレッド（ワーカーごとに 1 本） ===
+# 以前は before_request（5分ごと）と get_status（30秒ごと）がリクエスト処理中に prune_jobs を呼んでいたが、
+# ファイル削除を含むため当たったリクエストだけ遅くなっていた。定期処理はすべてこのスレッドで行う。
+from lib.maintenance import MaintenanceRunner
+maintenance_runner = MaintenanceRunner(name='jobcan-maintenance')
+maintenance_runner.add_task(
+    'prune_jobs', prune_jobs, MAINTENANCE_PRUNE_INTERVAL_SEC,
+    backlog=lambda: job_deadlines.count_due(time.time()),
+)
+maintenance_runner.add_task(
+    'session_cleanup', cleanup_expired_sessions_once, MAINTENANCE_SESSION_CLEANUP_INTERVAL_SEC,
+    backlog=count_expired_sessions,
+)
+maintenance_runner.add_task('temp_sweep', sweep_temp_files_once, MAINTENANCE_TEMP_SWEEP_INTERVAL_SEC)
+maintenance_runner.add_task('admission_sample', sample_admission_once, ADMISSION_SAMPLE_INTERVAL_SEC, initial_delay_sec=0)
+# レート制限の期限切れキー（挿入時の掃除で取り残された分）をまとめて捨てる
+maintenance_runner.add_task('rate_limit_sweep', _rate_limiter.sweep, MAINTENANCE_RATE_LIMIT_SWEEP_INTERVAL_SEC, backlog=lambda: len(_rate_limiter))
+# Amazon 検索結果キャッシュの猶予切れエントリ（読まれないまま残った分）を捨てる
+maintenance_runner.add_task('amazon_cache_sweep', sweep_amazon_search_cache, MAINTENANCE_AMAZON_CACHE_SWEEP_INTERVAL_SEC)
+if job_store.shared:
+    # 共有ストア時のみ、heartbeat・リモート取消・スナップショット公開を同じスレッドで行う
+    maintenance_runner.add_task('job_store_sync', sync_job_store_once, JOB_STORE_SYNC_INTERVAL_SEC)
+
+
+# リソース計測は prune 等の重い処理に遅らされないよう別スレッド（同じ MaintenanceRunner を 1 タスクで使う）
+resource_sampler_runner = MaintenanceRunner(name='jobcan-resource-sampler', max_sleep_sec=RESOURCE_SAMPLE_INTERVAL_SEC)
+resource_sampler_runner.add_task(
+    'resource_sample', resource_sampler.sample_once, RESOURCE_SAMPLE_INTERVAL_SEC, initial_delay_sec=0,
+)
+
+
+def start_maintenance_thread():
+    if MAINTENANCE_THREAD_ENABLED:
+        maintenance_runner.start()
+        resource_sampler_runner.start()
+
+
+def stop_maintenance_thread(timeout=5.0):
+    """gunicorn の worker_exit / プロセス終了時に呼ぶ。実行中のタスクは完了を待つ。"""
+    maintenance_runner.stop(timeout=timeout)
+    resource_sampler_runner.stop(timeout=timeout)
+
+
+atexit.register(stop_maintenance_thread)
+start_maintenance_thread()
+
+# Amazon のおすすめ枠: 主要ページ（PAGE_CACHE_PATHS）が閲覧履歴なしで表示するときのキーを起動直後に取得しておく。
+# 以降は期限切れでも古い結果を返しつつ裏で更新する（API 無効・認証情報なしなら何もしない）。
+# ワーカーごと・--max-requests の再起動ごとに API を呼ぶことになるため既定は無効
+AMAZON_CACHE_WARM_ON_STARTUP = _env_flag('AMAZON_CACHE_WARM_ON_STARTUP', False)
+
+
+def _amazon_warm_contexts():
+    """inject_env_vars が get_recommendations に渡すのと同じ path / page_type / title / tags"""
+    contexts = []
+    for path in sorted(PAGE_CACHE_PATHS):
+        static_context = get_static_template_context(path)
+        contexts.append({
+            'path': path,
+            'page_type': static_context['affiliate_page_type'],
+            'title': static_context['seo_page_defaults'].get('title', ''),
+            'tags': static_context['_amazon_tags'],
+        })
+    return contexts
+
+
+def warm_amazon_cache_once():
+    try:
+        warm_amazon_recommendation_cache(_amazon_warm_contexts())
+    except Exception as warm_error:
+        logger.warning(f"amazon_cache_warm_failed error={warm_error}")
+
+
+if AMAZON_CACHE_WARM_ON_STARTUP:
+    threading.Thread(target=warm_amazon_cache_once, name='amazon-cache-warm', daemon=True).start()
+startup_profiler.checkpoint('jobs_executor_maintenance')
+
+
 def validate_input_data(email, password, file):
     """入力データの検証"""
     errors = []
@@ -2174,13 +2957,14 @@ def readyz():
         
         # 同時実行数チェック（runningジョブ数で判定）
         running_count = count_running_jobs()
-        if running_count > MAX_ACTIVE_SESSIONS:
-            logger.error(f"max_sessions_exceeded running={running_count} limit={MAX_ACTIVE_SESSIONS}")
-            return Response(f'max sessions exceeded: {running_count}/{MAX_ACTIVE_SESSIONS}', status=503, mimetype='text/plain')
+        slot_limit = get_active_slot_limit()
+        if running_count > slot_limit:
+            logger.error(f"max_sessions_exceeded running={running_count} limit={slot_limit}")
+            return Response(f'max sessions exceeded: {running_count}/{slot_limit}', status=503, mimetype='text/plain')
         
         # リソース使用率をログに記録（詳細版）
         memory_usage_percent = (resources['memory_mb'] / MEMORY_LIMIT_MB) * 100
-        logger.info(f"system_resources memory={resources['memory_mb']:.1f}MB/{MEMORY_LIMIT_MB}MB ({memory_usage_percent:.1f}%) cpu={resources['cpu_percent']:.1f}% running_jobs={running_count}/{MAX_ACTIVE_SESSIONS}")
+        logger.info(f"system_resources memory={resources['memory_mb']:.1f}MB/{MEMORY_LIMIT_MB}MB ({memory_usage_percent:.1f}%) cpu={resources['cpu_percent']:.1f}% running_jobs={running_count}/{slot_limit}")
         
         # メモリ使用率が高い場合は警告
         if memory_usage_percent > 80:
@@ -2214,11 +2998,42 @@ def health():
                 'playwright': playwright_available
             },
             'resources': resources,
-            'active_sessions': len(session_manager['active_sessions'])
+            'active_sessions': len(session_manager['active_sessions']),
+            'maintenance_running': maintenance_runner.is_running(),
         })
     except Exception as e:
         return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
 
+@app.route('/health/maintenance')
+def health_maintenance():
+    """メンテナンススレッドの状態（各タスクの前回所要時間・失敗回数・未処理件数）"""
+    snapshot = maintenance_runner.snapshot()
+    snapshot['status'] = 'ok' if snapshot['running'] or not MAINTENANCE_THREAD_ENABLED else 'stopped'
+    snapshot['enabled'] = MAINTENANCE_THREAD_ENABLED
+    snapshot['timestamp'] = datetime.now().isoformat()
+    snapshot['scheduled_job_deadlines'] = len(job_deadlines)
+    snapshot['rate_limiter'] = _rate_limiter.describe()
+    snapshot['template_context_cache'] = describe_template_context_cache()
+    snapshot['page_cache'] = dict(page_cache.describe(), enabled=PAGE_CACHE_ENABLED)
+    snapshot['crawler_documents'] = describe_crawler_documents()
+    snapshot['amazon_search_cache'] = describe_amazon_search_cache()
+    snapshot['amazon_circuit_breaker'] = describe_amazon_circuit_breaker()
+    return jsonify(snapshot), (200 if snapshot['status'] == 'ok' else 503)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 形式のメトリクス。METRICS_TOKEN 未設定なら 404、Bearer トークン不一致なら 401"""
+    if not METRICS_TOKEN:
+        return Response('Not Found', status=404, mimetype='text/plain')
+    auth_header = request.headers.get('Authorization') or ''
+    scheme, _, token = auth_header.partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode('utf-8'), METRICS_TOKEN.encode('utf-8')):
+        return Response('Unauthorized', status=401, mimetype='text/plain', headers={'WWW-Authenticate': 'Bearer'})
+    response = Response(metrics.registry.render(), status=200)
+    response.headers['Content-Type'] = metrics.PROMETHEUS_CONTENT_TYPE
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @app.route('/ready')
 def ready():
     """後方互換 - 既存依存関係チェック"""
@@ -2240,22 +3055,12 @@ def health_memory():
     ローカル/ステージング環境でメモリ使用状況を確認するためのエンドポイント
     """
     try:
-        import psutil
-        process = psutil.Process()
-        memory_info = process.memory_info()
-        rss_mb = memory_info.rss / 1024 / 1024
-        vms_mb = memory_info.vms / 1024 / 1024
-        
-        # システム全体のメモリ情報も取得
-        system_memory = psutil.virtual_memory()
+        # プロセス・システム全体のメモリはリソースサンプラーの直近値
+        snapshot = resource_sampler.latest()
         
         # ジョブとセッションの統計
-        with jobs_lock:
-            jobs_count = len(jobs)
-            jobs_status = {}
-            for job_id, job_info in jobs.items():
-                status = job_info.get('status', 'unknown')
-                jobs_status[status] = jobs_status.get(status, 0) + 1
+        jobs_count = len(jobs)
+        jobs_status = job_registry.status_counts()
         
         with session_manager['session_lock']:
             sessions_count = len(session_manager['active_sessions'])
@@ -2267,22 +3072,29 @@ def health_memory():
             'status': 'ok',
             'timestamp': datetime.now().isoformat(),
             'process_memory': {
-                'rss_mb': round(rss_mb, 2),
-                'vms_mb': round(vms_mb, 2),
-                'percent': round(process.memory_percent(), 2)
+                'rss_mb': round(snapshot['memory_mb'], 2),
+                'vms_mb': round(snapshot['vms_mb'], 2),
+                'percent': round(snapshot['memory_percent'], 2),
+                'cpu_percent': round(snapshot['cpu_percent'], 2),
+                'children_count': snapshot['children_count'],
+                'children_rss_mb': round(snapshot['children_rss_mb'], 2),
+                'sampled_at': snapshot['sampled_at']
             },
             'system_memory': {
-                'total_mb': round(system_memory.total / 1024 / 1024, 2),
-                'available_mb': round(system_memory.available / 1024 / 1024, 2),
-                'used_mb': round(system_memory.used / 1024 / 1024, 2),
-                'percent': round(system_memory.percent, 2)
+                'total_mb': round(snapshot['system_total_mb'], 2),
+                'available_mb': round(snapshot['system_available_mb'], 2),
+                'used_mb': round(snapshot['system_used_mb'], 2),
+                'percent': round(snapshot['system_percent'], 2)
             },
+            'resource_sampler': resource_sampler.describe(),
             'limits': {
                 'memory_limit_mb': MEMORY_LIMIT_MB,
                 'memory_warning_mb': MEMORY_WARNING_MB,
                 'max_file_size_mb': MAX_FILE_SIZE_MB,
-                'max_active_sessions': MAX_ACTIVE_SESSIONS
+                'max_active_sessions': MAX_ACTIVE_SESSIONS,
+                'active_slot_limit': get_active_slot_limit()
             },
+            'admission': describe_admission(),
             'resources': {
                 'jobs_count': jobs_count,
                 'jobs_by_status': jobs_status,
@@ -2376,6 +3188,7 @@ def download_previous_template():
 def upload_file():
     session_id = None
     file_path = None
+    job_id = None
     try:
         # 入力データの検証
         if 'file' not in request.files:
@@ -2423,6 +3236,21 @@ def upload_file():
                 status_code = 202 if existing_job.get('status') == 'queued' else 200
                 return jsonify(existing_payload), status_code
 
+            # 共有ストア: 別ワーカーが受け付けた同一ユーザーのジョブも再利用する
+            remote_job_id, remote_job = find_remote_live_job_locked(queue_key)
+            if remote_job_id:
+                job_store.touch(remote_job_id, time.time() + QUEUE_HEARTBEAT_TIMEOUT_SEC)
+                remote_payload = build_existing_job_response_locked(remote_job_id, remote_job)
+                log_job_event(
+                    "job_reused",
+                    remote_job_id,
+                    status=remote_payload.get('status'),
+                    queue_position=remote_payload.get('queue_position'),
+                    extra={'reason': 'same_user_remote_reuse'}
+                )
+                status_code = 202 if remote_payload.get('status') == 'queued' else 200
+                return jsonify(remote_payload), status_code
+
         # 直列実行＋キュー: running が上限でも 503 にせず、後続で queued に積む（キュー満杯時のみ 503 QUEUE_FULL）
 
         # P0-P1: メモリガード（新規ジョブ開始前チェック）。job_idは未生成のためログには含めない
@@ -2484,10 +3312,15 @@ def upload_file():
                 status_code = 202 if existing_job.get('status') == 'queued' else 200
                 return jsonify(existing_payload), status_code
 
-            compact_job_queue_locked()
-            running_count = sum(1 for j in jobs.values() if j.get('status') == 'running')
-            if running_count >= MAX_ACTIVE_SESSIONS:
-                if len(job_queue) >= MAX_QUEUE_SIZE:
+            admission, running_count, queue_size = job_store.admit(
+                job_id,
+                queue_key,
+                get_active_slot_limit(),
+                MAX_QUEUE_SIZE,
+                time.time() + QUEUE_HEARTBEAT_TIMEOUT_SEC,
+            )
+            if admission in (ADMIT_QUEUED, ADMIT_FULL):
+                if admission == ADMIT_FULL:
                     cleanup_user_session(session_id)
                     if os.path.exists(file_path):
                         try:
@@ -2500,14 +3333,14 @@ def upload_file():
                         'status_code': 503,
                         'retry_after_sec': 60,
                         'queue_limit': MAX_QUEUE_SIZE,
-                        'queue_size': len(job_queue),
+                        'queue_size': queue_size,
                         'running_count': running_count,
-                        'max_active_sessions': MAX_ACTIVE_SESSIONS,
+                        'max_active_sessions': get_active_slot_limit(),
                     }), 503
                 # キューに登録
                 jobs[job_id] = {
                     'status': 'queued',
-                    'logs': deque(maxlen=MAX_JOB_LOGS),
+                    'logs': create_job_log_buffer(),
                     'progress': 0,
                     'step_name': '待機中',
                     'current_data': 0,
@@ -2553,16 +3386,16 @@ def upload_file():
                     'message': '現在、他ユーザーが作業中です。順番に処理します。このまま開いておくと自動で開始します。',
                     'retry_after_sec': 5,
                     'queue_limit': MAX_QUEUE_SIZE,
-                    'queue_size': len(job_queue),
+                    'queue_size': job_store.queue_length(),
                     'running_count': running_count,
-                    'max_active_sessions': MAX_ACTIVE_SESSIONS,
+                    'max_active_sessions': get_active_slot_limit(),
                     'status_url': f'/status/{job_id}'
                 }), 202
             
             # 即時開始
             jobs[job_id] = {
                 'status': 'running',
-                'logs': deque(maxlen=MAX_JOB_LOGS),
+                'logs': create_job_log_buffer(),
                 'progress': 0,
                 'step_name': 'initializing',
                 'current_data': 0,
@@ -2611,6 +3444,12 @@ def upload_file():
         })
         
     except Exception as e:
+        if job_id and job_id not in jobs:
+            # 共有ストアで枠だけ確保された状態を残さない
+            try:
+                job_store.release(job_id, 'error')
+            except Exception:
+                pass
         if file_path and os.path.exists(file_path):
             try:
                 os.remove(file_path)
@@ -2627,29 +3466,24 @@ def upload_file():
 @app.route('/cancel/<job_id>', methods=['POST'])
 def cancel_job(job_id):
     """queued のジョブのみキャンセル可能。running は 409。"""
-    global job_queue
     with jobs_lock:
         if job_id not in jobs:
+            # 共有ストア: 別ワーカーの queued は cancelled にし、後始末は所有ワーカーの同期で行う
+            remote_status = job_store.request_cancel(job_id) if job_store.shared else None
+            if remote_status in ('cancelled', 'expired'):
+                log_job_event("cancelled", job_id, status=remote_status, extra={'remote': True})
+                return jsonify({'ok': True, 'status': remote_status}), 200
+            if remote_status:
+                return jsonify({'ok': False, 'error': '実行中はキャンセルできません。待機中のみキャンセル可能です。', 'status': remote_status}), 409
             return jsonify({'ok': False, 'error': 'ジョブが見つかりません'}), 404
         job = jobs[job_id]
         if job.get('status') in ('cancelled', 'expired'):
             return jsonify({'ok': True, 'status': job.get('status')}), 200
         if job.get('status') != 'queued':
             return jsonify({'ok': False, 'error': '実行中はキャンセルできません。待機中のみキャンセル可能です。', 'status': job.get('status')}), 409
-        # キューから除去
-        job_queue = deque([x for x in job_queue if x != job_id])
-        queued_job_params.pop(job_id, None)
-        jobs[job_id]['status'] = 'cancelled'
-        jobs[job_id]['login_status'] = 'cancelled'
-        jobs[job_id]['end_time'] = time.time()
-        jobs[job_id]['login_message'] = 'キャンセルされました。'
-        jobs[job_id]['last_updated'] = time.time()
-        jobs[job_id]['client_attached'] = False
-        release_queue_identity_locked(job_id, jobs[job_id])
-        fp = job.get('file_path')
-        sid = job.get('session_id')
-        qlen = len(compact_job_queue_locked())
-        rcount = sum(1 for j in jobs.values() if j.get('status') == 'running')
+        fp, sid = cancel_queued_job_locked(job_id)
+        qlen = len(job_queue)
+        rcount = job_registry.running_count()
     elapsed = get_elapsed_sec(job)
     log_job_event("cancelled", job_id, status="cancelled", elapsed_sec=elapsed, queue_length=qlen, running_count=rcount)
     if fp and os.path.exists(fp):
@@ -2689,21 +3523,165 @@ def detach_queue_job(job_id):
     return jsonify({'ok': True, 'status': status}), 200
 
 
+def apply_log_cursor(payload, logs, log_count, since=None, last_n=None):
+    """payload に logs / log_cursor（と since 指定時は差分情報）を設定する。"""
+    truncated = False
+    first_seq = None
+    if since is not None:
+        job_logs, first_seq, truncated = select_logs_since(logs, log_count, since)
+    elif isinstance(logs, list):
+        job_logs = logs
+    elif last_n is not None and isinstance(logs, JobLogBuffer):
+        # 末尾 last_n 件だけコピーする
+        job_logs = logs.tail(last_n)
+    else:
+        job_logs = list(logs) if logs else []
+
+    # P1: ページング対応（最新last_n件のみ返す）
+    if last_n is not None and len(job_logs) > last_n:
+        if first_seq is not None:
+            first_seq += len(job_logs) - last_n
+            truncated = True
+        job_logs = job_logs[-last_n:]
+
+    payload['logs'] = job_logs
+    payload['log_cursor'] = log_count
+    if since is not None:
+        payload['log_since'] = since
+        payload['log_first_seq'] = first_seq
+        payload['logs_truncated'] = truncated
+    return payload
+
+
+def build_job_status_payload_locked(job_id, job, last_n=None, include_logs=True, since=None):
+    """/status のレスポンス本体（resources 以外）を組み立てる。jobs_lock前提。
+
+    include_logs=False のときはログをコピーしない（SSE はログを差分で別イベントとして送る）。
+    since を渡すと、通算 since 件目より後のログだけを返す（log_cursor を次回の since に使う）。
+    """
+    raw_logs = job.get('logs') or ()
+    log_count = getattr(job, 'log_count', len(raw_logs))
+
+    # ログイン結果の詳細情報を取得
+    login_status = job.get('login_status', 'unknown')
+    login_message = job.get('login_message', 'ログイン状態が不明です')
+
+    # ユーザー向けの詳細メッセージを生成
+    user_message = generate_user_message(job['status'], login_status, login_message, job.get('progress', 0))
+
+    # P0-4: 経過秒数を含める（止まった原因の切り分け用）
+    start_ts = job.get('start_time') or 0
+    elapsed_sec = round(time.time() - start_ts, 1) if start_ts else 0
+    # queued のときキュー内位置を算出（jobs_lock 内のため get_queue_position は使わず自前で取得）
+    queue_position = None
+    if job.get('status') == 'queued':
+        queue_position = get_queue_position_locked(job_id)
+    response_data = {
+        'status': job['status'],
+        'progress': job.get('progress', 0),
+        'step_name': job.get('step_name', ''),
+        'current_data': job.get('current_data', 0),
+        'total_data': job.get('total_data', 0),
+        'logs': [],  # apply_log_cursor で設定（ページング・差分対応済み）
+        'start_time': start_ts,
+        'elapsed_sec': elapsed_sec,
+        'login_status': login_status,
+        'login_message': login_message,
+        'user_message': user_message,
+        'session_id': job.get('session_id', ''),
+        'resource_warnings': job.get('resource_warnings', []),
+        'retry_after_sec': 5 if job.get('status') in QUEUE_LIVE_STATUSES else None,
+        'queue_limit': MAX_QUEUE_SIZE,
+        'max_active_sessions': get_active_slot_limit(),
+    }
+    if include_logs:
+        apply_log_cursor(response_data, raw_logs, log_count, since=since, last_n=last_n)
+    else:
+        del response_data['logs']
+        response_data['log_cursor'] = log_count
+    if queue_position is not None:
+        response_data['queue_position'] = queue_position
+    return response_data
+
+
+# ワーカー再起動で version が 0 からやり直しても古い ETag と一致しないよう、プロセスごとの値を混ぜる
+_STATUS_ETAG_EPOCH = uuid.uuid4().hex[:8]
+
+
+def build_job_status_etag_locked(job_id, job, last_n=None, since=None):
+    """
+    /status の ETag（弱い比較用の値）。jobs_lock前提。
+
+    ジョブの version（ログ追記・進捗・ステータス変更で増える）に加え、ジョブ外で変わる
+    キュー内位置と実行枠数、リクエストの last_n / since を含める。
+    version を持たないジョブ（別ワーカー所有のスナップショット等）と error は None（常に本文を返す）。
+    elapsed_sec と resources は 304 の間は前回値のまま（クライアントは start_time から経過を出せる）。
+    """
+    version = getattr(job, 'version', None)
+    if version is None or job.get('status') == 'error':
+        return None
+    queue_position = get_queue_position_locked(job_id) if job.get('status') == 'queued' else 0
+    return (
+        f"{_STATUS_ETAG_EPOCH}-{version}-{queue_position}-{get_active_slot_limit()}"
+        f"-{'' if since is None else since}-{'' if last_n is None else last_n}"
+    )
+
+
+def get_remote_job_status(job_id, current_time):
+    """共有ストア上の別ワーカー所有ジョブのスナップショットを返す。無ければ None。"""
+    if not job_store.shared:
+        return None
+    snapshot = job_store.load(job_id)
+    if not snapshot:
+        return None
+    status = snapshot.get('status')
+    if status in QUEUE_LIVE_STATUSES:
+        # 別ワーカーへのポーリングも heartbeat として扱う（所有ワーカーが次の同期で取り込む）
+        job_store.touch(job_id, current_time + QUEUE_HEARTBEAT_TIMEOUT_SEC)
+    else:
+        snapshot['retry_after_sec'] = None
+    if status == 'queued':
+        snapshot['queue_position'] = job_store.queue_position(job_id)
+    else:
+        snapshot.pop('queue_position', None)
+    snapshot.setdefault('logs', [])
+    snapshot.setdefault('progress', 0)
+    snapshot.setdefault('queue_limit', MAX_QUEUE_SIZE)
+    snapshot.setdefault('max_active_sessions', get_active_slot_limit())
+    snapshot['user_message'] = generate_user_message(
+        status,
+        snapshot.get('login_status', 'unknown'),
+        snapshot.get('login_message', ''),
+        snapshot.get('progress', 0),
+    )
+    snapshot.pop('owner', None)
+    return snapshot
+
+
 @app.route('/status/<job_id>')
 def get_status(job_id):
     try:
-        # P0-3: 完了ジョブの間引きは間隔制御（ポーリング負荷軽減）
-        global _last_status_prune_time
         now = time.time()
-        if now - _last_status_prune_time >= STATUS_PRUNE_INTERVAL_SEC:
-            try:
-                prune_jobs(current_time=now)
-                _last_status_prune_time = now
-            except Exception as prune_err:
-                logger.warning(f"prune_jobs_error in get_status: {prune_err}")
-        
+        # P1: ログページングパラメータを取得
+        last_n = request.args.get('last_n', type=int)
+        if last_n is not None and (last_n < 1 or last_n > 1000):
+            last_n = 1000  # 最大値に制限
+        # 差分取得: 前回レスポンスの log_cursor を since に渡すと新しいログだけを返す
+        since = request.args.get('since', type=int)
+        if since is not None and since < 0:
+            since = 0
+
         with jobs_lock:
             if job_id not in jobs:
+                remote_data = get_remote_job_status(job_id, now)
+                if remote_data is not None:
+                    remote_logs = remote_data.get('logs') or []
+                    apply_log_cursor(
+                        remote_data, remote_logs, remote_data.get('log_cursor', len(remote_logs)),
+                        since=since, last_n=last_n,
+                    )
+                    remote_data['resources'] = get_system_resources()
+                    return jsonify(remote_data), 500 if remote_data.get('status') == 'error' else 200
                 print(f"ジョブが見つかりません: {job_id}")
                 print(f"現在のジョブ一覧: {list(jobs.keys())}")
                 return jsonify({
@@ -2714,31 +3692,18 @@ def get_status(job_id):
             
             job = jobs[job_id]
             if job.get('status') in QUEUE_LIVE_STATUSES:
+                # 304 でもポーリングは heartbeat として扱う（lease 系は version を上げない）
                 touch_job_lease_locked(job, current_time=now)
-            
-            # P1: ログページングパラメータを取得
-            last_n = request.args.get('last_n', type=int)
-            if last_n is not None and (last_n < 1 or last_n > 1000):
-                last_n = 1000  # 最大値に制限
-            
-            # P1: ログを取得（dequeの場合はlistに変換、ページング対応）
-            job_logs = job.get('logs', [])
-            from collections import deque
-            if isinstance(job_logs, deque):
-                job_logs = list(job_logs)
-            elif not isinstance(job_logs, list):
-                job_logs = list(job_logs) if job_logs else []
-            
-            # P1: ページング対応（最新last_n件のみ返す）
-            if last_n is not None and len(job_logs) > last_n:
-                job_logs = job_logs[-last_n:]
-            
-            # ログイン結果の詳細情報を取得
-            login_status = job.get('login_status', 'unknown')
-            login_message = job.get('login_message', 'ログイン状態が不明です')
-            
-            # ユーザー向けの詳細メッセージを生成
-            user_message = generate_user_message(job['status'], login_status, login_message, job.get('progress', 0))
+
+            # 前回から変化が無ければ JSON 組み立てと psutil 呼び出しを省いて 304 を返す
+            etag = build_job_status_etag_locked(job_id, job, last_n=last_n, since=since)
+            if etag is not None and request.if_none_match.contains_weak(etag):
+                not_modified = Response(status=304)
+                not_modified.set_etag(etag, weak=True)
+                not_modified.headers['Cache-Control'] = 'no-cache'
+                return not_modified
+
+            response_data = build_job_status_payload_locked(job_id, job, last_n=last_n, since=since)
             
             # リソース情報を追加（エラーが発生しても処理を続行）
             try:
@@ -2746,44 +3711,17 @@ def get_status(job_id):
             except Exception as resource_error:
                 print(f"リソース情報取得エラー: {resource_error}")
                 resources = {'memory_mb': 0, 'cpu_percent': 0, 'active_sessions': 0}
-            
-            # P0-4: 経過秒数を含める（止まった原因の切り分け用）
-            start_ts = job.get('start_time') or 0
-            elapsed_sec = round(time.time() - start_ts, 1) if start_ts else 0
-            # queued のときキュー内位置を算出（jobs_lock 内のため get_queue_position は使わず自前で取得）
-            queue_position = None
-            if job.get('status') == 'queued':
-                queue_position = get_queue_position_locked(job_id)
-            # レスポンスデータを構築
-            response_data = {
-                'status': job['status'],
-                'progress': job.get('progress', 0),
-                'step_name': job.get('step_name', ''),
-                'current_data': job.get('current_data', 0),
-                'total_data': job.get('total_data', 0),
-                'logs': job_logs,  # P1: ページング対応済みログ
-                'start_time': start_ts,
-                'elapsed_sec': elapsed_sec,
-                'login_status': login_status,
-                'login_message': login_message,
-                'user_message': user_message,
-                'session_id': job.get('session_id', ''),
-                'resources': resources,
-                'resource_warnings': job.get('resource_warnings', []),
-                'retry_after_sec': 5 if job.get('status') in QUEUE_LIVE_STATUSES else None,
-                'queue_limit': MAX_QUEUE_SIZE,
-                'max_active_sessions': MAX_ACTIVE_SESSIONS,
-            }
-            if queue_position is not None:
-                response_data['queue_position'] = queue_position
+            response_data['resources'] = resources
             
             # ステータスに応じたHTTPステータスコードを設定
             if job['status'] == 'error':
                 return jsonify(response_data), 500
-            elif job['status'] == 'completed':
-                return jsonify(response_data), 200
-            else:
-                return jsonify(response_data), 200
+            response = jsonify(response_data)
+            if etag is not None:
+                response.set_etag(etag, weak=True)
+                # ブラウザにも毎回 If-None-Match で再検証させる
+                response.headers['Cache-Control'] = 'no-cache'
+            return response, 200
                 
     except Exception as e:
         print(f"ステータス取得で予期しないエラー: {e}")
@@ -2795,6 +3733,168 @@ def get_status(job_id):
             'login_message': 'システムエラーが発生しました'
         }), 500
 
+# === SSE: /status/<job_id>/stream ===
+# gunicorn の 1 ワーカーあたりのスレッド数は少ない（WEB_THREADS=2）ため、ストリームが全スレッドを
+# 占有しないよう同時本数と 1 接続の長さを制限する。上限超過時は 503 を返し、クライアントはポーリングへ戻る。
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", "1"))
+SSE_MAX_STREAM_SEC = float(os.getenv("SSE_MAX_STREAM_SEC", "60"))
+SSE_KEEPALIVE_SEC = float(os.getenv("SSE_KEEPALIVE_SEC", "15"))
+SSE_HEARTBEAT_INTERVAL_SEC = float(os.getenv("SSE_HEARTBEAT_INTERVAL_SEC", "10"))
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "3000"))
+_sse_slots = threading.BoundedSemaphore(max(0, SSE_MAX_STREAMS)) if SSE_MAX_STREAMS > 0 else None
+
+
+def _sse_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+def get_job_logs_since_locked(job, cursor):
+    """通算 cursor 件目より後に追加されたログ行と、新しい cursor を返す。jobs_lock前提。"""
+    logs = job.get('logs') or ()
+    log_count = getattr(job, 'log_count', len(logs))
+    entries, _, _ = select_logs_since(logs, log_count, cursor)
+    return entries, log_count
+
+
+def _parse_sse_cursor():
+    raw = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        return max(0, int(raw)) if raw is not None else 0
+    except ValueError:
+        return 0
+
+
+def _mark_stream_disconnected(job_id):
+    """ストリームが切れたら /api/queue/detach と同じく disconnect hint を立てる（再接続すれば解除）。"""
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if not job or job.get('status') not in QUEUE_LIVE_STATUSES:
+            return
+        current_time = time.time()
+        job['disconnect_hint_at'] = current_time
+        job['client_attached'] = False
+        job['last_updated'] = current_time
+
+
+def _generate_job_stream(job_id, cursor):
+    started_at = time.time()
+    last_sent_at = started_at
+    last_touch_at = 0.0
+    sent_signature = None
+    finished = False
+    yield f"retry: {SSE_RETRY_MS}\n\n"
+    try:
+        while True:
+            now = time.time()
+            events = []
+            with jobs_lock:
+                job = jobs.get(job_id)
+                if job is None:
+                    events.append(_sse_event('end', {'status': 'missing'}))
+                    finished = True
+                else:
+                    status = job.get('status')
+                    if status in QUEUE_LIVE_STATUSES and now - last_touch_at >= SSE_HEARTBEAT_INTERVAL_SEC:
+                        # 接続が続いている間はこれが heartbeat（ポーリングの touch の代わり）
+                        touch_job_lease_locked(job, current_time=now)
+                        last_touch_at = now
+                    version = job.version
+                    queue_position = get_queue_position_locked(job_id) if status == 'queued' else None
+                    signature = (version, queue_position)
+                    if signature != sent_signature:
+                        new_logs, cursor_after = get_job_logs_since_locked(job, cursor)
+                        if new_logs:
+                            events.append(_sse_event('log', {'lines': new_logs, 'cursor': cursor_after}, cursor_after))
+                        cursor = cursor_after
+                        payload = build_job_status_payload_locked(job_id, job, include_logs=False)
+                        payload['log_cursor'] = cursor
+                        events.append(_sse_event('status', payload, cursor))
+                        sent_signature = signature
+                    if status not in QUEUE_LIVE_STATUSES:
+                        events.append(_sse_event('end', {'status': status}, cursor))
+                        finished = True
+
+            if events:
+                yield ''.join(events)
+                last_sent_at = now
+            if finished:
+                return
+            if now - started_at >= SSE_MAX_STREAM_SEC:
+                # EventSource は切断後 retry ミリ秒で Last-Event-ID 付きで自動再接続する
+                finished = True
+                return
+            if now - last_sent_at >= SSE_KEEPALIVE_SEC:
+                yield ": keepalive\n\n"
+                last_sent_at = now
+            job_registry.wait_for_change(job_id, sent_signature[0] if sent_signature else None, timeout=1.0)
+    finally:
+        if not finished:
+            _mark_stream_disconnected(job_id)
+
+
+@app.route('/status/<job_id>/stream')
+def stream_status(job_id):
+    """ジョブ状態の Server-Sent Events。status / log（新規行のみ）/ end イベントを送る。"""
+    with jobs_lock:
+        exists = job_id in jobs
+    if not exists:
+        if job_store.shared and job_store.load(job_id):
+            # 別ワーカー所有のジョブはポーリングで取得する
+            return jsonify({'error': 'stream_unavailable', 'status_url': f'/status/{job_id}'}), 409
+        return jsonify({'error': 'ジョブが見つかりません', 'job_id': job_id}), 404
+
+    if _sse_slots is None or not _sse_slots.acquire(blocking=False):
+        response = jsonify({'error': 'stream_busy', 'status_url': f'/status/{job_id}'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    released = []
+
+    def release_slot():
+        if not released:
+            released.append(True)
+            _sse_slots.release()
+
+    try:
+        response = Response(_generate_job_stream(job_id, _parse_sse_cursor()), mimetype='text/event-stream')
+    except Exception:
+        release_slot()
+        raise
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(release_slot)
+    return response
+
+
+@app.route('/status/<job_id>/logs.jsonl')
+def export_job_logs(job_id):
+    """ジョブログを JSON Lines（1 行 1 レコード: seq / ts / level / message）で返す。?since= で続きだけ。"""
+    since = request.args.get('since', type=int) or 0
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            if job_store.shared and job_store.load(job_id):
+                # 別ワーカー所有のジョブは整形済みの行しか無いので /status で取得する
+                return jsonify({'error': 'export_unavailable', 'status_url': f'/status/{job_id}'}), 409
+            return jsonify({'error': 'ジョブが見つかりません', 'job_id': job_id}), 404
+        logs = job.get('logs')
+        if not isinstance(logs, JobLogBuffer):
+            logs = create_job_log_buffer(logs or (), total_count=job.log_count)
+        # ロック内では参照のコピーだけ取り、整形（マスク・時刻）はロック外で行う
+        seq_records = logs.records_since(max(0, since))
+        log_cursor = logs.total_count
+    response = Response(records_to_jsonl(seq_records), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Log-Cursor'] = str(log_cursor)
+    return response
+
+
 @app.route('/sessions')
 def get_active_sessions():
     """アクティブセッション情報を取得"""
@@ -2802,17 +3902,15 @@ def get_active_sessions():
         with session_manager['session_lock']:
             active_sessions = session_manager['active_sessions'].copy()
         with jobs_lock:
-            compact_job_queue_locked()
-            queued_jobs = [job_id for job_id in job_queue if jobs.get(job_id, {}).get('status') == 'queued']
+            queued_jobs = list(job_queue)
+            now = time.time()
             stale_waiting = [
-                job_id for job_id, job_info in jobs.items()
-                if job_info.get('status') == 'queued'
-                and (job_info.get('lease_expires_at') or 0) < time.time()
+                job_id for job_id in job_registry.ids_with_status('queued')
+                if (jobs[job_id].get('lease_expires_at') or 0) < now
             ]
             detached_active = [
-                job_id for job_id, job_info in jobs.items()
-                if job_info.get('status') == 'running'
-                and not job_info.get('client_attached', True)
+                job_id for job_id in job_registry.ids_with_status('running')
+                if not jobs[job_id].get('client_attached', True)
             ]
         
         resources = get_system_resources()
@@ -2833,7 +3931,12 @@ def get_active_sessions():
                 'queued_jobs': len(queued_jobs),
                 'stale_waiting_candidates': len(stale_waiting),
                 'detached_active_jobs': len(detached_active),
+                'global_queued_jobs': job_store.queue_length(),
+                'global_running_jobs': job_store.running_count(),
+                'store': job_store.describe(),
             },
+            'admission': describe_admission(),
+            'executor': job_executor.describe() if job_executor is not None else {'mode': 'thread'},
             'resources': resources,
             'warnings': warnings
         })
@@ -2842,26 +3945,13 @@ def get_active_sessions():
 
 @app.route('/cleanup-sessions')
 def cleanup_expired_sessions():
-    """期限切れセッションのクリーンアップ"""
+    """期限切れセッションのクリーンアップ（通常はメンテナンススレッドが定期実行する）"""
     try:
-        current_time = time.time()
-        expired_sessions = []
-        
-        with session_manager['session_lock']:
-            for session_id, session_info in list(session_manager['active_sessions'].items()):
-                # 30分以上経過したセッションを期限切れとする
-                if current_time - session_info['start_time'] > 1800:
-                    expired_sessions.append(session_id)
-                    del session_manager['active_sessions'][session_id]
-        
-        # 期限切れセッションのクリーンアップ
-        for session_id in expired_sessions:
-            cleanup_user_session(session_id)
-        
+        cleaned, remaining = cleanup_expired_sessions_once()
         return jsonify({
-            'cleaned_sessions': len(expired_sessions),
-            'remaining_sessions': len(session_manager['active_sessions']),
-            'message': f'{len(expired_sessions)}個のセッションをクリーンアップしました'
+            'cleaned_sessions': cleaned,
+            'remaining_sessions': remaining,
+            'message': f'{cleaned}個のセッションをクリーンアップしました'
         })
     except Exception as e:
         return jsonify({'error': f'セッションクリーンアップエラー: {str(e)}'})
@@ -2905,9 +3995,12 @@ def ads_txt():
 
 @app.route('/robots.txt')
 def robots_txt():
-    """robots.txt を配信（Sitemap 行は BASE_URL から動的生成）"""
-    base_url = (os.getenv('BASE_URL') or 'https://jobcan-automation.onrender.com').rstrip('/')
-    content = f"""User-agent: *
+    """robots.txt を配信（Sitemap 行は BASE_URL から動的生成）。本文は生成済みのキャッシュを返す。"""
+    return _crawler_document_response('robots.txt')
+
+
+def _build_robots_txt(base_url):
+    return f"""User-agent: *
 Allow: /
 Disallow: /status/
 Disallow: /api/
@@ -2936,9 +4029,9 @@ Disallow: /cleanup-sessions
 
 Sitemap: {base_url}/sitemap.xml
 """
-    return Response(content, mimetype='text/plain')
 
 _SITEMAP_LASTMOD_MANIFEST = None
+SITEMAP_LASTMOD_MANIFEST_PATH = os.path.join(app.root_path, 'data', 'sitemap_lastmod.json')
 
 
 def _load_sitemap_lastmod_manifest():
@@ -2946,10 +4039,8 @@ def _load_sitemap_lastmod_manifest():
     global _SITEMAP_LASTMOD_MANIFEST
     if _SITEMAP_LASTMOD_MANIFEST is not None:
         return _SITEMAP_LASTMOD_MANIFEST
-    import json
-    manifest_path = os.path.join(app.root_path, 'data', 'sitemap_lastmod.json')
     try:
-        with open(manifest_path, 'r', encoding='utf-8') as f:
+        with open(SITEMAP_LASTMOD_MANIFEST_PATH, 'r', encoding='utf-8') as f:
             _SITEMAP_LASTMOD_MANIFEST = json.load(f)
     except (OSError, TypeError, json.JSONDecodeError):
         _SITEMAP_LASTMOD_MANIFEST = {}
@@ -2983,22 +4074,13 @@ def _sitemap_lastmod_for_path(url_path):
         return None
 
 
-@app.route('/sitemap.xml')
-def sitemap():
-    from datetime import datetime
-
-    base_url = (os.getenv('BASE_URL') or 'https://jobcan-automation.onrender.com').rstrip('/')
-    today = datetime.now().strftime('%Y-%m-%d')
-    urls = [
-        (url_path, changefreq, priority, today)
-        for url_path, changefreq, priority in SIMPLIFIED_SITEMAP_URLS
-    ]
+def _build_sitemap_xml(base_url, today):
     xml_parts = [
         '<?xml version="1.0" encoding="UTF-8"?>',
         '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
     ]
-    for url_path, changefreq, priority, lastmod_default in urls:
-        lastmod = _sitemap_lastmod_for_path(url_path) or lastmod_default
+    for url_path, changefreq, priority in SIMPLIFIED_SITEMAP_URLS:
+        lastmod = _sitemap_lastmod_for_path(url_path) or today
         xml_parts.append('  <url>')
         xml_parts.append(f'    <loc>{base_url + url_path}</loc>')
         xml_parts.append(f'    <changefreq>{changefreq}</changefreq>')
@@ -3006,7 +4088,111 @@ def sitemap():
         xml_parts.append(f'    <lastmod>{lastmod}</lastmod>')
         xml_parts.append('  </url>')
     xml_parts.append('</urlset>')
-    return Response('\n'.join(xml_parts), mimetype='application/xml')
+    return '\n'.join(xml_parts)
+
+
+# sitemap.xml / robots.txt は生成済みのバイト列・ETag・Last-Modified を保持して返す。
+# 世代（generation）は reload_crawler_documents() のたびに進み、メンテナンススレッドが
+# data/sitemap_lastmod.json の更新と日付の変わり目（lastmod の既定値が当日のため）を検知して呼ぶ。
+_CRAWLER_DOCUMENT_BUILDERS = {
+    'robots.txt': ('text/plain', lambda base_url, today: _build_robots_txt(base_url)),
+    'sitemap.xml': ('application/xml', _build_sitemap_xml),
+}
+CRAWLER_DOCUMENT_MAX_AGE_SEC = int(os.getenv('CRAWLER_DOCUMENT_MAX_AGE_SEC', '3600'))
+MAINTENANCE_CRAWLER_DOCS_INTERVAL_SEC = float(os.getenv('MAINTENANCE_CRAWLER_DOCS_INTERVAL_SEC', '60'))
+_crawler_documents = {}
+_crawler_documents_lock = threading.Lock()
+_crawler_documents_state = {'generation': 0, 'source_key': None, 'builds': 0}
+
+
+def _sitemap_manifest_stat():
+    try:
+        stat = os.stat(SITEMAP_LASTMOD_MANIFEST_PATH)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def _crawler_documents_source_key():
+    """生成結果に影響する入力（manifest の更新時刻・サイズと当日の日付）。"""
+    return (_sitemap_manifest_stat(), datetime.now().strftime('%Y-%m-%d'))
+
+
+def reload_crawler_documents(reason='manual'):
+    """生成済みの sitemap.xml / robots.txt と lastmod manifest を捨て、世代を進める（次のリクエストで再生成）。"""
+    global _SITEMAP_LASTMOD_MANIFEST
+    with _crawler_documents_lock:
+        _SITEMAP_LASTMOD_MANIFEST = None
+        _crawler_documents.clear()
+        _crawler_documents_state['generation'] += 1
+        _crawler_documents_state['source_key'] = _crawler_documents_source_key()
+        generation = _crawler_documents_state['generation']
+    logger.info(f"crawler_documents_reloaded generation={generation} reason={reason}")
+    return generation
+
+
+def refresh_crawler_documents_if_stale():
+    """メンテナンスタスク: manifest の更新・日付の変わり目を検知したら作り直す。作り直したら 1。"""
+    source_key = _crawler_documents_source_key()
+    if source_key == _crawler_documents_state['source_key']:
+        return 0
+    reload_crawler_documents(reason='source_changed')
+    for name in _CRAWLER_DOCUMENT_BUILDERS:
+        _get_crawler_document(name, _crawler_base_url())
+    return 1
+
+
+def _crawler_base_url():
+    return (os.getenv('BASE_URL') or 'https://jobcan-automation.onrender.com').rstrip('/')
+
+
+def _get_crawler_document(name, base_url):
+    """(本文 bytes, mimetype, ETag, Last-Modified) を返す。無ければ生成して保持する。"""
+    key = (name, base_url)
+    document = _crawler_documents.get(key)
+    if document is not None:
+        return document
+    mimetype, builder = _CRAWLER_DOCUMENT_BUILDERS[name]
+    with _crawler_documents_lock:
+        document = _crawler_documents.get(key)
+        if document is not None:
+            return document
+        if _crawler_documents_state['source_key'] is None:
+            _crawler_documents_state['source_key'] = _crawler_documents_source_key()
+        body = builder(base_url, datetime.now().strftime('%Y-%m-%d')).encode('utf-8')
+        # Last-Modified は秒単位（HTTP 日付の精度）
+        document = (body, mimetype, hashlib.sha256(body).hexdigest()[:32], datetime.utcfromtimestamp(int(time.time())))
+        _crawler_documents[key] = document
+        _crawler_documents_state['builds'] += 1
+    return document
+
+
+def _crawler_document_response(name):
+    body, mimetype, etag, last_modified = _get_crawler_document(name, _crawler_base_url())
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = f'public, max-age={CRAWLER_DOCUMENT_MAX_AGE_SEC}'
+    return response.make_conditional(request)
+
+
+def describe_crawler_documents():
+    with _crawler_documents_lock:
+        return {
+            'generation': _crawler_documents_state['generation'],
+            'builds': _crawler_documents_state['builds'],
+            'cached': sorted(name for name, _ in _crawler_documents),
+        }
+
+
+maintenance_runner.add_task(
+    'crawler_docs_refresh', refresh_crawler_documents_if_stale, MAINTENANCE_CRAWLER_DOCS_INTERVAL_SEC,
+)
+
+
+@app.route('/sitemap.xml')
+def sitemap():
+    return _crawler_document_response('sitemap.xml')
 
 def monitor_processing_resources(data_index, total_data):
     """データ処理中のリソース監視（4番目以降で強化）"""
@@ -3032,5 +4218,8 @@ def monitor_processing_resources(data_index, total_data):
         logger.error(f"processing_monitor_failed data={data_index} error={str(e)}")
         raise
 
+startup_profiler.checkpoint('routes')
+startup_profiler.finish()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 5000))) 
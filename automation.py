@@ -29,6 +29,8 @@ except ImportError:
     openpyxl_available = False
 
 # 他のモジュールから関数をインポート
+# （pandas_available / openpyxl_available は上で実際に import できたかで決める。utils 側の値は存在確認だけで、
+#   壊れたパッケージでも True になるため取り込まない）
 from utils import (
     load_excel_data,
     validate_excel_data,
@@ -36,9 +38,8 @@ from utils import (
     normalize_time_format,
     add_job_log,
     update_progress,
-    pandas_available,
-    openpyxl_available
 )
+from lib.metrics import StepTimer
 
 # P1-1, P1-2: 計測ログユーティリティ（循環import回避）
 try:
@@ -697,6 +698,7 @@ def return_to_attendance_safely(page, job_id, jobs):
 
 def perform_actual_data_input(page, data_source, total_data, pandas_available, job_id, jobs):
     """実際のデータ入力を実行"""
+    step_timer = StepTimer()
     try:
         add_job_log(job_id, "🎯 実際のデータ入力処理を開始します", jobs)
         
@@ -726,7 +728,7 @@ def perform_actual_data_input(page, data_source, total_data, pandas_available, j
                     
                     date_str, year, month, day = extract_date_info(date)
                     processed_count += 1
-                    add_job_log(job_id, f"📝 データ {processed_count}/{total_data}: {date_str} {start_time}-{end_time}", jobs)
+                    add_job_log(job_id, "📝 データ %s/%s: %s %s-%s", jobs, processed_count, total_data, date_str, start_time, end_time)
                     
                     # リソース監視（4番目以降で強化）
                     try:
@@ -740,9 +742,12 @@ def perform_actual_data_input(page, data_source, total_data, pandas_available, j
                     end_time_4digit = convert_time_to_4digit(end_time)
                     end_time_4digit = adjust_overnight_end_time(start_time_4digit, end_time_4digit)
                     
+                    # 行ごとの所要時間（/metrics の jobcan_automation_step_seconds）
+                    step_timer.start_row()
+
                     # 打刻修正ページに移動
                     modify_url = f"https://ssl.jobcan.jp/employee/adit/modify?year={year}&month={month}&day={day}"
-                    add_job_log(job_id, f"🔗 打刻修正ページに移動: {modify_url}", jobs)
+                    add_job_log(job_id, "🔗 打刻修正ページに移動: %s", jobs, modify_url)
                     
                     try:
                         page.goto(modify_url, timeout=30000)
@@ -751,6 +756,7 @@ def perform_actual_data_input(page, data_source, total_data, pandas_available, j
                         # 人間らしい待機
                         human_like_wait()
                         add_job_log(job_id, "✅ 打刻修正ページアクセス完了", jobs)
+                        step_timer.mark('navigate')
                     except Exception as e:
                         add_job_log(job_id, f"❌ 打刻修正ページアクセスエラー: {e}", jobs)
                         continue
@@ -763,11 +769,13 @@ def perform_actual_data_input(page, data_source, total_data, pandas_available, j
                     except Exception as e:
                         add_job_log(job_id, f"⚠️ 時刻入力フィールドの読み込みタイムアウト: {e}", jobs)
                     
+                    step_timer.mark('wait_inputs')
+
                     # 1つの入力フィールドを取得
                     time_input = page.locator('input[type="text"]').first
                     
                     # 1回目: 始業時刻を人間らしく入力して打刻
-                    add_job_log(job_id, f"⏰ 1回目: 始業時刻を入力: {start_time_4digit}", jobs)
+                    add_job_log(job_id, "⏰ 1回目: 始業時刻を入力: %s", jobs, start_time_4digit)
                     try:
                         # 人間らしいタイピングで入力
                         if not human_like_typing(page, 'input[type="text"]', start_time_4digit, job_id, jobs):
@@ -836,12 +844,13 @@ def perform_actual_data_input(page, data_source, total_data, pandas_available, j
                     if not first_punch_success:
                         add_job_log(job_id, "❌ 1回目: 打刻ボタンが見つかりません", jobs)
                         continue # 1回目の打刻に失敗した場合は次のデータへ
+                    step_timer.mark('first_punch')
                     
                     # 人間らしい待機
                     human_like_wait()
                     
                     # 2回目: 終業時刻を人間らしく入力して打刻
-                    add_job_log(job_id, f"⏰ 2回目: 終業時刻を入力: {end_time_4digit}", jobs)
+                    add_job_log(job_id, "⏰ 2回目: 終業時刻を入力: %s", jobs, end_time_4digit)
                     try:
                         # 人間らしいタイピングで入力
                         if not human_like_typing(page, 'input[type="text"]', end_time_4digit, job_id, jobs):
@@ -910,11 +919,15 @@ def perform_actual_data_input(page, data_source, total_data, pandas_available, j
                         add_job_log(job_id, "⚠️ 2回目: 打刻ボタンが見つかりません（想定通りの処理構造です）", jobs)
                         # 2回目の打刻に失敗しても処理は継続
                     
+                    step_timer.mark('second_punch')
+
                     # データ処理完了ログを出力
-                    add_job_log(job_id, f"✅ データ {processed_count}/{total_data} の処理が完了しました: {date_str}", jobs)
+                    add_job_log(job_id, "✅ データ %s/%s の処理が完了しました: %s", jobs, processed_count, total_data, date_str)
                     
                     # 出勤簿ページに戻る（失敗しても次データ処理を継続）
                     return_to_attendance_safely(page, job_id, jobs)
+                    step_timer.mark('return_to_attendance')
+                    step_timer.finish_row()
                     
                     update_progress(job_id, 6, f"勤怠データ入力中 ({processed_count}/{total_data})", jobs, processed_count, total_data)
                     # 処理間隔（4番目以降は長めに待機）
@@ -976,16 +989,19 @@ def perform_actual_data_input(page, data_source, total_data, pandas_available, j
                     
                     date_str, year, month, day = extract_date_info(date)
                     processed_count += 1
-                    add_job_log(job_id, f"📝 データ {processed_count}/{total_data}: {date_str} {start_time}-{end_time}", jobs)
+                    add_job_log(job_id, "📝 データ %s/%s: %s %s-%s", jobs, processed_count, total_data, date_str, start_time, end_time)
                     
                     # 時刻を4桁形式に変換
                     start_time_4digit = convert_time_to_4digit(start_time)
                     end_time_4digit = convert_time_to_4digit(end_time)
                     end_time_4digit = adjust_overnight_end_time(start_time_4digit, end_time_4digit)
                     
+                    # 行ごとの所要時間（/metrics の jobcan_automation_step_seconds）
+                    step_timer.start_row()
+
                     # 打刻修正ページに移動
                     modify_url = f"https://ssl.jobcan.jp/employee/adit/modify?year={year}&month={month}&day={day}"
-                    add_job_log(job_id, f"🔗 打刻修正ページに移動: {modify_url}", jobs)
+                    add_job_log(job_id, "🔗 打刻修正ページに移動: %s", jobs, modify_url)
                     
                     try:
                         page.goto(modify_url, timeout=30000)
@@ -994,6 +1010,7 @@ def perform_actual_data_input(page, data_source, total_data, pandas_available, j
                         # 人間らしい待機
                         human_like_wait()
                         add_job_log(job_id, "✅ 打刻修正ページアクセス完了", jobs)
+                        step_timer.mark('navigate')
                     except Exception as e:
                         add_job_log(job_id, f"❌ 打刻修正ページアクセスエラー: {e}", jobs)
                         continue
@@ -1006,11 +1023,13 @@ def perform_actual_data_input(page, data_source, total_data, pandas_available, j
                     except Exception as e:
                         add_job_log(job_id, f"⚠️ 時刻入力フィールドの読み込みタイムアウト: {e}", jobs)
                     
+                    step_timer.mark('wait_inputs')
+
                     # 1つの入力フィールドを取得
                     time_input = page.locator('input[type="text"]').first
                     
                     # 1回目: 始業時刻を人間らしく入力して打刻
-                    add_job_log(job_id, f"⏰ 1回目: 始業時刻を入力: {start_time_4digit}", jobs)
+                    add_job_log(job_id, "⏰ 1回目: 始業時刻を入力: %s", jobs, start_time_4digit)
                     try:
                         # 人間らしいタイピングで入力
                         if not human_like_typing(page, 'input[type="text"]', start_time_4digit, job_id, jobs):
@@ -1076,12 +1095,13 @@ def perform_actual_data_input(page, data_source, total_data, pandas_available, j
                     if not first_punch_success:
                         add_job_log(job_id, "❌ 1回目: 打刻ボタンが見つかりません", jobs)
                         continue # 1回目の打刻に失敗した場合は次のデータへ
+                    step_timer.mark('first_punch')
                     
                     # 人間らしい待機
                     human_like_wait()
                     
                     # 2回目: 終業時刻を人間らしく入力して打刻
-                    add_job_log(job_id, f"⏰ 2回目: 終業時刻を入力: {end_time_4digit}", jobs)
+                    add_job_log(job_id, "⏰ 2回目: 終業時刻を入力: %s", jobs, end_time_4digit)
                     try:
                         # 人間らしいタイピングで入力
                         if not human_like_typing(page, 'input[type="text"]', end_time_4digit, job_id, jobs):
@@ -1150,11 +1170,15 @@ def perform_actual_data_input(page, data_source, total_data, pandas_available, j
                         add_job_log(job_id, "⚠️ 2回目: 打刻ボタンが見つかりません（想定通りの処理構造です）", jobs)
                         # 2回目の打刻に失敗しても処理は継続
                     
+                    step_timer.mark('second_punch')
+
                     # データ処理完了ログを出力
-                    add_job_log(job_id, f"✅ データ {processed_count}/{total_data} の処理が完了しました: {date_str}", jobs)
+                    add_job_log(job_id, "✅ データ %s/%s の処理が完了しました: %s", jobs, processed_count, total_data, date_str)
                     
                     # 出勤簿ページに戻る（失敗しても次データ処理を継続）
                     return_to_attendance_safely(page, job_id, jobs)
+                    step_timer.mark('return_to_attendance')
+                    step_timer.finish_row()
                     
                     update_progress(job_id, 6, f"勤怠データ入力中 ({processed_count}/{total_data})", jobs, processed_count, total_data)
                     # 処理間隔（4番目以降は長めに待機）
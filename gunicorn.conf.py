@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn のフック設定（起動オプションは Dockerfile / Procfile の引数で指定）。
+
+gunicorn は作業ディレクトリの gunicorn.conf.py を自動で読み込む。
+"""
+import sys
+
+
+def worker_exit(server, worker):
+    """ワーカー終了時（max-requests による再起動・SIGTERM）にメンテナンススレッドと子プロセスを止める。"""
+    app_module = sys.modules.get('app')
+    if app_module is None:
+        return
+    stop = getattr(app_module, 'stop_maintenance_thread', None)
+    if stop is not None:
+        stop(timeout=5.0)
+    # AUTOMATION_EXECUTOR=process の子プロセス（Chromium 含む）を残さない
+    shutdown_executor = getattr(app_module, 'shutdown_job_executor', None)
+    if shutdown_executor is not None:
+        shutdown_executor()
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+メモリ実測にもとづく AutoFill 実行枠（同時実行数）の自動調整。
+
+Playwright のジョブはワーカープロセスの子として Chromium（と driver の node）を起動するため、
+ワーカー自身の RSS だけでは実使用量が見えない。ここではワーカー + 全子孫プロセスの RSS 合計を定期的に測り、
+
+- ジョブが無いときの合計 = ベースライン（EWMA）
+- ジョブ実行中の (合計 - ベースライン) / 実行中件数 = 1 ジョブあたりの使用量（直近の最大値を採用）
+
+として、MEMORY_LIMIT_MB から予約分を引いた残りに何ジョブ入るかで枠数を決める。
+RSS は共有ページを重複計上するので見積もりは保守的（多め）になる。
+枠を減らすのは即時、増やすのは 1 回の計測につき 1 枠ずつ・実際の空きがある場合のみ。
+1 ジョブあたりの実測が 1 件も無いうちは（既定値の見積もりだけでは）1 枠より増やさない。
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil は requirements に含まれる
+    psutil = None
+
+
+def measure_process_tree_rss_mb(process=None):
+    """ワーカー + 子孫プロセスの RSS 合計（MB）と子プロセス数を返す。"""
+    if psutil is None:
+        return 0.0, 0
+    if process is None:
+        process = psutil.Process()
+    total = process.memory_info().rss
+    children = 0
+    for child in process.children(recursive=True):
+        try:
+            total += child.memory_info().rss
+            children += 1
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total / 1024 / 1024, children
+
+
+class AdaptiveAdmissionController:
+    def __init__(self, memory_limit_mb, max_slots, min_slots=1, default_job_mb=300.0,
+                 reserve_mb=50.0, window=60, measure=None):
+        self.memory_limit_mb = float(memory_limit_mb)
+        self.max_slots = int(max_slots)
+        self.min_slots = int(min_slots)
+        self.default_job_mb = float(default_job_mb)
+        self.reserve_mb = float(reserve_mb)
+        self._measure = measure or measure_process_tree_rss_mb
+        self._lock = threading.Lock()
+        self._per_job_samples = deque(maxlen=window)
+        self._baseline_mb = None
+        self._last_tree_mb = None
+        self._last_children = 0
+        self._last_running = 0
+        self._last_sample_at = None
+        self._slots = max(self.min_slots, min(self.max_slots, 1))
+        self._last_reason = 'initial'
+        self._changes = deque(maxlen=20)
+
+    def per_job_mb(self):
+        """1 ジョブあたりの見積もり（MB）。実測が無ければ既定値。"""
+        with self._lock:
+            return self._per_job_mb_locked()
+
+    def _per_job_mb_locked(self):
+        if not self._per_job_samples:
+            return self.default_job_mb
+        return max(self._per_job_samples)
+
+    def slots(self):
+        with self._lock:
+            return self._slots
+
+    def sample(self, running_count, now=None):
+        """現在の使用量を計測して枠数を見直す。新しい枠数を返す。"""
+        if now is None:
+            now = time.time()
+        tree_mb, children = self._measure()
+        with self._lock:
+            self._last_tree_mb = tree_mb
+            self._last_children = children
+            self._last_running = running_count
+            self._last_sample_at = now
+            if running_count <= 0:
+                if self._baseline_mb is None:
+                    self._baseline_mb = tree_mb
+                else:
+                    self._baseline_mb = 0.7 * self._baseline_mb + 0.3 * tree_mb
+            elif self._baseline_mb is not None:
+                observed = (tree_mb - self._baseline_mb) / running_count
+                if observed > 0:
+                    self._per_job_samples.append(observed)
+            return self._recompute_locked(running_count, tree_mb)
+
+    def _recompute_locked(self, running_count, tree_mb):
+        job_mb = max(1.0, self._per_job_mb_locked())
+        baseline = self._baseline_mb if self._baseline_mb is not None else tree_mb
+        budget = self.memory_limit_mb - self.reserve_mb - baseline
+        capacity = int(budget // job_mb) if budget > 0 else 0
+        target = max(self.min_slots, min(self.max_slots, capacity))
+
+        old = self._slots
+        if target < old:
+            new, reason = target, 'shrink_capacity'
+        elif target > old:
+            # 実測済みの 1 ジョブ分が今この瞬間に空いている場合だけ 1 枠ずつ増やす
+            free_now = self.memory_limit_mb - self.reserve_mb - tree_mb
+            if old >= 1 and not self._per_job_samples:
+                new, reason = old, 'hold_unmeasured'
+            elif free_now >= job_mb:
+                new, reason = old + 1, 'grow_headroom'
+            else:
+                new, reason = old, 'hold_no_headroom'
+        else:
+            new, reason = old, 'steady'
+        self._slots = new
+        self._last_reason = reason
+        if new != old:
+            change = {
+                'at': time.time(),
+                'old_slots': old,
+                'new_slots': new,
+                'reason': reason,
+                'per_job_mb': round(job_mb, 1),
+                'baseline_mb': round(baseline, 1),
+                'tree_mb': round(tree_mb, 1),
+                'running': running_count,
+            }
+            self._changes.append(change)
+            logger.info(
+                f"admission_slots_changed old={old} new={new} reason={reason} per_job_mb={job_mb:.1f} "
+                f"baseline_mb={baseline:.1f} tree_mb={tree_mb:.1f} limit_mb={self.memory_limit_mb:.0f} running={running_count}"
+            )
+        return new
+
+    def describe(self):
+        with self._lock:
+            job_mb = self._per_job_mb_locked()
+            return {
+                'slots': self._slots,
+                'min_slots': self.min_slots,
+                'max_slots': self.max_slots,
+                'memory_limit_mb': self.memory_limit_mb,
+                'reserve_mb': self.reserve_mb,
+                'baseline_mb': None if self._baseline_mb is None else round(self._baseline_mb, 1),
+                'per_job_mb': round(job_mb, 1),
+                'per_job_mb_measured': bool(self._per_job_samples),
+                'process_tree_mb': None if self._last_tree_mb is None else round(self._last_tree_mb, 1),
+                'child_processes': self._last_children,
+                'running_at_sample': self._last_running,
+                'last_sample_at': self._last_sample_at,
+                'last_reason': self._last_reason,
+                'recent_changes': list(self._changes),
+            }
@@ -11,15 +11,11 @@ import logging
 import os
 import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
-try:
-    import requests
-except Exception:  # pragma: no cover - fallback for minimal local envs
-    requests = None  # type: ignore
-
 try:
     from zoneinfo import ZoneInfo
 except Exception:  # pragma: no cover
@@ -31,17 +27,49 @@ from lib.amazon_affiliate_map import (
     PAGE_TYPE_KEYWORDS,
     PATH_KEYWORD_RULES,
 )
+from lib.circuit_breaker import HALF_OPEN, CircuitBreaker
+from lib.metrics import AMAZON_API_SECONDS, registry as metrics_registry
+from lib.search_cache import SearchResultCache
 
 logger = logging.getLogger(__name__)
 
 _CACHE_LOCK = threading.Lock()
 _TOKEN_CACHE: Dict[str, object] = {"token": None, "expires_at": 0.0}
-_SEARCH_CACHE: Dict[str, Dict[str, object]] = {}
 _FORBIDDEN_QUERY_FRAGMENTS = ("jobcan autofill |", "jobcan autofill")
 _MAX_SEARCH_QUERY_LEN = 48
+_MAX_SEARCH_KEYWORDS = 6
+# Results cut short by the search deadline are cached briefly so a slow API is retried soon.
+_PARTIAL_RESULT_TTL_SEC = 60
+# After a failed background refresh the stale entry is kept, and refresh is retried after this.
+_REFRESH_RETRY_SEC = 60
+
+CACHE_REFRESH_SECONDS = metrics_registry.histogram(
+    "jobcan_amazon_cache_refresh_seconds",
+    "Background and warm-up refreshes of the Amazon recommendation cache.",
+    ("trigger", "outcome"),
+)
 DEFAULT_FALLBACK_KEYWORDS: List[str] = ["ロジカルシンキング 本", "PDF 編集", "ビジネス書 おすすめ", "タイマー 勉強"]
 
 
+_REQUESTS_MODULE: object = None
+
+
+def _get_requests():
+    """Import requests on the first Creators API call.
+
+    Most pages never call the API (no credentials, or cached results), so importing
+    requests/urllib3/certifi at module load only added cold-start time and RSS to every worker.
+    """
+    global _REQUESTS_MODULE
+    if _REQUESTS_MODULE is None:
+        try:
+            import requests as module
+        except Exception:  # pragma: no cover - fallback for minimal local envs
+            module = False
+        _REQUESTS_MODULE = module
+    return _REQUESTS_MODULE or None
+
+
 def _env_flag(name: str, default: bool = False) -> bool:
     value = os.getenv(name)
     if value is None:
@@ -60,6 +88,51 @@ def _env_int(name: str, default: int) -> int:
         return default
 
 
+# Bounded LRU (entries and estimated bytes) with single-flight loading; see lib/search_cache.py.
+_SEARCH_CACHE = SearchResultCache(
+    max_entries=_env_int("AMAZON_CACHE_MAX_ENTRIES", 512),
+    max_bytes=_env_int("AMAZON_CACHE_MAX_KB", 4096) * 1024,
+)
+
+
+metrics_registry.counter(
+    "jobcan_amazon_cache_lookups_total",
+    "Amazon recommendation cache lookups by result (hit, stale, miss).",
+    ("result",),
+    func=lambda: {
+        ("hit",): _SEARCH_CACHE.hits,
+        ("stale",): _SEARCH_CACHE.stale_hits,
+        ("miss",): _SEARCH_CACHE.misses,
+    },
+)
+metrics_registry.counter(
+    "jobcan_amazon_cache_evictions_total",
+    "Amazon recommendation cache entries dropped, by reason (lru, expired).",
+    ("reason",),
+    func=lambda: {("lru",): _SEARCH_CACHE.evictions, ("expired",): _SEARCH_CACHE.expired},
+)
+metrics_registry.counter(
+    "jobcan_amazon_cache_coalesced_total",
+    "Cache misses that waited for an in-flight fetch of the same key instead of calling the API.",
+    func=lambda: _SEARCH_CACHE.coalesced,
+)
+metrics_registry.gauge("jobcan_amazon_cache_entries", "Entries in the Amazon recommendation cache.", func=lambda: len(_SEARCH_CACHE))
+metrics_registry.gauge(
+    "jobcan_amazon_cache_bytes",
+    "Estimated size of the Amazon recommendation cache.",
+    func=lambda: _SEARCH_CACHE.describe()["bytes"],
+)
+
+
+def sweep_search_cache() -> int:
+    """Drop entries past their stale grace (called from the maintenance thread)."""
+    return _SEARCH_CACHE.sweep()
+
+
+def describe_search_cache() -> Dict[str, object]:
+    return _SEARCH_CACHE.describe()
+
+
 def _version_from_locale(locale: str) -> str:
     normalized = (locale or "co.jp").strip().lower()
     if normalized in {"com", "ca", "mx", "br"}:
@@ -83,6 +156,8 @@ def get_settings() -> Dict[str, object]:
         "client_secret": (os.getenv("AMAZON_CREATORS_CLIENT_SECRET") or "").strip(),
         "associate_tag": (os.getenv("AMAZON_ASSOCIATE_TAG") or "").strip(),
         "cache_ttl_seconds": _env_int("AMAZON_CACHE_TTL_SECONDS", 3300),
+        # Expired entries are still served for this long while a background refresh runs.
+        "cache_stale_grace_seconds": _env_int("AMAZON_CACHE_STALE_GRACE_SECONDS", 21600),
         "max_items": _env_int("AMAZON_MAX_ITEMS", 6),
         "marketplace_locale": locale,
         "marketplace_host": f"www.amazon.{locale}",
@@ -92,6 +167,8 @@ def get_settings() -> Dict[str, object]:
         "version": version,
         "token_endpoint": token_endpoints.get(version, token_endpoints["2.3"]),
         "timeout_sec": float(os.getenv("AMAZON_CREATORS_TIMEOUT_SEC", "5.0")),
+        # Upper bound for one fetch (token call plus the whole keyword fan-out), however many keywords there are.
+        "search_deadline_sec": float(os.getenv("AMAZON_CREATORS_SEARCH_DEADLINE_SEC") or os.getenv("AMAZON_CREATORS_TIMEOUT_SEC", "5.0")),
     }
 
 
@@ -208,6 +285,11 @@ def _rotation_bucket_key() -> str:
     return now.strftime("daily:%Y-%m-%d")
 
 
+def current_rotation_bucket() -> str:
+    """Current theme rotation period; rendered Amazon slots only change when it does."""
+    return _rotation_bucket_key()
+
+
 def _enabled_theme_pool() -> List[Dict[str, object]]:
     return [theme for theme in AMAZON_THEME_POOL if bool(theme.get("enabled", False))]
 
@@ -389,20 +471,18 @@ def _make_cache_key(settings: Dict[str, object], keywords: List[str]) -> str:
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
-def _cached_get(cache_key: str) -> Optional[List[dict]]:
-    with _CACHE_LOCK:
-        entry = _SEARCH_CACHE.get(cache_key)
-        if not entry:
-            return None
-        if time.time() > float(entry.get("expires_at", 0)):
-            _SEARCH_CACHE.pop(cache_key, None)
-            return None
-        return entry.get("items")  # type: ignore[return-value]
+def _cached_get(cache_key: str, record: bool = True) -> Optional[Tuple[List[dict], bool]]:
+    """Return (items, fresh). Expired entries are returned as not fresh until their grace ends."""
+    return _SEARCH_CACHE.get(cache_key, record=record)
 
 
-def _cached_set(cache_key: str, ttl: int, items: List[dict]) -> None:
-    with _CACHE_LOCK:
-        _SEARCH_CACHE[cache_key] = {"items": items, "expires_at": time.time() + max(30, int(ttl))}
+def _cached_set(cache_key: str, ttl: int, items: List[dict], stale_grace: int = 0) -> None:
+    _SEARCH_CACHE.put(cache_key, items, max(30, int(ttl)), max(0, int(stale_grace)))
+
+
+def _postpone_refresh(cache_key: str, delay_sec: float) -> None:
+    """Keep serving a stale entry after a failed refresh, without retrying on every page view."""
+    _SEARCH_CACHE.postpone(cache_key, delay_sec)
 
 
 def _build_fallback_items(settings: Dict[str, object], keywords: List[str]) -> List[dict]:
@@ -427,15 +507,173 @@ def _apply_fallback(result: Dict[str, object], reason: str, settings: Dict[str,
     return result
 
 
-def _get_access_token(settings: Dict[str, object]) -> Optional[str]:
-    if requests is None:
-        return None
+_CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+CIRCUIT_TRANSITIONS = metrics_registry.counter(
+    "jobcan_amazon_circuit_transitions_total",
+    "Creators API circuit breaker transitions by new state.",
+    ("to",),
+)
+
+# While open, recommendations fall back to search-link cards without calling the API.
+_API_BREAKER = CircuitBreaker(
+    "amazon_creators",
+    failure_threshold=_env_int("AMAZON_CIRCUIT_FAILURE_THRESHOLD", 5),
+    latency_p95_sec=float(os.getenv("AMAZON_CIRCUIT_P95_SEC", "3.0")),
+    open_sec=float(os.getenv("AMAZON_CIRCUIT_OPEN_SEC", "60")),
+    on_transition=lambda old_state, new_state, reason: CIRCUIT_TRANSITIONS.inc(new_state),
+)
+metrics_registry.gauge(
+    "jobcan_amazon_circuit_state",
+    "Creators API circuit breaker state (0 closed, 1 half-open, 2 open).",
+    func=lambda: _CIRCUIT_STATE_VALUES[_API_BREAKER.state],
+)
+
+
+def describe_circuit_breaker() -> Dict[str, object]:
+    return _API_BREAKER.describe()
+
+
+class CreatorsApiClient:
+    """Keep-alive HTTP client shared by the token and search calls.
+
+    Each call used to go through module-level requests.post, which opens a new TCP+TLS
+    connection every time. The session here keeps per-host connection pools (token endpoint
+    and API host) and records the latency of every call in AMAZON_API_SECONDS. Outcomes are
+    also fed to the circuit breaker: exceptions (including timeouts), 429 and 5xx count as failures.
+
+    Connection errors and 5xx are retried with exponential backoff, but only while the whole call
+    (attempts and sleeps) still fits before its deadline: the caller's deadline, or timeout after
+    the call started. The calls run inside page renders, so the deadline is never exceeded.
+    429 is not retried (and Retry-After is not honoured); the breaker counts it instead.
+    Read timeouts are not retried either.
+    """
+
+    RETRY_STATUSES = (500, 502, 503, 504)
+    # Do not start a retry with less time than this left before the deadline.
+    MIN_ATTEMPT_SEC = 0.2
+
+    def __init__(self, pool_maxsize: int = 8, retries: int = 2, backoff_factor: float = 0.2, breaker: Optional[CircuitBreaker] = None):
+        self.pool_maxsize = max(1, int(pool_maxsize))
+        self.retries = max(0, int(retries))
+        self.backoff_factor = float(backoff_factor)
+        self.breaker = breaker
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _build_session(self, requests):
+        from requests.adapters import HTTPAdapter
+
+        # Retries are done in post() so they can be bounded by the deadline.
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize, max_retries=0)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _get_session(self):
+        session = self._session
+        if session is not None:
+            return session
+        requests = _get_requests()
+        if requests is None:
+            return None
+        with self._lock:
+            if self._session is None:
+                self._session = self._build_session(requests)
+            return self._session
+
+    @property
+    def available(self) -> bool:
+        return _get_requests() is not None
+
+    def _send(self, session, url: str, timeout: float, deadline: float, kwargs):
+        """Send with bounded retries. Token (client_credentials) and searchItems POSTs have no side effects."""
+        requests = _get_requests()
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise requests.exceptions.Timeout("Creators API call deadline exceeded")
+            try:
+                resp = session.post(url, timeout=min(timeout, remaining), **kwargs)
+            except requests.exceptions.ConnectionError:
+                if not self._may_retry(attempt, deadline):
+                    raise
+            else:
+                if resp.status_code not in self.RETRY_STATUSES or not self._may_retry(attempt, deadline):
+                    return resp
+                resp.close()
+            time.sleep(self._backoff_sec(attempt))
+            attempt += 1
+
+    def _backoff_sec(self, attempt: int) -> float:
+        return self.backoff_factor * (2 ** attempt)
+
+    def _may_retry(self, attempt: int, deadline: float) -> bool:
+        if attempt >= self.retries:
+            return False
+        # Only retry when the sleep leaves time for a real attempt, not just a doomed one.
+        return deadline - time.monotonic() - self._backoff_sec(attempt) > self.MIN_ATTEMPT_SEC
+
+    def post(self, operation: str, url: str, timeout: float, deadline: Optional[float] = None, **kwargs):
+        """POST through the pooled session. Raises what requests raises.
+
+        deadline is a time.monotonic() value the whole call (including retries) must finish by.
+        """
+        session = self._get_session()
+        if session is None:
+            raise RuntimeError("requests is not installed")
+        started = time.monotonic()
+        timeout = float(timeout)
+        deadline = min(deadline, started + timeout) if deadline is not None else started + timeout
+        try:
+            resp = self._send(session, url, timeout, deadline, kwargs)
+        except Exception:
+            elapsed = time.monotonic() - started
+            AMAZON_API_SECONDS.observe(elapsed, operation, "exception")
+            if self.breaker is not None:
+                self.breaker.record_failure(elapsed)
+            raise
+        elapsed = time.monotonic() - started
+        AMAZON_API_SECONDS.observe(elapsed, operation, "ok" if resp.status_code == 200 else "http_error")
+        if self.breaker is not None:
+            if resp.status_code == 429 or resp.status_code >= 500:
+                self.breaker.record_failure(elapsed)
+            else:
+                self.breaker.record_success(elapsed)
+        return resp
+
+    def close(self) -> None:
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+
+_API_CLIENT = CreatorsApiClient(
+    pool_maxsize=_env_int("AMAZON_CREATORS_POOL_MAXSIZE", 8),
+    retries=int(os.getenv("AMAZON_CREATORS_RETRIES", "2")),
+    backoff_factor=float(os.getenv("AMAZON_CREATORS_RETRY_BACKOFF_SEC", "0.2")),
+    breaker=_API_BREAKER,
+)
+
+
+def _cached_access_token() -> Optional[str]:
     now = time.time()
     with _CACHE_LOCK:
         token = _TOKEN_CACHE.get("token")
         expires_at = float(_TOKEN_CACHE.get("expires_at", 0))
         if token and now < (expires_at - 30):
             return str(token)
+    return None
+
+
+def _get_access_token(settings: Dict[str, object], deadline: Optional[float] = None) -> Optional[str]:
+    if not _API_CLIENT.available:
+        return None
+    token = _cached_access_token()
+    if token:
+        return token
     payload = {
         "grant_type": "client_credentials",
         "client_id": str(settings["client_id"]),
@@ -443,7 +681,7 @@ def _get_access_token(settings: Dict[str, object]) -> Optional[str]:
         "scope": "creatorsapi/default",
     }
     try:
-        resp = requests.post(str(settings["token_endpoint"]), data=payload, headers={"Content-Type": "application/x-www-form-urlencoded"}, timeout=float(settings["timeout_sec"]))
+        resp = _API_CLIENT.post("token", str(settings["token_endpoint"]), data=payload, headers={"Content-Type": "application/x-www-form-urlencoded"}, timeout=float(settings["timeout_sec"]), deadline=deadline)
     except Exception as exc:
         logger.warning("amazon_creators_token_request_error type=%s detail=%s", type(exc).__name__, str(exc))
         return None
@@ -499,8 +737,8 @@ def _extract_items(payload: dict, associate_tag: str, max_items: int) -> List[di
     return items
 
 
-def _search_items(settings: Dict[str, object], token: str, keyword: str) -> List[dict]:
-    if requests is None:
+def _search_items(settings: Dict[str, object], token: str, keyword: str, deadline: Optional[float] = None) -> List[dict]:
+    if not _API_CLIENT.available:
         return []
     associate_tag = _current_associate_tag(settings)
     endpoint = "https://{host}{base}/{operation}".format(host=settings["api_host"], base=str(settings["api_base_path"]).rstrip("/"), operation=str(settings["api_operation"]).lstrip("/"))
@@ -515,7 +753,7 @@ def _search_items(settings: Dict[str, object], token: str, keyword: str) -> List
     }
     headers = {"Content-Type": "application/json; charset=utf-8", "Authorization": f"Bearer {token}, Version {settings['version']}", "x-marketplace": settings["marketplace_host"]}
     try:
-        resp = requests.post(endpoint, json=payload, headers=headers, timeout=float(settings["timeout_sec"]))
+        resp = _API_CLIENT.post("search", endpoint, json=payload, headers=headers, timeout=float(settings["timeout_sec"]), deadline=deadline)
     except Exception as exc:
         logger.warning("amazon_creators_search_request_error keyword=%s type=%s detail=%s", keyword, type(exc).__name__, str(exc))
         return []
@@ -532,6 +770,209 @@ def _search_items(settings: Dict[str, object], token: str, keyword: str) -> List
     return _extract_items(body, associate_tag, int(settings["max_items"]))
 
 
+# Read once at import: the pool is shared by every render, so its size is not a per-call setting.
+_SEARCH_CONCURRENCY = _env_int("AMAZON_CREATORS_SEARCH_CONCURRENCY", 3)
+_SEARCH_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_SEARCH_EXECUTOR_LOCK = threading.Lock()
+
+
+def _get_search_executor() -> ThreadPoolExecutor:
+    """Shared bounded pool for keyword searches (created on the first API call)."""
+    global _SEARCH_EXECUTOR
+    with _SEARCH_EXECUTOR_LOCK:
+        if _SEARCH_EXECUTOR is None:
+            _SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, _SEARCH_CONCURRENCY), thread_name_prefix="amazon-search")
+        return _SEARCH_EXECUTOR
+
+
+def _merge_keyword_results(keywords: List[str], results: Dict[int, List[dict]], max_items: int, contiguous: bool = False) -> List[dict]:
+    """Merge per-keyword results in keyword order, dropping duplicate URLs.
+
+    With contiguous=True the merge stops at the first keyword that has not finished yet,
+    so the output is the same as the sequential loop would have produced.
+    """
+    combined: List[dict] = []
+    seen = set()
+    for index, keyword in enumerate(keywords):
+        if index not in results:
+            if contiguous:
+                break
+            continue
+        for item in results[index]:
+            url = item.get("url")
+            if not url or url in seen:
+                continue
+            seen.add(url)
+            enriched = dict(item)
+            enriched["keyword"] = keyword
+            combined.append(enriched)
+            if len(combined) >= max_items:
+                return combined
+    return combined
+
+
+def _search_keywords(settings: Dict[str, object], token: str, keywords: List[str], deadline: float):
+    """Search keywords concurrently until deadline (a time.monotonic() value).
+
+    Returns (items, complete, started). Stops early once the keyword-order prefix that has
+    finished already yields max_items unique URLs. When the deadline passes, unfinished searches
+    are dropped (not-yet-started ones are cancelled) and complete is False. started counts the
+    searches that were not cancelled, i.e. that called (or are still calling) the API.
+    """
+    max_items = int(settings["max_items"])
+    executor = _get_search_executor()
+    futures = {executor.submit(_search_items, settings, token, keyword, deadline): index for index, keyword in enumerate(keywords)}
+    results: Dict[int, List[dict]] = {}
+    pending = set(futures)
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                results[futures[future]] = future.result()
+            except Exception as exc:
+                logger.warning("amazon_creators_search_worker_error keyword=%s type=%s", keywords[futures[future]], type(exc).__name__)
+                results[futures[future]] = []
+        prefix = _merge_keyword_results(keywords, results, max_items, contiguous=True)
+        if len(prefix) >= max_items:
+            cancelled = sum(1 for future in pending if future.cancel())
+            return prefix, True, len(keywords) - cancelled
+    if pending:
+        cancelled = sum(1 for future in pending if future.cancel())
+        logger.warning(
+            "amazon_creators_search_deadline deadline_sec=%s finished=%s total=%s",
+            settings["search_deadline_sec"], len(results), len(keywords),
+        )
+        return _merge_keyword_results(keywords, results, max_items), False, len(keywords) - cancelled
+    return _merge_keyword_results(keywords, results, max_items), True, len(keywords)
+
+
+def _fetch_recommendations(settings: Dict[str, object], keywords: List[str], cache_key: str):
+    """Fetch and cache keywords, sharing one in-flight fetch per key. Returns (items, error_reason)."""
+    return _SEARCH_CACHE.single_flight(cache_key, lambda: _load_recommendations(settings, keywords, cache_key))
+
+
+def _load_recommendations(settings: Dict[str, object], keywords: List[str], cache_key: str):
+    # A caller that missed just before another flight stored this key starts a new flight; serve the stored result.
+    cached = _cached_get(cache_key, record=False)
+    if cached is not None and cached[1]:
+        return cached[0], None
+    if not settings["client_id"] or not settings["client_secret"]:
+        return [], "missing_credentials"
+    admitted = _API_BREAKER.allow()
+    if not admitted:
+        return [], "circuit_open"
+    # A half-open probe only needs one request to settle the breaker, so it searches a single keyword.
+    probe = admitted == HALF_OPEN
+    # One deadline for the token call and the searches, so a slow token eats into the fan-out.
+    deadline = time.monotonic() + max(0.0, float(settings["search_deadline_sec"]))
+    called_api = False
+    try:
+        token = _cached_access_token()
+        if not token:
+            called_api = True
+            token = _get_access_token(settings, deadline=deadline)
+        if not token:
+            return [], "token_unavailable"
+        combined, complete, started = _search_keywords(settings, token, keywords[:1 if probe else _MAX_SEARCH_KEYWORDS], deadline)
+        called_api = called_api or started > 0
+    finally:
+        # Any API call settles the probe through record_success / record_failure, even one that
+        # outlives the deadline. Only a probe that never reached the API frees the slot here.
+        if not called_api:
+            _API_BREAKER.end_probe()
+    if not combined:
+        return [], "empty_response" if complete else "search_deadline"
+    # The probe's single-keyword result is cached briefly too, so the full fan-out runs once closed.
+    ttl = int(settings["cache_ttl_seconds"]) if complete and not probe else _PARTIAL_RESULT_TTL_SEC
+    _cached_set(cache_key, ttl, combined, int(settings["cache_stale_grace_seconds"]))
+    return combined, None
+
+
+_REFRESHING: set = set()
+_REFRESH_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def _refresh_entry(settings: Dict[str, object], keywords: List[str], cache_key: str, trigger: str) -> bool:
+    started = time.monotonic()
+    outcome = "error"
+    try:
+        items, reason = _fetch_recommendations(settings, keywords, cache_key)
+        outcome = "ok" if items else str(reason)
+    except Exception as exc:
+        logger.warning("amazon_creators_refresh_error trigger=%s type=%s detail=%s", trigger, type(exc).__name__, str(exc))
+    finally:
+        with _CACHE_LOCK:
+            _REFRESHING.discard(cache_key)
+    if outcome != "ok":
+        _postpone_refresh(cache_key, _REFRESH_RETRY_SEC)
+    CACHE_REFRESH_SECONDS.observe(time.monotonic() - started, trigger, outcome)
+    return outcome == "ok"
+
+
+def _schedule_refresh(settings: Dict[str, object], keywords: List[str], cache_key: str) -> bool:
+    """Refresh a stale entry in the background (at most one refresh per key at a time)."""
+    global _REFRESH_EXECUTOR
+    with _CACHE_LOCK:
+        if cache_key in _REFRESHING:
+            return False
+        _REFRESHING.add(cache_key)
+        # Separate from the search pool: the refresh waits on searches submitted there.
+        if _REFRESH_EXECUTOR is None:
+            _REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="amazon-refresh")
+        executor = _REFRESH_EXECUTOR
+    executor.submit(_refresh_entry, settings, keywords, cache_key, "stale")
+    return True
+
+
+def warm_recommendation_cache(contexts: Iterable[Dict[str, object]]) -> int:
+    """Fill the cache for the given page contexts, as rendered without browsing history.
+
+    Each context has the same path / page_type / title / tags that the page passes to
+    get_recommendations, so the warmed keys are the ones first-time visitors hit.
+    Keys that are already fresh are skipped.
+    Runs synchronously, so call it from a background thread. Returns the number of keys fetched.
+    """
+    settings = get_settings()
+    if not settings["enabled"] or not _current_associate_tag(settings):
+        return 0
+    if not settings["client_id"] or not settings["client_secret"]:
+        return 0
+    fetched = 0
+    seen_keys = set()
+    for context in contexts:
+        path = str(context.get("path") or "/")
+        page_type = str(context.get("page_type") or "")
+        keywords = _recommendation_keywords(path, page_type, str(context.get("title") or ""), context.get("tags"))  # type: ignore[arg-type]
+        cache_key = _make_cache_key(settings, keywords)
+        if cache_key in seen_keys:
+            continue
+        seen_keys.add(cache_key)
+        cached = _cached_get(cache_key, record=False)
+        if cached is not None and cached[1]:
+            continue
+        with _CACHE_LOCK:
+            if cache_key in _REFRESHING:
+                continue
+            _REFRESHING.add(cache_key)
+        if _refresh_entry(settings, keywords, cache_key, "warm"):
+            fetched += 1
+    logger.info("amazon_creators_cache_warmed keys=%s fetched=%s", len(seen_keys), fetched)
+    return fetched
+
+
+def _recommendation_keywords(
+    path: str,
+    page_type: str,
+    title: str = "",
+    tags: Optional[Iterable[str]] = None,
+    recent_history: Optional[Iterable[dict]] = None,
+) -> List[str]:
+    return build_keywords(path, page_type, title, tags, recent_history) or _fallback_keywords_for_page(path, page_type)
+
+
 def get_recommendations(
     path: str,
     page_type: str,
@@ -545,7 +986,7 @@ def get_recommendations(
     if not enabled:
         return result
 
-    keywords = build_keywords(path, page_type, title, tags, recent_history) or _fallback_keywords_for_page(path, page_type)
+    keywords = _recommendation_keywords(path, page_type, title, tags, recent_history)
     result["keywords"] = keywords
     if not _current_associate_tag(settings):
         logger.warning("amazon_creators_missing_associate_tag path=%s page_type=%s", path, page_type)
@@ -554,35 +995,16 @@ def get_recommendations(
     cache_key = _make_cache_key(settings, keywords)
     cached = _cached_get(cache_key)
     if cached is not None:
-        result["items"] = cached[: int(settings["max_items"])]
+        items, fresh = cached
+        if not fresh:
+            _schedule_refresh(settings, keywords, cache_key)
+        result["items"] = items[: int(settings["max_items"])]
         result["source"] = "cache"
         return result
 
-    if not settings["client_id"] or not settings["client_secret"]:
-        return _apply_fallback(result, "missing_credentials", settings, keywords)
-    token = _get_access_token(settings)
-    if not token:
-        return _apply_fallback(result, "token_unavailable", settings, keywords)
-
-    combined: List[dict] = []
-    seen = set()
-    for keyword in keywords[:6]:
-        for item in _search_items(settings, token, keyword):
-            url = item.get("url")
-            if not url or url in seen:
-                continue
-            seen.add(url)
-            enriched = dict(item)
-            enriched["keyword"] = keyword
-            combined.append(enriched)
-            if len(combined) >= int(settings["max_items"]):
-                break
-        if len(combined) >= int(settings["max_items"]):
-            break
-
+    combined, reason = _fetch_recommendations(settings, keywords, cache_key)
     if not combined:
-        return _apply_fallback(result, "empty_response", settings, keywords)
-    _cached_set(cache_key, int(settings["cache_ttl_seconds"]), combined)
+        return _apply_fallback(result, str(reason), settings, keywords)
     result["items"] = combined
     result["source"] = "api"
     return result
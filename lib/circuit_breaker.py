@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+外部 API 呼び出し用のサーキットブレーカー（lib.amazon_creators の Creators API で使用）。
+
+Creators API のトークン・検索エンドポイントが落ちたりタイムアウトしたりすると、キャッシュに無い
+ページ表示のたびに呼び出しが timeout_sec ずつ待ってからフォールバックしていた。ここでは:
+
+- closed: 通常どおり呼ぶ。連続失敗が failure_threshold 回、または直近 latency_window 件の
+  p95 所要時間が latency_p95_sec を超えたら open にする（p95 は min_samples 件たまってから判定）
+- open: allow() は False を返す（呼び出し側はすぐフォールバックする）。open_sec 経過後は half_open
+- half_open: 1 回だけ試行（probe）を許す。成功で closed、失敗で再び open。
+  allow() は許可した状態（CLOSED / HALF_OPEN）を返すので、呼び出し側は自分が probe かを判断できる。
+  probe が結果を記録しないまま終わった場合は end_probe() で次の probe を許す
+
+状態遷移はログ（circuit_breaker_transition）と on_transition コールバック（メトリクス用）で通知する。
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, latency_p95_sec=None, latency_window=50, min_samples=20,
+                 open_sec=60.0, clock=None, on_transition=None):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.latency_p95_sec = latency_p95_sec
+        self.min_samples = max(1, int(min_samples))
+        self.open_sec = float(open_sec)
+        self._clock = clock or time.monotonic
+        self._on_transition = on_transition
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=max(1, int(latency_window)))
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self.rejected = 0
+        self.transitions = 0
+
+    # --- 呼び出し側 ---
+
+    def allow(self):
+        """
+        呼んでよいか。拒否なら False、許可なら許可したときの状態（真値）。
+
+        CLOSED は通常の呼び出し、HALF_OPEN はこの呼び出しが probe であることを表す
+        （state を別に読むと、その間の遷移で取り違えるため）。
+        """
+        transition = None
+        with self._lock:
+            if self.state == OPEN:
+                if self._clock() - self.opened_at < self.open_sec:
+                    self.rejected += 1
+                    return False
+                transition = self._set_state_locked(HALF_OPEN, 'open_timeout')
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    allowed = False
+                else:
+                    self._probe_in_flight = True
+                    allowed = HALF_OPEN
+            else:
+                allowed = CLOSED
+        self._notify(transition)
+        return allowed
+
+    def end_probe(self):
+        """probe が成功・失敗を記録せずに終わったとき、次の probe を許す。"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self, latency_sec):
+        transition = None
+        with self._lock:
+            if self.state == HALF_OPEN:
+                transition = self._set_state_locked(CLOSED, 'probe_succeeded')
+            elif self.state == CLOSED:
+                self.consecutive_failures = 0
+                self._latencies.append(latency_sec)
+                p95 = self._p95_locked()
+                if p95 is not None and self.latency_p95_sec is not None and p95 > self.latency_p95_sec:
+                    transition = self._set_state_locked(OPEN, f'p95_latency_{p95:.2f}s')
+        self._notify(transition)
+
+    def record_failure(self, latency_sec=None):
+        transition = None
+        with self._lock:
+            if self.state == HALF_OPEN:
+                transition = self._set_state_locked(OPEN, 'probe_failed')
+            elif self.state == CLOSED:
+                self.consecutive_failures += 1
+                if latency_sec is not None:
+                    self._latencies.append(latency_sec)
+                if self.consecutive_failures >= self.failure_threshold:
+                    transition = self._set_state_locked(OPEN, f'consecutive_failures_{self.consecutive_failures}')
+        self._notify(transition)
+
+    # --- 内部 ---
+
+    def _p95_locked(self):
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def _set_state_locked(self, new_state, reason):
+        old_state = self.state
+        self.state = new_state
+        self.transitions += 1
+        self._probe_in_flight = False
+        if new_state == OPEN:
+            self.opened_at = self._clock()
+        if new_state == CLOSED:
+            self.consecutive_failures = 0
+            self._latencies.clear()
+            self.opened_at = None
+        return old_state, new_state, reason
+
+    def _notify(self, transition):
+        if transition is None:
+            return
+        old_state, new_state, reason = transition
+        log = logger.warning if new_state == OPEN else logger.info
+        log(f"circuit_breaker_transition name={self.name} from={old_state} to={new_state} reason={reason}")
+        if self._on_transition is not None:
+            try:
+                self._on_transition(old_state, new_state, reason)
+            except Exception:
+                logger.exception(f"circuit_breaker_listener_error name={self.name}")
+
+    def describe(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'p95_sec': self._p95_locked(),
+                'samples': len(self._latencies),
+                'open_for_sec': (self._clock() - self.opened_at) if self.opened_at is not None else None,
+                'rejected': self.rejected,
+                'transitions': self.transitions,
+            }
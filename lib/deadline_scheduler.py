@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+ジョブごとの「次に見直すべき時刻」を管理する最小ヒープ。
+
+prune_jobs は全ジョブを走査する代わりに pop_due(now) で期限到来分だけを受け取り、
+判定し直して必要なら reschedule する。heartbeat のたびに期限が延びるため、
+古いエントリはヒープに残したまま無視する（遅延削除）。無効エントリが増えすぎたら作り直す。
+
+期限は「早めに起こす」分には問題ない（呼び出し側で再判定する）が、遅れてはいけない。
+"""
+import heapq
+import itertools
+import threading
+from typing import Dict, List, Optional
+
+
+class DeadlineScheduler:
+    """key -> deadline を 1 件ずつ保持する遅延削除付きヒープ。"""
+
+    # 有効件数に対してヒープがこの倍率を超えたら作り直す
+    _COMPACT_RATIO = 4
+    _COMPACT_MIN = 256
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap = []
+        self._current: Dict[str, float] = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._current)
+
+    def schedule(self, key, when: Optional[float]):
+        """key の期限を when に設定する。None なら取り消す。"""
+        if when is None:
+            self.cancel(key)
+            return
+        when = float(when)
+        with self._lock:
+            if self._current.get(key) == when:
+                return
+            self._current[key] = when
+            heapq.heappush(self._heap, (when, next(self._counter), key))
+            if len(self._heap) > max(self._COMPACT_MIN, self._COMPACT_RATIO * len(self._current)):
+                self._compact_locked()
+
+    def cancel(self, key):
+        with self._lock:
+            self._current.pop(key, None)
+
+    def deadline(self, key) -> Optional[float]:
+        with self._lock:
+            return self._current.get(key)
+
+    def next_deadline(self) -> Optional[float]:
+        """最も近い有効な期限（無ければ None）。"""
+        with self._lock:
+            while self._heap:
+                when, _, key = self._heap[0]
+                if self._current.get(key) == when:
+                    return when
+                heapq.heappop(self._heap)
+            return None
+
+    def count_due(self, now: float) -> int:
+        """now 時点で期限切れのまま残っている件数（監視用・O(n)）。"""
+        with self._lock:
+            return sum(1 for when in self._current.values() if when <= now)
+
+    def pop_due(self, now: float) -> List[str]:
+        """now 以前に期限が来た key を取り出す（取り出した key の期限は解除される）。"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, _, key = heapq.heappop(self._heap)
+                if self._current.get(key) != when:
+                    continue
+                del self._current[key]
+                due.append(key)
+        return due
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+            self._current.clear()
+
+    def _compact_locked(self):
+        self._heap = [(when, next(self._counter), key) for key, when in self._current.items()]
+        heapq.heapify(self._heap)
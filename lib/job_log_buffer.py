@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+ジョブログ用のリングバッファ（件数上限 + バイト上限）と構造化ログレコード。
+
+以前の add_job_log は追記のたびに deque 全体のバイト数を数え直し、上限超過時は
+list.insert(0, ...) で作り直していた（1 回 O(n)、作り直しは O(n^2)）。
+JobLogBuffer は行ごとのバイト数と合計を保持し、上限を超えた分だけ先頭から捨てる（償却 O(1)）。
+
+total_count は追加された行の通算件数で、古い行を捨てても減らない。
+行の通番（seq）は 1 始まりで、buffer[i] の seq は total_count - len(buffer) + i + 1。
+/status?since= や SSE の cursor はこの通番を使う。
+
+各行は JobLogRecord（時刻 float・レベル・メッセージ（テンプレート）・引数）として保持し、
+時刻の整形・個人情報のマスク・引数の埋め込みはクライアントが読むときに 1 回だけ行う（結果はキャッシュ）。
+反復・添字アクセスは従来どおり "[YYYY-mm-dd HH:MM:SS] メッセージ" の文字列を返す。
+"""
+import itertools
+import json
+import re
+import time
+from collections import deque
+
+# utils.MAX_LOG_CHARS と同期（1 ログ行の最大文字数）
+MAX_LOG_CHARS = 2000
+
+# 個人情報のマスク（事前コンパイル）
+_SANITIZE_PATTERNS = (
+    # メールアドレス
+    (re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'), '[EMAIL]'),
+    # パスワード
+    (re.compile(r'password["\']?\s*[:=]\s*["\']?[^"\s]+["\']?', re.IGNORECASE), 'password="[PASSWORD]"'),
+    # クレジットカード番号
+    (re.compile(r'\b\d{4}[- ]?\d{4}[- ]?\d{4}[- ]?\d{4}\b'), '[CARD_NUMBER]'),
+)
+
+# 先頭の絵文字からレベルを推定する（add_job_log の呼び出し側はレベルを渡していないため）
+_ERROR_PREFIXES = ('❌', '🚨', '💥')
+_WARNING_PREFIXES = ('⚠',)
+
+# "[YYYY-mm-dd HH:MM:SS] " の長さ（バイト数見積もり用）
+_TIMESTAMP_PREFIX_BYTES = 22
+
+
+def sanitize_log_text(message):
+    """ログメッセージから個人情報を除去"""
+    for pattern, replacement in _SANITIZE_PATTERNS:
+        message = pattern.sub(replacement, message)
+    return message
+
+
+def _infer_level(message):
+    if message.startswith(_ERROR_PREFIXES):
+        return 'error'
+    if message.startswith(_WARNING_PREFIXES):
+        return 'warning'
+    return 'info'
+
+
+class JobLogRecord:
+    """1 行分のログ。追記時は値を持つだけで、整形は text() / render() の初回に行う。"""
+
+    __slots__ = ('ts', 'level', 'message', 'args', '_text', '_rendered')
+
+    def __init__(self, message, args=(), level=None, ts=None):
+        self.ts = time.time() if ts is None else ts
+        self.level = level
+        self.message = message
+        self.args = args
+        self._text = None
+        self._rendered = None
+
+    def size(self):
+        """バッファのバイト上限用の見積もり（整形はしない）。"""
+        size = _TIMESTAMP_PREFIX_BYTES + len(self.message.encode('utf-8'))
+        for arg in self.args:
+            size += len(arg) if isinstance(arg, str) else 8
+        return size
+
+    def text(self):
+        """引数を埋め込み、個人情報をマスクした本文。"""
+        if self._text is None:
+            message = self.message
+            if self.args:
+                try:
+                    message = message % self.args
+                except (TypeError, ValueError):
+                    message = ' '.join([message] + [str(arg) for arg in self.args])
+            message = sanitize_log_text(message)
+            if len(message) > MAX_LOG_CHARS:
+                message = message[:MAX_LOG_CHARS - 3] + "..."
+            self._text = message
+        return self._text
+
+    def render(self):
+        """従来形式の 1 行（"[YYYY-mm-dd HH:MM:SS] 本文"）。"""
+        if self._rendered is None:
+            timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.ts))
+            self._rendered = f"[{timestamp}] {self.text()}"
+        return self._rendered
+
+    def to_dict(self, seq=None):
+        data = {
+            'seq': seq,
+            'ts': round(self.ts, 3),
+            'level': self.level or _infer_level(self.message),
+            'message': self.text(),
+        }
+        if self.args:
+            # テンプレートを集計キーとして使えるよう残す（引数はマスク済みの本文にのみ含める）
+            data['code'] = self.message
+        return data
+
+    def __getstate__(self):
+        return (self.ts, self.level, self.message, self.args)
+
+    def __setstate__(self, state):
+        self.ts, self.level, self.message, self.args = state
+        self._text = None
+        self._rendered = None
+
+    def __repr__(self):
+        return f"JobLogRecord(ts={self.ts!r}, level={self.level!r}, message={self.message!r}, args={self.args!r})"
+
+
+def _entry_bytes(entry):
+    if isinstance(entry, JobLogRecord):
+        return entry.size()
+    return len(entry.encode('utf-8')) if isinstance(entry, str) else len(str(entry).encode('utf-8'))
+
+
+def _render(entry):
+    return entry.render() if isinstance(entry, JobLogRecord) else entry
+
+
+def _entry_dict(entry, seq):
+    if isinstance(entry, JobLogRecord):
+        return entry.to_dict(seq)
+    return {'seq': seq, 'ts': None, 'level': None, 'message': entry}
+
+
+def records_to_jsonl(seq_records):
+    """(seq, レコード) の列を 1 行 1 JSON（{seq, ts, level, message[, code]}）にする。"""
+    return ''.join(json.dumps(_entry_dict(entry, seq), ensure_ascii=False) + '\n' for seq, entry in seq_records)
+
+
+def select_logs_since(logs, log_count, since):
+    """
+    通算 log_count 件のうち末尾を保持している logs から、since 件目より後の行を取り出す。
+
+    戻り値は (行のリスト, 先頭行の seq, 取りこぼし有無)。since が既に捨てた範囲を指す場合や
+    未来の値（別ジョブ・再起動前のカーソル）の場合は、保持している全行を返して取りこぼし有りとする。
+    取り出しは末尾から new_count 件だけ辿る（deque の途中位置への islice は先頭から数えるため）。
+    """
+    retained = len(logs)
+    first_retained_seq = log_count - retained + 1
+    if since > log_count:
+        return list(logs), (first_retained_seq if retained else None), True
+    new_count = log_count - since
+    if new_count <= 0:
+        return [], None, False
+    if new_count > retained:
+        return list(logs), (first_retained_seq if retained else None), True
+    entries = list(itertools.islice(reversed(logs), new_count))
+    entries.reverse()
+    return entries, since + 1, False
+
+
+class JobLogBuffer:
+    """件数・バイト数の上限付きログバッファ。読み取りは deque と同じく反復・添字・len が使える（整形済み文字列）。"""
+
+    __slots__ = ('_entries', '_sizes', '_total_bytes', '_total_count', 'maxlen', 'max_bytes')
+
+    def __init__(self, iterable=(), maxlen=None, max_bytes=None, total_count=None):
+        self.maxlen = maxlen
+        self.max_bytes = max_bytes
+        self._entries = deque()
+        self._sizes = deque()
+        self._total_bytes = 0
+        self._total_count = 0
+        for entry in iterable:
+            self.append(entry)
+        if total_count is not None:
+            # 既存ログを引き継ぐ場合は通番を続きから振る
+            self._total_count = max(self._total_count, int(total_count))
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    @property
+    def total_count(self):
+        return self._total_count
+
+    @property
+    def first_seq(self):
+        """保持している先頭行の通番（空なら None）。"""
+        if not self._entries:
+            return None
+        return self._total_count - len(self._entries) + 1
+
+    def append(self, entry):
+        size = _entry_bytes(entry)
+        self._entries.append(entry)
+        self._sizes.append(size)
+        self._total_bytes += size
+        self._total_count += 1
+        self._evict()
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def _evict(self):
+        # 最新の 1 行は必ず残す（1 行の長さは add_job_log 側の MAX_LOG_CHARS で制限済み）
+        entries = self._entries
+        while len(entries) > 1 and (
+            (self.maxlen is not None and len(entries) > self.maxlen)
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            entries.popleft()
+            self._total_bytes -= self._sizes.popleft()
+
+    def since(self, cursor):
+        """通算 cursor 件目より後の行。select_logs_since と同じ (行, 先頭 seq, 取りこぼし有無) を返す。"""
+        return select_logs_since(self, self._total_count, cursor)
+
+    def tail(self, count):
+        """末尾 count 件のリスト。"""
+        if count <= 0:
+            return []
+        entries = list(itertools.islice(reversed(self), count))
+        entries.reverse()
+        return entries
+
+    def records(self):
+        """保持している生のレコード（JobLogRecord か、変換前の文字列）。"""
+        return list(self._entries)
+
+    def records_since(self, since=0):
+        """通算 since 件目より後の (seq, 生レコード) のリスト。ロック内で取り、整形はロック外で行う用。"""
+        first_seq = self._total_count - len(self._entries) + 1
+        skip = max(0, since - first_seq + 1)
+        return [
+            (first_seq + offset, entry)
+            for offset, entry in enumerate(itertools.islice(self._entries, skip, None), start=skip)
+        ]
+
+    def to_jsonl(self, since=0):
+        return records_to_jsonl(self.records_since(since))
+
+    def clear(self):
+        """保持行を捨てる（通算件数は維持する）。"""
+        self._entries.clear()
+        self._sizes.clear()
+        self._total_bytes = 0
+
+    def to_list(self):
+        return list(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return map(_render, self._entries)
+
+    def __reversed__(self):
+        return map(_render, reversed(self._entries))
+
+    def __getitem__(self, index):
+        return _render(self._entries[index])
+
+    def __eq__(self, other):
+        if isinstance(other, JobLogBuffer):
+            return list(self) == list(other)
+        if isinstance(other, (list, tuple, deque)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (
+            f"JobLogBuffer(len={len(self._entries)}, total_count={self._total_count}, "
+            f"total_bytes={self._total_bytes}, maxlen={self.maxlen}, max_bytes={self.max_bytes})"
+        )
+
+    def __getstate__(self):
+        return {
+            'entries': list(self._entries),  # JobLogRecord は未整形のまま渡す
+            'maxlen': self.maxlen,
+            'max_bytes': self.max_bytes,
+            'total_count': self._total_count,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['entries'], state['maxlen'], state['max_bytes'], state['total_count'])
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""
+AutoFill ジョブを別プロセスで実行するエグゼキュータ（AUTOMATION_EXECUTOR=process）。
+
+既定（thread）は gunicorn ワーカー内のスレッドで process_jobcan_automation を動かすため、
+Chromium のリークやハングがそのままワーカーの RSS・応答性に跳ね返り、タイムアウトも
+_check_job_timeout による協調的なものしかない。このモードでは:
+
+- automation を import 済みの子プロセスを事前に起動しておき（spawn・既定 1 本）、1 ジョブ 1 プロセスで使い捨てる
+- 子プロセス側の jobs はパイプ越しに親へ書き込みを転送する代理 dict。automation.py / utils.py の
+  jobs[job_id][...] = ... と add_job_log の追記がそのまま親のジョブレコードへ反映される
+- 親は子プロセス（と Chromium など子孫）の RSS 合計を監視し、上限超過で強制終了する。
+  RLIMIT_AS は Chromium が巨大な仮想領域を予約するため既定では無効（JOB_PROCESS_RLIMIT_AS_MB で任意指定）
+- timeout_sec + kill_grace_sec を過ぎたらプロセスツリーごと kill する（協調タイムアウトの後ろ盾）
+"""
+import logging
+import multiprocessing
+import threading
+import time
+
+from lib.job_log_buffer import JobLogBuffer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil は requirements に含まれる
+    psutil = None
+
+# 子 -> 親のメッセージ種別
+MSG_SET = 'set'
+MSG_LOG = 'log'
+MSG_LOGS = 'logs'
+MSG_DONE = 'done'
+MSG_ERROR = 'error'
+MSG_METRIC = 'metric'
+
+# 終了理由
+EXIT_DONE = 'done'
+EXIT_ERROR = 'error'
+EXIT_TIMEOUT = 'timeout'
+EXIT_MEMORY = 'memory'
+EXIT_CRASHED = 'crashed'
+
+
+# --- 子プロセス側 ---
+
+class _PipeLogBuffer(JobLogBuffer):
+    """append をパイプへ転送するログバッファ（utils.add_job_log の isinstance(JobLogBuffer) を満たす）。"""
+
+    __slots__ = ('_send',)
+
+    def __init__(self, send, iterable=(), maxlen=None, max_bytes=None):
+        # 初期行は親が MSG_LOGS でまとめて受け取るので 1 行ずつは送らない
+        self._send = None
+        super().__init__(iterable, maxlen, max_bytes)
+        self._send = send
+
+    def append(self, item):
+        super().append(item)
+        if self._send is not None:
+            self._send((MSG_LOG, item))
+
+
+class _PipeJobRecord(dict):
+    """書き込みをパイプへ転送するジョブレコード。"""
+
+    def __init__(self, send, data, log_maxlen, log_max_bytes=None):
+        super().__init__(data)
+        self._send = send
+        self._log_maxlen = log_maxlen
+        self._log_max_bytes = log_max_bytes
+        super().__setitem__('logs', _PipeLogBuffer(send, (), log_maxlen, log_max_bytes))
+
+    def __setitem__(self, key, value):
+        if key == 'logs':
+            # ログの差し替え。以降の append も転送されるよう包み直す
+            entries = list(value or ())
+            super().__setitem__(key, _PipeLogBuffer(
+                self._send, entries, getattr(value, 'maxlen', None) or self._log_maxlen, self._log_max_bytes,
+            ))
+            self._send((MSG_LOGS, entries))
+            return
+        super().__setitem__(key, value)
+        self._send((MSG_SET, key, value))
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+
+def _apply_rlimit_as(limit_mb):
+    if not limit_mb:
+        return
+    try:
+        import resource
+        limit = int(limit_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except Exception as rlimit_error:
+        logger.warning(f"job_process_rlimit_failed limit_mb={limit_mb} error={rlimit_error}")
+
+
+DEFAULT_TARGET = 'automation:process_jobcan_automation'
+
+
+def _load_target(target):
+    module_name, _, func_name = target.partition(':')
+    module = __import__(module_name, fromlist=[func_name])
+    return getattr(module, func_name)
+
+
+def _child_main(conn, rlimit_as_mb, target=DEFAULT_TARGET):
+    """事前起動される子プロセスの本体。ジョブを 1 件受け取り、実行して終了する。"""
+    send_lock = threading.Lock()
+
+    def send(message):
+        try:
+            with send_lock:
+                conn.send(message)
+        except Exception:
+            # 値が pickle できない等。ジョブ自体は続行する
+            pass
+
+    _apply_rlimit_as(rlimit_as_mb)
+    try:
+        # 重い import はジョブ受付前に済ませておく（開始までの待ち時間を減らす）
+        run_job = _load_target(target)
+    except Exception as import_error:
+        run_job = None
+        import_failure = str(import_error)
+
+    try:
+        message = conn.recv()
+    except (EOFError, OSError):
+        return
+    if not message or message[0] != 'run':
+        return
+    _, job_id, job_snapshot, kwargs, log_maxlen = message
+    if run_job is None:
+        send((MSG_ERROR, f'automation import failed: {import_failure}'))
+        return
+
+    try:
+        # automation の行ごとの計測値は親のレジストリへ送る（/metrics は親が返す）
+        from lib import metrics
+        metrics.set_metric_sink(lambda name, labelvalues, value: send((MSG_METRIC, name, tuple(labelvalues), value)))
+    except Exception:
+        pass
+    try:
+        from utils import MAX_JOB_LOG_BYTES as log_max_bytes
+    except Exception:
+        log_max_bytes = None
+    record = _PipeJobRecord(send, job_snapshot, log_maxlen, log_max_bytes)
+    child_jobs = {job_id: record}
+    try:
+        run_job(job_id, jobs=child_jobs, **kwargs)
+        send((MSG_DONE,))
+    except BaseException as job_error:
+        send((MSG_ERROR, str(job_error)))
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# --- 親プロセス側 ---
+
+def _process_tree(pid):
+    if psutil is None:
+        return []
+    try:
+        parent = psutil.Process(pid)
+    except psutil.NoSuchProcess:
+        return []
+    try:
+        return [parent] + parent.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return [parent]
+
+
+def process_tree_rss_mb(pid):
+    total = 0
+    for proc in _process_tree(pid):
+        try:
+            total += proc.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total / 1024 / 1024
+
+
+def kill_process_tree(pid):
+    """子孫（Chromium 等）を先に、最後に本体を SIGKILL する。"""
+    procs = _process_tree(pid)
+    for proc in reversed(procs):
+        try:
+            proc.kill()
+        except Exception:
+            continue
+    if psutil is not None and procs:
+        psutil.wait_procs(procs, timeout=5)
+
+
+class ProcessJobExecutor:
+    def __init__(self, prewarm=1, rlimit_as_mb=0, memory_cap_mb=0, kill_grace_sec=10.0,
+                 poll_interval_sec=0.5, memory_check_interval_sec=2.0, target=DEFAULT_TARGET):
+        self.target = target
+        self.prewarm = max(0, int(prewarm))
+        self.rlimit_as_mb = rlimit_as_mb
+        self.memory_cap_mb = memory_cap_mb
+        self.kill_grace_sec = kill_grace_sec
+        self.poll_interval_sec = poll_interval_sec
+        self.memory_check_interval_sec = memory_check_interval_sec
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._idle = []
+        self._active = {}
+        self._closed = False
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+        process = self._ctx.Process(
+            target=_child_main,
+            args=(child_conn, self.rlimit_as_mb, self.target),
+            name='jobcan-automation',
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def warm(self):
+        """待機中の子プロセスを prewarm 本まで補充する。"""
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                self._idle = [(p, c) for p, c in self._idle if p.is_alive()]
+                if len(self._idle) >= self.prewarm:
+                    return
+            worker = self._spawn()
+            with self._lock:
+                if self._closed:
+                    self._discard(worker)
+                    return
+                self._idle.append(worker)
+
+    def _take(self):
+        with self._lock:
+            while self._idle:
+                process, conn = self._idle.pop(0)
+                if process.is_alive():
+                    return process, conn
+                self._discard((process, conn))
+        return self._spawn()
+
+    @staticmethod
+    def _discard(worker):
+        process, conn = worker
+        try:
+            conn.close()
+        except Exception:
+            pass
+        if process.is_alive():
+            kill_process_tree(process.pid)
+        process.join(timeout=1)
+
+    def describe(self):
+        with self._lock:
+            return {
+                'mode': 'process',
+                'prewarm': self.prewarm,
+                'idle_workers': len(self._idle),
+                'active_jobs': {job_id: pid for job_id, pid in self._active.items()},
+                'memory_cap_mb': self.memory_cap_mb,
+                'rlimit_as_mb': self.rlimit_as_mb,
+                'kill_grace_sec': self.kill_grace_sec,
+            }
+
+    def run(self, job_id, job_snapshot, kwargs, on_message, timeout_sec=0, log_maxlen=500, start_time=None):
+        """
+        子プロセスでジョブを実行し、終了まで待つ（呼び出しスレッドをブロック）。
+
+        on_message(message) は子からの更新ごとに呼ばれる。
+        戻り値は (終了理由, 詳細)。終了理由は EXIT_* のいずれか。
+        """
+        if start_time is None:
+            start_time = time.time()
+        process, conn = self._take()
+        with self._lock:
+            self._active[job_id] = process.pid
+        hard_deadline = start_time + timeout_sec + self.kill_grace_sec if timeout_sec and timeout_sec > 0 else None
+        next_memory_check = 0.0
+        outcome = (EXIT_CRASHED, f'exitcode={process.exitcode}')
+        try:
+            conn.send(('run', job_id, job_snapshot, kwargs, log_maxlen))
+            while True:
+                try:
+                    ready = conn.poll(self.poll_interval_sec)
+                except (EOFError, OSError):
+                    ready = False
+                if ready:
+                    try:
+                        message = conn.recv()
+                    except (EOFError, OSError):
+                        process.join(timeout=5)
+                        outcome = (EXIT_CRASHED, f'exitcode={process.exitcode}')
+                        break
+                    kind = message[0]
+                    if kind == MSG_DONE:
+                        outcome = (EXIT_DONE, None)
+                        break
+                    if kind == MSG_ERROR:
+                        outcome = (EXIT_ERROR, message[1])
+                        break
+                    on_message(message)
+
+                # 更新が届いた回も含めて毎回確認する（poll 間隔より頻繁にログを送る子も期限・メモリ上限で止める）
+                if not process.is_alive() and not ready:
+                    outcome = (EXIT_CRASHED, f'exitcode={process.exitcode}')
+                    break
+                now = time.time()
+                if hard_deadline is not None and now > hard_deadline:
+                    logger.warning(f"job_process_timeout_kill job_id={job_id} pid={process.pid} timeout_sec={timeout_sec}")
+                    kill_process_tree(process.pid)
+                    outcome = (EXIT_TIMEOUT, None)
+                    break
+                if self.memory_cap_mb and now >= next_memory_check:
+                    next_memory_check = now + self.memory_check_interval_sec
+                    rss_mb = process_tree_rss_mb(process.pid)
+                    if rss_mb > self.memory_cap_mb:
+                        logger.warning(
+                            f"job_process_memory_kill job_id={job_id} pid={process.pid} "
+                            f"rss_mb={rss_mb:.1f} cap_mb={self.memory_cap_mb}"
+                        )
+                        kill_process_tree(process.pid)
+                        outcome = (EXIT_MEMORY, round(rss_mb, 1))
+                        break
+        finally:
+            with self._lock:
+                self._active.pop(job_id, None)
+            try:
+                conn.close()
+            except Exception:
+                pass
+            process.join(timeout=10)
+            if process.is_alive():
+                kill_process_tree(process.pid)
+                process.join(timeout=1)
+            # 次のジョブ用の子プロセスを補充（失敗してもジョブ結果には影響させない）
+            try:
+                self.warm()
+            except Exception as warm_error:
+                logger.warning(f"job_process_warm_error error={warm_error}")
+        return outcome
+
+    def shutdown(self):
+        """待機中・実行中の子プロセスをすべて終了する（ワーカー終了時）。"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            active_pids = list(self._active.values())
+        for worker in idle:
+            self._discard(worker)
+        for pid in active_pids:
+            kill_process_tree(pid)
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+AutoFill ジョブ管理用のインデックス付きレジストリ。
+
+app.py の jobs / job_queue / queued_job_params / queue_identity_index をまとめて保持し、
+ステータス別のジョブ集合と件数、O(1) で順番を引ける待機キューを維持する。
+automation.py は jobs[job_id]['status'] = ... を直接書き換えるため、ジョブレコード側で
+ステータス変更を検知してインデックスを更新する（呼び出し側の変更は不要）。
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# クライアントに見えない内部管理用のキー。書き換えても version は進めない
+# （heartbeat のたびに version が変わると変更検知・SSE 配信が無意味になるため）
+UNVERSIONED_FIELDS = frozenset((
+    'last_heartbeat_at',
+    'lease_expires_at',
+    'disconnect_hint_at',
+    'client_attached',
+    'client_stale_warned',
+    'last_updated',
+))
+
+
+# 値の比較で「変化なし」と判断してよい型（list / dict は中身を書き換えて再代入されうるので除外）
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+class JobRecord(dict):
+    """ステータス変更をレジストリへ通知する dict。
+
+    version: クライアントに見える内容（ステータス・進捗・ログ等）が変わるたびに増える
+    log_count: add_job_log で追加されたログの通算件数（バッファから古い行が落ちても減らない）
+    """
+
+    __slots__ = ('_registry', '_job_id', '_version', '_log_count')
+
+    def __init__(self, registry, job_id, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._registry = registry
+        self._job_id = job_id
+        self._version = 0
+        self._log_count = len(self.get('logs') or ())
+
+    @property
+    def job_id(self):
+        return self._job_id
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def log_count(self):
+        # JobLogBuffer は自前で通算件数を持つ（素の deque / list のときだけ mark_changed の加算分を使う）
+        total_count = getattr(self.get('logs'), 'total_count', None)
+        return self._log_count if total_count is None else total_count
+
+    def __setitem__(self, key, value):
+        if key == 'status':
+            old = self.get('status')
+            super().__setitem__(key, value)
+            if old != value:
+                self._registry._on_status_change(self._job_id, old, value)
+                self._registry._bump(self)
+            return
+        unchanged = (
+            isinstance(value, _SCALAR_TYPES)
+            and key in self
+            and type(self[key]) is type(value)
+            and self[key] == value
+        )
+        super().__setitem__(key, value)
+        if key in self._registry._watched_fields:
+            self._registry._notify_field(self._job_id, key, self)
+        # 同じスカラー値の再代入（update_progress の繰り返し等）では version を上げない（ETag が変わらない）
+        if key not in UNVERSIONED_FIELDS and not unchanged:
+            self._registry._bump(self)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def __reduce__(self):
+        # pickle / copy では素の dict として扱う
+        return (dict, (dict(self),))
+
+
+class JobQueue:
+    """
+    重複なしの FIFO。append / popleft / remove / 位置取得が O(1)。
+
+    各要素に追加順の通し番号を振り、位置は「自分の番号 - 先頭の番号 + 1」で求める。
+    途中要素の削除（キャンセル・期限切れ）で穴が空いた場合のみ、次回の位置取得時に振り直す。
+    """
+
+    def __init__(self):
+        self._order = OrderedDict()
+        self._next_ordinal = 0
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._order)
+
+    def __bool__(self):
+        return bool(self._order)
+
+    def __contains__(self, job_id):
+        return job_id in self._order
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._order))
+
+    def __repr__(self):
+        return f"JobQueue({list(self._order)!r})"
+
+    def append(self, job_id):
+        if job_id in self._order:
+            return
+        self._order[job_id] = self._next_ordinal
+        self._next_ordinal += 1
+
+    def popleft(self):
+        if not self._order:
+            raise IndexError('pop from an empty JobQueue')
+        job_id, _ = self._order.popitem(last=False)
+        return job_id
+
+    def peek(self):
+        if not self._order:
+            return None
+        return next(iter(self._order))
+
+    def remove(self, job_id):
+        """要素を取り除く。存在しなければ何もしない。"""
+        if job_id not in self._order:
+            return False
+        was_head = self.peek() == job_id
+        del self._order[job_id]
+        if not was_head and self._order:
+            self._dirty = True
+        return True
+
+    discard = remove
+
+    def clear(self):
+        self._order.clear()
+        self._next_ordinal = 0
+        self._dirty = False
+
+    def position(self, job_id) -> Optional[int]:
+        """1-based の順番。キューに無ければ None。"""
+        ordinal = self._order.get(job_id)
+        if ordinal is None:
+            return None
+        if self._dirty:
+            self._renumber()
+            ordinal = self._order[job_id]
+        return ordinal - self._order[self.peek()] + 1
+
+    def _renumber(self):
+        for index, job_id in enumerate(self._order):
+            self._order[job_id] = index
+        self._next_ordinal = len(self._order)
+        self._dirty = False
+
+
+class JobTable(dict):
+    """jobs 辞書。登録・削除に合わせてレジストリのインデックスを更新する。"""
+
+    def __init__(self, registry):
+        super().__init__()
+        self._registry = registry
+
+    def __setitem__(self, job_id, job_info):
+        if not isinstance(job_info, JobRecord) or job_info._registry is not self._registry:
+            job_info = JobRecord(self._registry, job_id, job_info or {})
+        else:
+            job_info._job_id = job_id
+        previous = super().get(job_id)
+        if previous is not None and previous is not job_info:
+            self._registry._on_remove(job_id, previous)
+        super().__setitem__(job_id, job_info)
+        self._registry._on_status_change(job_id, None, job_info.get('status'))
+
+    def __delitem__(self, job_id):
+        job_info = super().__getitem__(job_id)
+        super().__delitem__(job_id)
+        self._registry._on_remove(job_id, job_info)
+        self._registry._signal()
+
+    def pop(self, job_id, *default):
+        if job_id not in self:
+            if default:
+                return default[0]
+            raise KeyError(job_id)
+        job_info = super().__getitem__(job_id)
+        del self[job_id]
+        return job_info
+
+    def popitem(self):
+        job_id = next(reversed(self))
+        return job_id, self.pop(job_id)
+
+    def setdefault(self, job_id, default=None):
+        if job_id not in self:
+            self[job_id] = default if default is not None else {}
+        return self[job_id]
+
+    def update(self, *args, **kwargs):
+        for job_id, job_info in dict(*args, **kwargs).items():
+            self[job_id] = job_info
+
+    def clear(self):
+        removed = [(job_id, job_info.get('status')) for job_id, job_info in self.items()]
+        super().clear()
+        self._registry._reset_indexes()
+        for job_id, status in removed:
+            if status is not None:
+                self._registry._notify(job_id, status, None)
+        self._registry._signal()
+
+    def mark_changed(self, job_id, logs_appended=0):
+        """dict の外側（ログ deque への追記など）で内容が変わったことを記録する。"""
+        job_info = super().get(job_id)
+        if not isinstance(job_info, JobRecord):
+            return
+        if logs_appended:
+            job_info._log_count += logs_appended
+        self._registry._bump(job_info)
+
+
+class JobRegistry:
+    """
+    jobs / 待機キュー / 実行パラメータ / 同一ユーザー索引を一括で所有する。
+
+    - jobs: JobTable（dict 互換）
+    - queue: JobQueue（FIFO・位置 O(1)）
+    - queued_params: queued ジョブの開始用パラメータ
+    - identity_index: queue_key -> job_id
+    - ステータス別の job_id 集合と件数（running 数の取得が O(1)）
+    - add_listener(fn): ステータス遷移・削除時に fn(job_id, old_status, new_status) を呼ぶ
+      （削除時は new_status=None）
+    - watch_fields(fields, fn): 指定キーが書き換えられたら fn(job_id, key, job_info) を呼ぶ
+    - wait_for_change(job_id, version, timeout): ジョブの version が変わるまで待つ（SSE 用）
+
+    lock は従来の jobs_lock と同じもの。インデックス更新は automation スレッドから
+    ロック外で呼ばれることもあるため、内部用の軽量ロックで別途保護する。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._by_status: Dict[str, Set[str]] = {}
+        self.jobs = JobTable(self)
+        self.queue = JobQueue()
+        self.queued_params: Dict[str, dict] = {}
+        self.identity_index: Dict[str, str] = {}
+        self._listeners = []
+        self._watched_fields = frozenset()
+        self._field_listeners = []
+        self._changed = threading.Condition(threading.Lock())
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def watch_fields(self, fields, listener):
+        self._watched_fields = self._watched_fields.union(fields)
+        self._field_listeners.append((frozenset(fields), listener))
+
+    def _notify_field(self, job_id, key, job_info):
+        for fields, listener in self._field_listeners:
+            if key not in fields:
+                continue
+            try:
+                listener(job_id, key, job_info)
+            except Exception:
+                logger.exception("job_registry_field_listener_error job_id=%s key=%s", job_id, key)
+
+    def _bump(self, job_info):
+        job_info._version += 1
+        self._signal()
+
+    def _signal(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait_for_change(self, job_id, version, timeout):
+        """job_id の version が version と異なるか、ジョブが消えるまで最大 timeout 秒待つ。
+
+        戻り値は現在の version（ジョブが無ければ None）。
+        """
+        def current():
+            job_info = dict.get(self.jobs, job_id)
+            return None if job_info is None else job_info._version
+
+        with self._changed:
+            self._changed.wait_for(lambda: current() != version, timeout)
+        return current()
+
+    def _notify(self, job_id, old_status, new_status):
+        for listener in self._listeners:
+            try:
+                listener(job_id, old_status, new_status)
+            except Exception:
+                logger.exception("job_registry_listener_error job_id=%s", job_id)
+
+    # --- インデックス更新（JobRecord / JobTable から呼ばれる） ---
+
+    def _on_status_change(self, job_id, old_status, new_status):
+        with self._index_lock:
+            if old_status is not None:
+                bucket = self._by_status.get(old_status)
+                if bucket is not None:
+                    bucket.discard(job_id)
+            if new_status is not None:
+                self._by_status.setdefault(new_status, set()).add(job_id)
+        if old_status == 'queued' and new_status != 'queued':
+            # queued を抜けたジョブはキューと実行パラメータから外す（compact 不要にする）
+            self.queue.discard(job_id)
+            self.queued_params.pop(job_id, None)
+        if old_status != new_status:
+            self._notify(job_id, old_status, new_status)
+
+    def _on_remove(self, job_id, job_info):
+        status = job_info.get('status') if job_info else None
+        with self._index_lock:
+            bucket = self._by_status.get(status)
+            if bucket is not None:
+                bucket.discard(job_id)
+        self.queue.discard(job_id)
+        self.queued_params.pop(job_id, None)
+        if status is not None:
+            self._notify(job_id, status, None)
+
+    def _reset_indexes(self):
+        with self._index_lock:
+            self._by_status.clear()
+        self.queue.clear()
+        self.queued_params.clear()
+        self.identity_index.clear()
+
+    # --- 参照系 ---
+
+    def count(self, status) -> int:
+        with self._index_lock:
+            return len(self._by_status.get(status, ()))
+
+    def running_count(self) -> int:
+        return self.count('running')
+
+    def ids_with_status(self, *statuses) -> List[str]:
+        """指定ステータスの job_id 一覧（スナップショット）。"""
+        with self._index_lock:
+            result: List[str] = []
+            for status in statuses:
+                result.extend(self._by_status.get(status, ()))
+            return result
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._index_lock:
+            return {status: len(ids) for status, ids in self._by_status.items() if ids}
+
+    def queue_position(self, job_id) -> Optional[int]:
+        return self.queue.position(job_id)
+
+    def clear(self):
+        self.jobs.clear()
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+AutoFill ジョブのワーカー間共有ストア。
+
+gunicorn の各ワーカーは jobs / job_queue をプロセス内に持つため、そのままでは
+MAX_ACTIVE_SESSIONS / MAX_QUEUE_SIZE がワーカー単位の上限になり、別ワーカーに届いた
+/status ポーリングは 404 になる。ここでは「受付（admission）・全体 FIFO・実行枠・lease」だけを
+共有し、ジョブ本体（資格情報・ファイル・automation スレッド）は受け付けたワーカーが持ち続ける。
+
+- MemoryJobStore: 既定。従来どおりプロセス内の JobRegistry だけで判定する。
+- SQLiteJobStore: 同一ホストの全ワーカーで 1 つの SQLite（WAL）ファイルを共有する。
+  資格情報は書き込まない。queued の lease はクライアント heartbeat、ワーカー自体の生存は
+  workers テーブルの seen_at で判定し、途絶えたワーカーのジョブは枠から外す。
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STORE_LIVE_STATUSES = ('queued', 'running')
+
+ADMIT_RUNNING = 'running'
+ADMIT_QUEUED = 'queued'
+ADMIT_FULL = 'full'
+
+
+def _default_owner_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class MemoryJobStore:
+    """プロセス内 JobRegistry だけで判定する既定バックエンド。"""
+
+    name = 'memory'
+    shared = False
+
+    def __init__(self, registry):
+        self._registry = registry
+
+    def admit(self, job_id, queue_key, max_running, max_queue, lease_expires_at) -> Tuple[str, int, int]:
+        """新規ジョブの受付判定。jobs_lock 内で呼ぶこと。(判定, running数, queue長) を返す。"""
+        running_count = self._registry.running_count()
+        queue_size = len(self._registry.queue)
+        if running_count < max_running:
+            return ADMIT_RUNNING, running_count, queue_size
+        if queue_size >= max_queue:
+            return ADMIT_FULL, running_count, queue_size
+        return ADMIT_QUEUED, running_count, queue_size
+
+    def try_claim(self, job_id, max_running) -> bool:
+        return True
+
+    def touch(self, job_id, lease_expires_at):
+        return None
+
+    def release(self, job_id, status):
+        return None
+
+    def running_count(self) -> int:
+        return self._registry.running_count()
+
+    def queue_length(self) -> int:
+        return len(self._registry.queue)
+
+    def queue_position(self, job_id) -> Optional[int]:
+        return self._registry.queue_position(job_id)
+
+    def find_live(self, queue_key) -> Optional[str]:
+        return None
+
+    def publish(self, job_id, snapshot):
+        return None
+
+    def load(self, job_id) -> Optional[dict]:
+        return None
+
+    def request_cancel(self, job_id) -> Optional[str]:
+        return None
+
+    def heartbeat_owner(self, job_ids: Iterable[str] = ()) -> Dict[str, dict]:
+        return {}
+
+    def describe(self) -> dict:
+        return {'backend': self.name, 'shared': self.shared}
+
+
+class SQLiteJobStore:
+    """同一ホストのワーカー間で共有する SQLite（WAL）バックエンド。"""
+
+    name = 'sqlite'
+    shared = True
+
+    _SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL UNIQUE,
+            queue_key TEXT,
+            owner TEXT NOT NULL,
+            status TEXT NOT NULL,
+            enqueued_at REAL NOT NULL,
+            lease_expires_at REAL,
+            updated_at REAL NOT NULL,
+            snapshot TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status_seq ON jobs(status, seq)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_queue_key ON jobs(queue_key, status)",
+        """
+        CREATE TABLE IF NOT EXISTS workers (
+            owner TEXT PRIMARY KEY,
+            seen_at REAL NOT NULL
+        )
+        """,
+    )
+
+    def __init__(self, path, owner=None, owner_stale_sec=30, retention_sec=1800, busy_timeout_ms=5000):
+        self.path = path
+        self._owner = owner
+        self.owner_stale_sec = owner_stale_sec
+        self.retention_sec = retention_sec
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        with self._transaction() as conn:
+            for statement in self._SCHEMA:
+                conn.execute(statement)
+
+    @property
+    def owner(self):
+        # gunicorn は import 後に fork しうるため pid は都度評価する
+        return self._owner or _default_owner_id()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and getattr(self._local, 'pid', None) == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000.0, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    class _Tx:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def __enter__(self):
+            self.conn.execute('BEGIN IMMEDIATE')
+            return self.conn
+
+        def __exit__(self, exc_type, exc, tb):
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+            return False
+
+    def _transaction(self):
+        return self._Tx(self._connect())
+
+    def _reap_locked(self, conn, now):
+        """lease 切れの queued と、生存確認の途絶えたワーカーのジョブを枠から外す。"""
+        conn.execute(
+            "UPDATE jobs SET status='expired', updated_at=? "
+            "WHERE status='queued' AND lease_expires_at IS NOT NULL AND lease_expires_at < ?",
+            (now, now),
+        )
+        conn.execute(
+            "UPDATE jobs SET status='expired', updated_at=? "
+            "WHERE status IN ('queued', 'running') AND owner != ? AND owner NOT IN "
+            "(SELECT owner FROM workers WHERE seen_at >= ?)",
+            (now, self.owner, now - self.owner_stale_sec),
+        )
+
+    def _counts_locked(self, conn):
+        row = conn.execute(
+            "SELECT SUM(status='running'), SUM(status='queued') FROM jobs WHERE status IN ('queued', 'running')"
+        ).fetchone()
+        return int(row[0] or 0), int(row[1] or 0)
+
+    def admit(self, job_id, queue_key, max_running, max_queue, lease_expires_at) -> Tuple[str, int, int]:
+        now = time.time()
+        with self._transaction() as conn:
+            self._touch_owner_locked(conn, now)
+            self._reap_locked(conn, now)
+            running_count, queue_size = self._counts_locked(conn)
+            # 全体 FIFO を守るため、待機者がいる間は空き枠があっても後ろに並ぶ
+            if running_count < max_running and queue_size == 0:
+                decision = ADMIT_RUNNING
+            elif queue_size >= max_queue:
+                return ADMIT_FULL, running_count, queue_size
+            else:
+                decision = ADMIT_QUEUED
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, queue_key, owner, status, enqueued_at, lease_expires_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, queue_key, self.owner, decision, now, lease_expires_at, now),
+            )
+        return decision, running_count, queue_size
+
+    def try_claim(self, job_id, max_running) -> bool:
+        """job_id が全体 FIFO の先頭かつ空き枠があれば running にする。"""
+        now = time.time()
+        with self._transaction() as conn:
+            self._touch_owner_locked(conn, now)
+            self._reap_locked(conn, now)
+            running_count, _ = self._counts_locked(conn)
+            if running_count >= max_running:
+                return False
+            head = conn.execute(
+                "SELECT job_id FROM jobs WHERE status='queued' ORDER BY seq LIMIT 1"
+            ).fetchone()
+            if not head or head[0] != job_id:
+                return False
+            conn.execute(
+                "UPDATE jobs SET status='running', updated_at=? WHERE job_id=?",
+                (now, job_id),
+            )
+        return True
+
+    def touch(self, job_id, lease_expires_at):
+        if not job_id:
+            return
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET lease_expires_at=MAX(COALESCE(lease_expires_at, 0), ?), updated_at=? "
+            "WHERE job_id=? AND status IN ('queued', 'running')",
+            (lease_expires_at, time.time(), job_id),
+        )
+
+    def release(self, job_id, status):
+        if not job_id:
+            return
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET status=?, updated_at=? WHERE job_id=? AND status IN ('queued', 'running')",
+            (status or 'expired', time.time(), job_id),
+        )
+
+    def running_count(self) -> int:
+        return self._counts_locked(self._connect())[0]
+
+    def queue_length(self) -> int:
+        return self._counts_locked(self._connect())[1]
+
+    def queue_position(self, job_id) -> Optional[int]:
+        row = self._connect().execute(
+            "SELECT 1 + (SELECT COUNT(*) FROM jobs q WHERE q.status='queued' AND q.seq < j.seq) "
+            "FROM jobs j WHERE j.job_id=? AND j.status='queued'",
+            (job_id,),
+        ).fetchone()
+        return int(row[0]) if row else None
+
+    def find_live(self, queue_key) -> Optional[str]:
+        if not queue_key:
+            return None
+        row = self._connect().execute(
+            "SELECT job_id FROM jobs WHERE queue_key=? AND status IN ('queued', 'running') "
+            "ORDER BY status='queued', seq LIMIT 1",
+            (queue_key,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def publish(self, job_id, snapshot):
+        try:
+            payload = json.dumps(snapshot, ensure_ascii=False, default=str)
+        except (TypeError, ValueError) as exc:
+            logger.warning("job_store_publish_encode_error job_id=%s error=%s", job_id, exc)
+            return
+        self._connect().execute(
+            "UPDATE jobs SET snapshot=?, updated_at=? WHERE job_id=?",
+            (payload, time.time(), job_id),
+        )
+
+    def load(self, job_id) -> Optional[dict]:
+        row = self._connect().execute(
+            "SELECT status, owner, snapshot FROM jobs WHERE job_id=?",
+            (job_id,),
+        ).fetchone()
+        if not row:
+            return None
+        status, owner, raw = row
+        try:
+            snapshot = json.loads(raw) if raw else {}
+        except ValueError:
+            snapshot = {}
+        # 共有ストア側で終了済みにされた場合はそちらを優先する
+        if status not in STORE_LIVE_STATUSES or not snapshot.get('status'):
+            snapshot['status'] = status
+        snapshot['owner'] = owner
+        return snapshot
+
+    def request_cancel(self, job_id) -> Optional[str]:
+        """別ワーカー所有の queued ジョブを cancelled にする。所有ワーカーが次の同期で後始末する。"""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE job_id=?", (job_id,)).fetchone()
+            if not row:
+                return None
+            if row[0] == 'queued':
+                conn.execute(
+                    "UPDATE jobs SET status='cancelled', updated_at=? WHERE job_id=?",
+                    (time.time(), job_id),
+                )
+                return 'cancelled'
+            return row[0]
+
+    def _touch_owner_locked(self, conn, now):
+        conn.execute(
+            "INSERT INTO workers (owner, seen_at) VALUES (?, ?) "
+            "ON CONFLICT(owner) DO UPDATE SET seen_at=excluded.seen_at",
+            (self.owner, now),
+        )
+
+    def heartbeat_owner(self, job_ids: Iterable[str] = ()) -> Dict[str, dict]:
+        """
+        ワーカーの生存を記録し、古い行を掃除する。
+        job_ids（このワーカーが持つ live ジョブ）について共有ストア側の status / lease を返す。
+        """
+        now = time.time()
+        job_ids = list(job_ids)
+        with self._transaction() as conn:
+            self._touch_owner_locked(conn, now)
+            self._reap_locked(conn, now)
+            conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND updated_at < ?",
+                (now - self.retention_sec,),
+            )
+            conn.execute("DELETE FROM workers WHERE seen_at < ?", (now - self.retention_sec,))
+            states = {}
+            for job_id in job_ids:
+                row = conn.execute(
+                    "SELECT status, lease_expires_at FROM jobs WHERE job_id=?",
+                    (job_id,),
+                ).fetchone()
+                if row:
+                    states[job_id] = {'status': row[0], 'lease_expires_at': row[1]}
+        return states
+
+    def describe(self) -> dict:
+        return {'backend': self.name, 'shared': self.shared, 'path': self.path, 'owner': self.owner}
+
+
+def create_job_store(registry, backend=None, path=None, retention_sec=1800):
+    """JOB_STORE_BACKEND（memory / sqlite）に応じたストアを返す。失敗時は memory。"""
+    backend = (backend or os.getenv('JOB_STORE_BACKEND', 'memory') or 'memory').strip().lower()
+    if backend != 'sqlite':
+        return MemoryJobStore(registry)
+    path = path or os.getenv('JOB_STORE_SQLITE_PATH') or os.path.join(tempfile.gettempdir(), 'jobcan_job_store.sqlite3')
+    owner_stale_sec = int(os.getenv('JOB_STORE_OWNER_STALE_SEC', '30'))
+    try:
+        store = SQLiteJobStore(path, owner_stale_sec=owner_stale_sec, retention_sec=retention_sec)
+        logger.info("job_store_initialized backend=sqlite path=%s", path)
+        return store
+    except sqlite3.Error as exc:
+        logger.error("job_store_init_failed backend=sqlite path=%s error=%s - falling back to memory", path, exc)
+        return MemoryJobStore(registry)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+ワーカーごとに 1 本だけ動く定期メンテナンススレッド。
+
+prune_jobs・期限切れセッション掃除・一時ファイル掃除などをリクエスト処理から切り離して実行する。
+各タスクは独立した間隔で動き、例外はタスク単位で握りつぶしてログに残す（スレッドは止めない）。
+スレッド自体が落ちた場合は ensure_running() で再起動する。
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceTask:
+    def __init__(self, name, func, interval_sec, backlog=None, initial_delay_sec=None):
+        self.name = name
+        self.func = func
+        self.interval_sec = float(interval_sec)
+        self.backlog = backlog
+        delay = self.interval_sec if initial_delay_sec is None else float(initial_delay_sec)
+        self.next_run_at = time.time() + delay
+        self.last_started_at = None
+        self.last_duration_ms = None
+        self.last_error = None
+        self.runs = 0
+        self.failures = 0
+
+    def snapshot(self):
+        backlog = None
+        if self.backlog is not None:
+            try:
+                backlog = self.backlog()
+            except Exception as backlog_error:
+                backlog = f'error: {backlog_error}'
+        return {
+            'interval_sec': self.interval_sec,
+            'last_started_at': self.last_started_at,
+            'last_duration_ms': self.last_duration_ms,
+            'last_error': self.last_error,
+            'next_run_at': self.next_run_at,
+            'runs': self.runs,
+            'failures': self.failures,
+            'backlog': backlog,
+        }
+
+
+class MaintenanceRunner:
+    """登録タスクを期限順に実行する単一スレッドのスケジューラ。"""
+
+    def __init__(self, name='maintenance', max_sleep_sec=5.0):
+        self.name = name
+        self.max_sleep_sec = max_sleep_sec
+        self._tasks: Dict[str, MaintenanceTask] = {}
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._restarts = 0
+
+    def add_task(self, name, func: Callable[[], object], interval_sec, backlog=None, initial_delay_sec=None):
+        with self._lock:
+            self._tasks[name] = MaintenanceTask(name, func, interval_sec, backlog=backlog, initial_delay_sec=initial_delay_sec)
+        self._wake_event.set()
+
+    def run_pending(self, now=None):
+        """期限が来たタスクを実行する。実行したタスク名のリストを返す。"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            due = [task for task in self._tasks.values() if task.next_run_at <= now]
+        ran = []
+        for task in due:
+            self._run_task(task)
+            ran.append(task.name)
+        return ran
+
+    def run_now(self, name):
+        with self._lock:
+            task = self._tasks[name]
+        self._run_task(task)
+
+    def _run_task(self, task):
+        # 手動実行（run_now）とスレッドが同時に同じ処理を走らせないよう直列化する
+        with self._run_lock:
+            started_at = time.time()
+            task.last_started_at = started_at
+            try:
+                task.func()
+                task.last_error = None
+            except Exception as task_error:
+                task.failures += 1
+                task.last_error = str(task_error)
+                logger.warning(f"maintenance_task_error task={task.name} error={task_error}")
+            finished_at = time.time()
+            task.runs += 1
+            task.last_duration_ms = round((finished_at - started_at) * 1000, 1)
+            task.next_run_at = finished_at + task.interval_sec
+
+    def _seconds_until_next(self):
+        with self._lock:
+            if not self._tasks:
+                return self.max_sleep_sec
+            next_run_at = min(task.next_run_at for task in self._tasks.values())
+        return max(0.0, min(self.max_sleep_sec, next_run_at - time.time()))
+
+    def _loop(self):
+        logger.info(f"maintenance_thread_started name={self.name}")
+        while not self._stop_event.is_set():
+            self.run_pending()
+            self._wake_event.wait(self._seconds_until_next())
+            self._wake_event.clear()
+        logger.info(f"maintenance_thread_stopped name={self.name}")
+
+    def start(self):
+        """スレッドを起動する（起動済みなら何もしない）。"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            if self._thread is not None:
+                self._restarts += 1
+                logger.warning(f"maintenance_thread_restarted name={self.name} restarts={self._restarts}")
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+            return True
+
+    def ensure_running(self):
+        """停止要求が出ていないのにスレッドが死んでいれば再起動する（安価な生存確認）。"""
+        thread = self._thread
+        if thread is None or thread.is_alive() or self._stop_event.is_set():
+            return
+        self.start()
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        self._wake_event.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot(self):
+        with self._lock:
+            tasks = list(self._tasks.values())
+        return {
+            'name': self.name,
+            'running': self.is_running(),
+            'restarts': self._restarts,
+            'tasks': {task.name: task.snapshot() for task in tasks},
+        }
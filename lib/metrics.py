@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+プロセス内のメトリクスレジストリ（Counter / Gauge / Histogram）と Prometheus テキスト形式の出力。
+
+これまでリクエストの所要時間は after_request の req_end ログにしか残らず、
+diagnostics.runtime_metrics のブラウザ数・ジョブ数もログでしか見えなかった。
+ここでは /metrics（app.py・METRICS_TOKEN 必須）で集計値を出す。
+
+- リクエストのたびに通るため、更新は「ラベル値の組 -> 子」を dict で引き、子ごとの小さなロックで加算するだけ
+  （レジストリ全体のロックは子を初めて作るときと出力時のみ）
+- Histogram のバケットは固定（bisect で位置を求めて 1 加算）。出力時に累積にする
+- Gauge は値を set するか、出力時に呼ぶ関数（キュー長など）を登録する。関数はリクエスト経路では呼ばれない。
+  別の場所で数えている累計（キャッシュの統計など）は同じく関数付きの Counter にする
+- ラベル値は呼び出し側で有限個に抑える（ルートは URL ではなく url_rule を使う等）
+
+値は gunicorn ワーカーごと。automation を子プロセスで動かす場合（AUTOMATION_EXECUTOR=process）は
+子側で set_metric_sink() によりパイプ経由で親へ送り、親のレジストリに反映する。
+"""
+import bisect
+import math
+import threading
+import time
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape_label_value(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=(), func=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        # func: 出力時に呼ぶ。ラベル無しなら数値、ラベル有りなら {ラベル値の組: 数値}
+        # （値を別の場所で数えているもの。キュー長やキャッシュの統計など）
+        self._func = func
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """ラベル値の組に対応する子を返す（無ければ作る）。"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is not None:
+            return child
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {key}")
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def collect(self):
+        raise NotImplementedError
+
+    def _collect_func(self):
+        try:
+            result = self._func()
+        except Exception:
+            return []
+        if not self.labelnames:
+            return [f"{self.name} {_format_value(float(result))}"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key if isinstance(key, tuple) else (key,))} {_format_value(float(value))}"
+            for key, value in sorted(result.items())
+        ]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.collect())
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('_lock', 'value')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, *labelvalues, amount=1.0):
+        self.labels(*labelvalues).inc(amount)
+
+    def collect(self):
+        if self._func is not None:
+            return self._collect_func()
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in self._items()
+        ]
+
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        # 代入は 1 回の参照書き換えなのでロック不要
+        self.value = float(value)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value, *labelvalues):
+        self.labels(*labelvalues).set(value)
+
+    def collect(self):
+        if self._func is not None:
+            return self._collect_func()
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in self._items()
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ('_lock', '_upper_bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, upper_bounds):
+        self._lock = threading.Lock()
+        self._upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # 最後は +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets if bound != math.inf))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value, *labelvalues):
+        self.labels(*labelvalues).observe(value)
+
+    def collect(self):
+        lines = []
+        bounds = self.buckets + (math.inf,)
+        for key, child in self._items():
+            counts, total, count = child.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, (('le', _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"metric {metric.name} already registered with a different type or labels")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=(), func=None):
+        return self._register(Counter(name, help_text, labelnames, func=func))
+
+    def gauge(self, name, help_text, labelnames=(), func=None):
+        return self._register(Gauge(name, help_text, labelnames, func=func))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets=buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Prometheus テキスト形式（text/plain; version=0.0.4）。"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# プロセス全体で 1 つのレジストリ（app.py・automation.py・lib.amazon_creators から使う）
+registry = MetricsRegistry()
+
+AUTOMATION_STEP_SECONDS = registry.histogram(
+    'jobcan_automation_step_seconds',
+    'Time spent in each per-row AutoFill step.',
+    ('step',),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+AMAZON_API_SECONDS = registry.histogram(
+    'jobcan_amazon_api_seconds',
+    'Latency of Amazon Creators API calls.',
+    ('operation', 'outcome'),
+)
+
+# 子プロセスでは親へ転送する関数に差し替える（lib.job_process）
+_metric_sink = None
+
+
+def set_metric_sink(sink):
+    """histogram の observe を sink(name, labelvalues, value) へ回す（None で元に戻す）。"""
+    global _metric_sink
+    _metric_sink = sink
+
+
+def observe(name, value, *labelvalues):
+    """名前で histogram に記録する。子プロセスでは sink 経由で親へ送る。"""
+    sink = _metric_sink
+    if sink is not None:
+        sink(name, labelvalues, value)
+        return
+    metric = registry.get(name)
+    if metric is not None:
+        metric.observe(value, *labelvalues)
+
+
+class StepTimer:
+    """1 行分の処理を区切りごとに計測する。mark(step) は前回の区切りからの時間を step として記録する。"""
+
+    __slots__ = ('_clock', '_row_started', '_last')
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._row_started = self._last = clock()
+
+    def start_row(self):
+        self._row_started = self._last = self._clock()
+
+    def mark(self, step):
+        now = self._clock()
+        observe(AUTOMATION_STEP_SECONDS.name, now - self._last, step)
+        self._last = now
+
+    def finish_row(self):
+        now = self._clock()
+        observe(AUTOMATION_STEP_SECONDS.name, now - self._row_started, 'row_total')
+        self._last = now
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+静的なマーケティングページ（/, /autofill, /faq など）のレンダリング結果キャッシュ（PAGE_CACHE_ENABLED=1 で有効）。
+
+これらのページは Jinja テンプレートを毎回レンダリングしているが、出力が変わるのは
+パス・環境変数・Amazon 枠の入力（閲覧履歴 Cookie とローテーション期間）だけで、
+それ以外のリクエスト内容には依存しない。そこで呼び出し側が作ったキーごとに
+レンダリング済みの本文と gzip / brotli 圧縮版、強い ETag を保持し、
+ヒット時は辞書引きだけで応答できるようにする。
+
+- エントリは ttl_sec で失効する（Amazon の検索結果など外部データの更新を拾うため）
+- 件数（max_entries）と合計バイト数（max_bytes。圧縮版を含む）の上限を超えたら古い順に捨てる
+- brotli パッケージが無い環境では gzip のみ
+"""
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # 任意依存（requirements には含めない）
+    brotli = None
+
+# これより小さい本文は圧縮しない（ヘッダー分で逆に大きくなる）
+MIN_COMPRESS_BYTES = 1024
+
+
+class CachedPage:
+    __slots__ = ('body', 'variants', 'etag', 'mimetype', 'cookie', 'created_at', 'size')
+
+    def __init__(self, body, mimetype, cookie=None, created_at=None, compress_level=6):
+        self.body = body
+        self.mimetype = mimetype
+        # 再送する Set-Cookie の値（閲覧履歴 Cookie。キーに履歴を含むので同じキーなら同じ値）
+        self.cookie = cookie
+        self.created_at = time.time() if created_at is None else created_at
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants['gzip'] = gzip.compress(body, compresslevel=compress_level, mtime=0)
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(body, quality=min(11, compress_level + 3))
+        self.size = len(body) + sum(len(data) for data in self.variants.values())
+
+    def variant(self, encoding):
+        """(本文, Content-Encoding or None, ETag)。ETag は表現（符号化）ごとに変える。"""
+        data = self.variants.get(encoding) if encoding else None
+        if data is None:
+            return self.body, None, self.etag
+        return data, encoding, f"{self.etag}-{encoding}"
+
+    def etags(self):
+        return [self.etag] + [f"{self.etag}-{encoding}" for encoding in self.variants]
+
+
+def choose_encoding(accept_encodings, available):
+    """Accept-Encoding（werkzeug の MIMEAccept 相当）と手元の圧縮版から使う符号化を選ぶ。"""
+    best = None
+    best_quality = 0
+    # 同じ品質なら brotli を優先
+    for encoding in ('br', 'gzip'):
+        if encoding not in available:
+            continue
+        quality = accept_encodings.quality(encoding) if accept_encodings is not None else 0
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class PageCache:
+    def __init__(self, max_entries=128, max_bytes=8 * 1024 * 1024, ttl_sec=300, clock=None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = int(max_bytes)
+        self.ttl_sec = float(ttl_sec)
+        self._clock = clock or time.time
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self._clock() - entry.created_at > self.ttl_sec:
+                self._remove_locked(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, mimetype, cookie=None):
+        """レンダリング結果を保存する（圧縮はロック外）。保存したエントリを返す。"""
+        entry = CachedPage(body, mimetype, cookie=cookie, created_at=self._clock())
+        if entry.size > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = entry
+            self._total_bytes += entry.size
+            self.stores += 1
+            while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                self._remove_locked(oldest_key)
+                self.evictions += 1
+        return entry
+
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def describe(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_sec': self.ttl_sec,
+                'brotli': brotli is not None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'expired': self.expired,
+            }
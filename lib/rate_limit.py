@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+GCRA（Generic Cell Rate Algorithm）によるインメモリのレート制限。
+
+以前の RateLimiter は ip:group ごとにタイムスタンプの deque を持ち、キーを一切消さず、
+判定のたびに 1 つのグローバルロックの中で古い時刻を捨てていた。スキャナーのように送信元 IP が
+大量に変わるとメモリが増え続ける。
+
+GCRA ではキーごとに「理論上の次の到着時刻」（TAT）を float 1 つだけ持つ。
+1 件ごとに TAT を interval 進め、進めた TAT - tolerance が現在時刻より先なら拒否する。
+上限 limit 件 / window 秒は「どの window 秒の区間でも通るのは最大 limit 件」として守る:
+空の状態から連続で通るのは burst = ceil(limit / 2) 件、その後は interval = window / (limit - burst + 1)
+ごとに 1 件回復し、tolerance = burst * interval（limit が偶数なら window - interval）とする。
+interval = window / limit・tolerance = window にすると、最初の limit 件の直後から一定間隔で通るため
+window 秒の間に最大 2 * limit - 1 件通ってしまう。
+
+- キーはハッシュでストライプ（ロック + OrderedDict）に振り分け、ロック競合を分散する
+- TAT が現在時刻以下のキーは「一度も来ていない」のと同じ状態なので、いつ消しても判定は変わらない。
+  挿入時にストライプの古い順から TAT 切れのキーを捨てる（償却 O(1)）
+- それでもストライプが max_keys_per_stripe を超えたら最も古く使われたキーを捨てる（その分だけ制限が緩む）
+
+GcraRateLimiter はワーカーごとのメモリにあるため、実効上限は WEB_CONCURRENCY 倍になり、
+--max-requests による再起動でリセットされる。RATE_LIMIT_BACKEND=sqlite では同じ GCRA を
+同一ホストの全ワーカーで 1 つの SQLite（WAL・既定は /dev/shm 上）に持つ SQLiteRateLimiter を使う。
+SQLite が使えない・ロック待ちが長い場合はその回だけプロセス内の GcraRateLimiter で判定する。
+"""
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def _gcra_params(max_per_window, window_sec):
+    """(interval, tolerance)。どの window_sec 秒の区間でも max_per_window 件を超えない組み合わせ。"""
+    limit = max(1, int(max_per_window))
+    burst = (limit + 1) // 2
+    interval = window_sec / (limit - burst + 1)
+    return interval, burst * interval
+
+
+def _gcra_decide(tat, now, max_per_window, window_sec):
+    """(許可したか, 新しい TAT, 再試行までの秒数)。tat は保存済みの値（無ければ None）。"""
+    interval, tolerance = _gcra_params(max_per_window, window_sec)
+    if tat is None or tat < now:
+        tat = now
+    new_tat = tat + interval
+    allow_at = new_tat - tolerance
+    # 浮動小数の誤差で境界ちょうどの 1 件を拒否しないよう少しだけ余裕を持たせる
+    if allow_at > now + 1e-9:
+        return False, tat, max(1, math.ceil(allow_at - now))
+    return True, new_tat, 0
+
+
+class _Stripe:
+    __slots__ = ('lock', 'tats', 'evicted_idle', 'evicted_lru')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tats = OrderedDict()
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+
+
+class GcraRateLimiter:
+    def __init__(self, window_sec=60, stripes=16, max_keys_per_stripe=8192, clock=None):
+        self.window_sec = float(window_sec)
+        self.max_keys_per_stripe = int(max_keys_per_stripe)
+        self._stripes = tuple(_Stripe() for _ in range(max(1, int(stripes))))
+        self._clock = clock or time.time
+
+    def _stripe_for(self, key):
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def is_allowed(self, key, max_per_window):
+        """
+        1 件分を消費できるか判定する。戻り値は (許可したか, 再試行までの秒数)。
+
+        再試行までの秒数は許可時は 0、拒否時は次の 1 件が通るまでの秒数（切り上げ、最小 1）。
+        """
+        stripe = self._stripe_for(key)
+        with stripe.lock:
+            now = self._clock()
+            tats = stripe.tats
+            allowed, new_tat, retry_after = _gcra_decide(tats.get(key), now, max_per_window, self.window_sec)
+            if not allowed:
+                # 拒否時も最近使われたキーとして扱う（連打する送信元を LRU で先に捨てない）
+                tats.move_to_end(key)
+                return False, retry_after
+            if key in tats:
+                tats[key] = new_tat
+                tats.move_to_end(key)
+            else:
+                tats[key] = new_tat
+                self._evict_locked(stripe, now)
+            return True, 0
+
+    def _evict_locked(self, stripe, now):
+        tats = stripe.tats
+        # 先頭（最も古く使われたキー）から、TAT が過ぎた＝状態を持つ意味が無いキーを捨てる
+        while tats:
+            oldest_key, oldest_tat = next(iter(tats.items()))
+            if oldest_tat > now:
+                break
+            del tats[oldest_key]
+            stripe.evicted_idle += 1
+        while len(tats) > self.max_keys_per_stripe:
+            tats.popitem(last=False)
+            stripe.evicted_lru += 1
+
+    def sweep(self):
+        """全ストライプから TAT 切れのキーを捨てる（メンテナンススレッド用）。捨てた件数を返す。"""
+        removed = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                now = self._clock()
+                expired = [key for key, tat in stripe.tats.items() if tat <= now]
+                for key in expired:
+                    del stripe.tats[key]
+                stripe.evicted_idle += len(expired)
+                removed += len(expired)
+        return removed
+
+    def __len__(self):
+        return sum(len(stripe.tats) for stripe in self._stripes)
+
+    def describe(self):
+        return {
+            'algorithm': 'gcra',
+            'window_sec': self.window_sec,
+            'stripes': len(self._stripes),
+            'max_keys_per_stripe': self.max_keys_per_stripe,
+            'keys': len(self),
+            'evicted_idle': sum(stripe.evicted_idle for stripe in self._stripes),
+            'evicted_lru': sum(stripe.evicted_lru for stripe in self._stripes),
+        }
+
+
+class SQLiteRateLimiter:
+    """同一ホストの全ワーカーで GCRA の状態（key -> TAT）を共有する SQLite バックエンド。"""
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS idx_rate_limits_tat ON rate_limits(tat)",
+    )
+
+    def __init__(self, path, window_sec=60, busy_timeout_ms=50, fallback=None, clock=None):
+        self.path = path
+        self.window_sec = float(window_sec)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._clock = clock or time.time
+        # SQLite で判定できなかった回だけ使うプロセス内の limiter
+        self.fallback = fallback or GcraRateLimiter(window_sec=window_sec, clock=clock)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.fallback_count = 0
+        self._last_error = None
+        self._last_error_logged_at = 0.0
+        conn = self._connect()
+        for statement in self._SCHEMA:
+            conn.execute(statement)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and getattr(self._local, 'pid', None) == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000.0, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # 状態は失っても困らない（最悪でも制限が一時的に緩むだけ）ので fsync しない
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def is_allowed(self, key, max_per_window):
+        try:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = self._clock()
+                row = conn.execute('SELECT tat FROM rate_limits WHERE key = ?', (key,)).fetchone()
+                allowed, new_tat, retry_after = _gcra_decide(row[0] if row else None, now, max_per_window, self.window_sec)
+                if allowed:
+                    conn.execute('INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)', (key, new_tat))
+                conn.execute('COMMIT')
+            except BaseException:
+                try:
+                    conn.execute('ROLLBACK')
+                except sqlite3.Error:
+                    pass
+                raise
+            return allowed, retry_after
+        except sqlite3.Error as exc:
+            return self._fallback_is_allowed(key, max_per_window, exc)
+
+    def _fallback_is_allowed(self, key, max_per_window, exc):
+        now = time.time()
+        with self._stats_lock:
+            self.fallback_count += 1
+            self._last_error = str(exc)
+            should_log = now - self._last_error_logged_at >= 60
+            if should_log:
+                self._last_error_logged_at = now
+        if should_log:
+            logger.warning(f"rate_limit_shared_fallback path={self.path} error={exc} fallbacks={self.fallback_count}")
+        return self.fallback.is_allowed(key, max_per_window)
+
+    def sweep(self):
+        """TAT が過ぎたキーを削除する（メンテナンススレッド用）。削除件数を返す。"""
+        removed = self.fallback.sweep()
+        try:
+            conn = self._connect()
+            cursor = conn.execute('DELETE FROM rate_limits WHERE tat <= ?', (self._clock(),))
+            removed += max(0, cursor.rowcount)
+        except sqlite3.Error as exc:
+            logger.warning(f"rate_limit_sweep_error path={self.path} error={exc}")
+        return removed
+
+    def __len__(self):
+        try:
+            return int(self._connect().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0])
+        except sqlite3.Error:
+            return 0
+
+    def describe(self):
+        return {
+            'algorithm': 'gcra',
+            'backend': 'sqlite',
+            'path': self.path,
+            'window_sec': self.window_sec,
+            'keys': len(self),
+            'fallback_count': self.fallback_count,
+            'last_error': self._last_error,
+            'fallback': self.fallback.describe(),
+        }
+
+
+def _default_sqlite_path():
+    # tmpfs（/dev/shm）があればディスク I/O を避ける
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else tempfile.gettempdir()
+    return os.path.join(directory, 'jobcan_rate_limit.sqlite3')
+
+
+def create_rate_limiter(backend=None, path=None, window_sec=60, stripes=16, max_keys_per_stripe=8192):
+    """RATE_LIMIT_BACKEND（memory / sqlite）に応じた limiter を返す。sqlite の初期化に失敗したら memory。"""
+    backend = (backend or os.getenv('RATE_LIMIT_BACKEND', 'memory') or 'memory').strip().lower()
+    in_process = GcraRateLimiter(window_sec=window_sec, stripes=stripes, max_keys_per_stripe=max_keys_per_stripe)
+    if backend != 'sqlite':
+        return in_process
+    path = path or os.getenv('RATE_LIMIT_SQLITE_PATH') or _default_sqlite_path()
+    busy_timeout_ms = int(os.getenv('RATE_LIMIT_SQLITE_BUSY_TIMEOUT_MS', '50'))
+    try:
+        limiter = SQLiteRateLimiter(path, window_sec=window_sec, busy_timeout_ms=busy_timeout_ms, fallback=in_process)
+        logger.info("rate_limiter_initialized backend=sqlite path=%s", path)
+        return limiter
+    except sqlite3.Error as exc:
+        logger.error("rate_limiter_init_failed backend=sqlite path=%s error=%s - falling back to memory", path, exc)
+        return in_process
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+ワーカーのリソース使用量を一定間隔で計測して保持するサンプラー。
+
+以前は get_system_resources() が /status・/sessions・アップロード・Excel 1 行ごとに
+psutil.Process() を作って cpu_percent() を呼んでいた。新しい Process オブジェクトの初回
+cpu_percent() は常に 0 を返すため CPU 値は意味が無く、システムコールもリクエスト数に比例していた。
+
+ここでは専用スレッド（app 側の MaintenanceRunner）から sample_once() を呼び、
+ワーカー RSS・CPU・システムメモリ・子孫プロセス（Chromium 等）の RSS 合計を小さなリングバッファに積む。
+読み取り側は latest() で直近のスナップショットを O(1) で受け取る。
+スレッドが動いていない（テスト・ジョブ用子プロセス等）ときは、古くなった時点で呼び出し側が計測する。
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil は requirements に含まれる
+    psutil = None
+
+_MB = 1024 * 1024
+
+
+def _empty_snapshot(sampled_at):
+    return {
+        'sampled_at': sampled_at,
+        'memory_mb': 0.0,
+        'vms_mb': 0.0,
+        'memory_percent': 0.0,
+        'cpu_percent': 0.0,
+        'children_count': 0,
+        'children_rss_mb': 0.0,
+        'process_tree_mb': 0.0,
+        'system_total_mb': 0.0,
+        'system_available_mb': 0.0,
+        'system_used_mb': 0.0,
+        'system_percent': 0.0,
+        'available': False,
+    }
+
+
+class ResourceSampler:
+    def __init__(self, history=60, max_age_sec=10.0, on_sample=None):
+        # max_age_sec: これより古いスナップショットしか無ければ latest() の呼び出し側で計測し直す
+        self.max_age_sec = float(max_age_sec)
+        self._history = deque(maxlen=max(1, int(history)))
+        self._latest = None
+        self._sample_lock = threading.Lock()
+        self._process = None
+        self._process_pid = None
+        self._on_sample = on_sample
+        self.samples = 0
+        self.inline_samples = 0
+
+    def _get_process(self):
+        # 同じ Process を使い回すことで cpu_percent() が前回計測からの使用率になる
+        # （fork / spawn 後は pid が変わるので作り直す）
+        pid = os.getpid()
+        if self._process is None or self._process_pid != pid:
+            self._process = psutil.Process(pid)
+            self._process_pid = pid
+            self._process.cpu_percent()
+        return self._process
+
+    def _measure(self, now):
+        snapshot = _empty_snapshot(now)
+        if psutil is None:
+            return snapshot
+        process = self._get_process()
+        with process.oneshot():
+            memory_info = process.memory_info()
+            cpu_percent = process.cpu_percent()
+            memory_percent = process.memory_percent()
+        children_rss = 0
+        children_count = 0
+        try:
+            children = process.children(recursive=True)
+        except psutil.Error:
+            children = []
+        for child in children:
+            try:
+                children_rss += child.memory_info().rss
+                children_count += 1
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        system_memory = psutil.virtual_memory()
+        snapshot.update({
+            'memory_mb': memory_info.rss / _MB,
+            'vms_mb': memory_info.vms / _MB,
+            'memory_percent': memory_percent,
+            'cpu_percent': cpu_percent,
+            'children_count': children_count,
+            'children_rss_mb': children_rss / _MB,
+            'process_tree_mb': (memory_info.rss + children_rss) / _MB,
+            'system_total_mb': system_memory.total / _MB,
+            'system_available_mb': system_memory.available / _MB,
+            'system_used_mb': system_memory.used / _MB,
+            'system_percent': system_memory.percent,
+            'available': True,
+        })
+        return snapshot
+
+    def sample_once(self, now=None):
+        """1 回計測してバッファへ積む。計測したスナップショットを返す。"""
+        if now is None:
+            now = time.time()
+        with self._sample_lock:
+            snapshot = self._measure(now)
+            self._history.append(snapshot)
+            self._latest = snapshot
+            self.samples += 1
+        if self._on_sample is not None:
+            try:
+                self._on_sample(snapshot)
+            except Exception as hook_error:
+                logger.warning(f"resource_sample_hook_error error={hook_error}")
+        return snapshot
+
+    def latest(self, now=None):
+        """直近のスナップショット（dict。呼び出し側で書き換えないこと）。
+
+        一度も計測していない、または max_age_sec より古い場合だけその場で計測する。
+        他スレッドが計測中なら待たずに手元の値を返す。
+        """
+        snapshot = self._latest
+        if now is None:
+            now = time.time()
+        if snapshot is not None and now - snapshot['sampled_at'] <= self.max_age_sec:
+            return snapshot
+        if snapshot is not None and self._sample_lock.locked():
+            return snapshot
+        self.inline_samples += 1
+        return self.sample_once(now)
+
+    def process_tree_mb(self):
+        """AdaptiveAdmissionController の measure と同じ形式（合計 MB, 子プロセス数）。"""
+        snapshot = self.latest()
+        return snapshot['process_tree_mb'], snapshot['children_count']
+
+    def history(self):
+        return list(self._history)
+
+    def describe(self):
+        snapshot = self._latest
+        return {
+            'samples': self.samples,
+            'inline_samples': self.inline_samples,
+            'history_size': len(self._history),
+            'max_age_sec': self.max_age_sec,
+            'latest': None if snapshot is None else {
+                key: (round(value, 2) if isinstance(value, float) else value)
+                for key, value in snapshot.items()
+            },
+        }
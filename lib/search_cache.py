@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Amazon Creators API の検索結果キャッシュ（lib.amazon_creators の _SEARCH_CACHE）。
+
+以前は上限の無い dict で、キーには閲覧履歴 Cookie 由来のキーワードも入るため組み合わせの数だけ増え続け、
+期限切れのエントリも同じキーが再び読まれるまで残っていた。また同じキーで同時にミスしたページ表示は
+それぞれ API を呼んでいた。
+
+- 件数（max_entries）と合計バイト数（max_bytes。items を JSON にした大きさで見積もる）の上限を超えたら
+  最近使われていない順に捨てる
+- エントリは expires_at（新鮮）と stale_until（期限切れでも返してよい猶予の終わり）を持つ。
+  stale_until を過ぎたものは読み出し時と sweep()（メンテナンススレッドから定期実行）で捨てる
+- single_flight(key, loader): 同じキーの取得が進行中なら、その結果を待って共有する（API 呼び出しは 1 回）
+- 件数・バイト数・ヒット / 期限切れヒット / ミス / 追い出し / 合流の回数は describe() で返す
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def _estimate_bytes(key, items):
+    try:
+        payload = json.dumps(items, ensure_ascii=False, separators=(',', ':'))
+    except (TypeError, ValueError):
+        payload = repr(items)
+    return len(key) + len(payload.encode('utf-8'))
+
+
+class _Entry:
+    __slots__ = ('items', 'expires_at', 'stale_until', 'size')
+
+    def __init__(self, items, expires_at, stale_until, size):
+        self.items = items
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.size = size
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SearchResultCache:
+    def __init__(self, max_entries=512, max_bytes=4 * 1024 * 1024, clock=None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = int(max_bytes)
+        self._clock = clock or time.time
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expired = 0
+        self.coalesced = 0
+
+    def get(self, key, record=True):
+        """
+        (items, fresh) か None。猶予期間内の期限切れエントリは fresh=False で返す。
+
+        record=False はヒット率の集計と LRU の並びを変えない（事前取得の要否確認用）。
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now > entry.stale_until:
+                self._remove_locked(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                if record:
+                    self.misses += 1
+                return None
+            fresh = now <= entry.expires_at
+            if record:
+                self._entries.move_to_end(key)
+                if fresh:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+            return entry.items, fresh
+
+    def put(self, key, items, ttl_sec, stale_grace_sec=0):
+        expires_at = self._clock() + ttl_sec
+        entry = _Entry(items, expires_at, expires_at + max(0, stale_grace_sec), _estimate_bytes(key, items))
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = entry
+            self._total_bytes += entry.size
+            self.stores += 1
+            while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                self._remove_locked(next(iter(self._entries)))
+                self.evictions += 1
+
+    def postpone(self, key, delay_sec):
+        """期限切れエントリの次回更新を delay_sec 後にする（猶予の終わりは延ばさない）。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires_at = min(entry.stale_until, self._clock() + delay_sec)
+
+    def sweep(self):
+        """猶予期間も過ぎたエントリを捨てる。捨てた件数を返す。"""
+        now = self._clock()
+        with self._lock:
+            expired_keys = [key for key, entry in self._entries.items() if now > entry.stale_until]
+            for key in expired_keys:
+                self._remove_locked(key)
+            self.expired += len(expired_keys)
+        return len(expired_keys)
+
+    def single_flight(self, key, loader):
+        """loader() を同じキーにつき同時に 1 回だけ実行し、待っていた呼び出しにも同じ結果を返す。"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = loader()
+            return flight.result
+        except BaseException as load_error:
+            flight.error = load_error
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def describe(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'in_flight': len(self._flights),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'expired': self.expired,
+                'coalesced': self.coalesced,
+            }
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+app.py の起動（import）時間の計測（STARTUP_PROFILE=1 のときだけ有効）。
+
+gunicorn はワーカーごと、さらに --max-requests で再起動するたびに app.py を import し直すため、
+起動にかかる時間とそのときに増える RSS はワーカーのコールドスタートにそのまま効く。
+
+- モジュールごとの import 時間: builtins.__import__ を包み、初回 import（sys.modules に無いもの）の
+  所要時間を計る。入れ子の import を差し引いた自身の時間（self）と合計（cumulative）を持つ
+- フェーズごとの時間と RSS 増分: app.py 側で `with startup_profiler.phase('validate_startup'):` のように囲むか、
+  モジュール直下の区切りで `startup_profiler.checkpoint('imports')` を呼ぶ（前回の区切りからの時間）
+- finish() で順位付きのレポートをログに出し、__import__ を元に戻す。
+  app.py の import が途中で例外になると finish() まで届かないため、start(owner=__name__) で計測対象の
+  モジュール名を渡しておく。そのモジュールが sys.modules から外されていたら（import 失敗）、
+  次の import の呼び出し時に finish() して元の __import__ に戻す
+
+無効時は phase() も何もしない（import のフックも入れない）。
+"""
+import builtins
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_mb():
+    # psutil 自体の import を計測に混ぜないよう /proc を直接読む（Linux 以外は 0）
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+
+class StartupProfiler:
+    def __init__(self, enabled=False, top_n=25, clock=time.perf_counter):
+        self.enabled = enabled
+        self.top_n = top_n
+        self._clock = clock
+        self._original_import = None
+        self._owner = None
+        self._local = threading.local()
+        self.started_at = None
+        self.start_rss_mb = 0.0
+        self.total_sec = None
+        self.imports = {}  # module -> [cumulative_sec, self_sec]
+        self.phases = []  # (name, sec, rss_delta_mb)
+        self._checkpoint_at = None
+        self._checkpoint_rss_mb = 0.0
+
+    # --- import の計測 ---
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _import_key(self, name, fromlist, level):
+        """初回 import なら計測用の名前、既に読み込み済みなら None。"""
+        if level:
+            return None
+        module = sys.modules.get(name)
+        if module is None:
+            return name
+        # from lib import job_process のようにパッケージは読み込み済みでもサブモジュールが初回の場合
+        for item in fromlist or ():
+            if isinstance(item, str) and item != '*' and not hasattr(module, item) and f"{name}.{item}" not in sys.modules:
+                return f"{name}.{item}"
+        return None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if original is None or (self._owner is not None and self._owner not in sys.modules):
+            # 計測対象の import が例外で中断された（または finish 済みのフックが残っていた）
+            if original is not None:
+                logger.warning(f"startup_profile_aborted owner={self._owner}")
+                self.finish()
+            return builtins.__import__(name, globals, locals, fromlist, level)
+        key = self._import_key(name, fromlist, level)
+        if key is None:
+            return original(name, globals, locals, fromlist, level)
+        stack = self._stack()
+        stack.append(0.0)
+        started = self._clock()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = self._clock() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            entry = self.imports.setdefault(key, [0.0, 0.0])
+            entry[0] += elapsed
+            entry[1] += max(0.0, elapsed - children)
+
+    def start(self, owner=None):
+        """owner: 計測対象のモジュール名（app.py からは __name__）。その import が失敗したらフックを外す。"""
+        if not self.enabled or self._original_import is not None:
+            return
+        self._owner = owner
+        self.started_at = self._checkpoint_at = self._clock()
+        self.start_rss_mb = self._checkpoint_rss_mb = _rss_mb()
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    # --- フェーズの計測 ---
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        rss_before = _rss_mb()
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.phases.append((name, self._clock() - started, _rss_mb() - rss_before))
+
+    def checkpoint(self, name):
+        """前回の checkpoint（または start）からここまでを 1 フェーズとして記録する。"""
+        if not self.enabled or self._checkpoint_at is None:
+            return
+        now = self._clock()
+        rss = _rss_mb()
+        self.phases.append((name, now - self._checkpoint_at, rss - self._checkpoint_rss_mb))
+        self._checkpoint_at = now
+        self._checkpoint_rss_mb = rss
+
+    # --- レポート ---
+
+    def finish(self):
+        """計測を止めてレポートを出す。レポート文字列を返す（無効時は None）。"""
+        if not self.enabled or self._original_import is None:
+            return None
+        builtins.__import__ = self._original_import
+        self._original_import = None
+        self.total_sec = self._clock() - self.started_at
+        report = self.report()
+        logger.warning(report)
+        return report
+
+    def report(self):
+        lines = [
+            f"startup_profile pid={os.getpid()} total_ms={(self.total_sec or 0) * 1000:.1f} "
+            f"rss_mb={_rss_mb():.1f} rss_delta_mb={_rss_mb() - self.start_rss_mb:.1f} "
+            f"modules={len(self.imports)}",
+            "  phases (ms, rss_delta_mb):",
+        ]
+        for name, sec, rss_delta in sorted(self.phases, key=lambda item: item[1], reverse=True):
+            lines.append(f"    {sec * 1000:9.1f}  {rss_delta:+7.1f}  {name}")
+        lines.append(f"  imports by self time (top {self.top_n}; self ms, cumulative ms):")
+        ranked = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)[:self.top_n]
+        for module, (cumulative, self_sec) in ranked:
+            lines.append(f"    {self_sec * 1000:9.1f}  {cumulative * 1000:9.1f}  {module}")
+        return '\n'.join(lines)
+
+
+def _env_enabled():
+    return (os.getenv('STARTUP_PROFILE') or '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+startup_profiler = StartupProfiler(
+    enabled=_env_enabled(),
+    top_n=int(os.getenv('STARTUP_PROFILE_TOP', '25')),
+)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+静的ファイルのフィンガープリント付きビルドと配信用マニフェスト。
+
+static/css/common.css（約 50KB）や static/js/* はこれまで Flask の既定ヘッダー（no-cache 相当）で
+毎回配信され、再訪時も再検証と非圧縮の転送が発生していた。
+
+build_static_assets() は static/ 配下の各ファイルの内容ハッシュを名前に含めたコピー
+（css/common.<hash>.css）と、圧縮が効く種類の .gz / .br（brotli パッケージがある場合）を出力先に書き、
+manifest.json（元の名前 -> ハッシュ付きの名前）を作る。内容が変われば名前が変わるので、
+配信側は Cache-Control: immutable, max-age=31536000 を付けられる。
+
+app 側は StaticAssetManifest を読み込み、url_for('static', filename=...) をハッシュ付きの名前に
+書き換え、Accept-Encoding に応じて圧縮済みファイルを返す。マニフェストが無ければ従来どおり。
+
+    python scripts/build_static_assets.py
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:  # 任意依存（無ければ .gz のみ）
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 31536000
+# 圧縮する拡張子（画像などは既に圧縮済み）
+COMPRESSIBLE_EXTENSIONS = frozenset(('.css', '.js', '.svg', '.txt', '.json', '.html', '.xml', '.map'))
+MIN_COMPRESS_BYTES = 512
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(filename, digest):
+    """'css/common.css' -> 'css/common.<digest>.css'"""
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{digest}{ext}"
+
+
+def _iter_static_files(static_dir, exclude_dirs=()):
+    static_dir = os.path.abspath(static_dir)
+    excluded = {os.path.abspath(path) for path in exclude_dirs}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and os.path.join(root, d) not in excluded)
+        for name in sorted(files):
+            if name.startswith('.'):
+                continue
+            full_path = os.path.join(root, name)
+            yield os.path.relpath(full_path, static_dir).replace(os.sep, '/'), full_path
+
+
+def build_static_assets(static_dir, output_dir, compress_level=9):
+    """
+    static_dir の全ファイルをハッシュ付きの名前で output_dir へ書き出し、マニフェストを返す。
+
+    出力先は毎回作り直す（古いハッシュのファイルを残さない）。
+    """
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    files = {}
+    for filename, source_path in _iter_static_files(static_dir, exclude_dirs=(output_dir,)):
+        digest = _file_digest(source_path)
+        target_name = hashed_name(filename, digest)
+        target_path = os.path.join(output_dir, *target_name.split('/'))
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        shutil.copyfile(source_path, target_path)
+
+        encodings = []
+        ext = os.path.splitext(filename)[1].lower()
+        if ext in COMPRESSIBLE_EXTENSIONS and os.path.getsize(source_path) >= MIN_COMPRESS_BYTES:
+            with open(source_path, 'rb') as f:
+                data = f.read()
+            with open(target_path + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=compress_level, mtime=0))
+            encodings.append('gzip')
+            if brotli is not None:
+                with open(target_path + '.br', 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+                encodings.append('br')
+        files[filename] = {'path': target_name, 'encodings': encodings}
+
+    manifest = {'version': 1, 'files': files}
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    return manifest
+
+
+# Content-Encoding -> 圧縮済みファイルの拡張子
+_ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+class StaticAssetManifest:
+    """ビルド済みマニフェスト。元の名前 <-> ハッシュ付きの名前を O(1) で引く。"""
+
+    def __init__(self, output_dir, files=None):
+        self.output_dir = os.path.abspath(output_dir)
+        files = files or {}
+        self._by_source = {source: entry['path'] for source, entry in files.items()}
+        self._by_hashed = {entry['path']: (source, tuple(entry.get('encodings') or ())) for source, entry in files.items()}
+
+    @classmethod
+    def load(cls, output_dir):
+        """マニフェストを読み込む。無い・壊れている場合は None（従来どおりの配信）。"""
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as load_error:
+            logger.warning(f"static_manifest_load_failed path={manifest_path} error={load_error}")
+            return None
+        files = data.get('files') if isinstance(data, dict) else None
+        if not isinstance(files, dict):
+            return None
+        return cls(output_dir, files)
+
+    def hashed_filename(self, filename):
+        """url_for 用。マニフェストに無いファイルは None。"""
+        return self._by_source.get(filename)
+
+    def resolve(self, hashed_filename):
+        """ハッシュ付きの名前 -> (元の名前, 利用できる圧縮形式)。該当しなければ None。"""
+        return self._by_hashed.get(hashed_filename)
+
+    def file_path(self, hashed_filename, encoding=None):
+        path = os.path.join(self.output_dir, *hashed_filename.split('/'))
+        if encoding:
+            path += _ENCODING_SUFFIXES[encoding]
+        return path
+
+    def __len__(self):
+        return len(self._by_source)
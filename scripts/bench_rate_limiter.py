@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark: rate limiter memory and latency for many distinct client IPs.
+
+Compares the previous fixed-window limiter (one deque of timestamps per key, never evicted)
+with lib.rate_limit.GcraRateLimiter (one float per key, striped locks, idle-key eviction)
+and the cross-worker SQLiteRateLimiter (RATE_LIMIT_BACKEND=sqlite; memory is in the db file).
+
+    python scripts/bench_rate_limiter.py --ips 100000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from lib.rate_limit import GcraRateLimiter, SQLiteRateLimiter  # noqa: E402
+
+
+class LegacyFixedWindowLimiter:
+    """The limiter app.py used before GCRA (kept here only for comparison)."""
+
+    def __init__(self, window_sec=60):
+        self.window_sec = window_sec
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def is_allowed(self, key, max_per_window):
+        with self._lock:
+            now = time.time()
+            if key not in self._data:
+                self._data[key] = deque(maxlen=max_per_window * 2)
+            q = self._data[key]
+            while q and now - q[0] > self.window_sec:
+                q.popleft()
+            if len(q) >= max_per_window:
+                return False, self.window_sec
+            q.append(now)
+            return True, self.window_sec
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SteppingClock:
+    """Advances time by `step` seconds per call so idle keys expire during the run."""
+
+    def __init__(self, step):
+        self.now = time.time()
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+def _keys(count, group):
+    return [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}:{group}" for i in range(count)]
+
+
+def _time_calls(limiter, keys, limit, repeats):
+    latencies = []
+    perf_counter = time.perf_counter
+    for _ in range(repeats):
+        for key in keys:
+            started = perf_counter()
+            limiter.is_allowed(key, limit)
+            latencies.append(perf_counter() - started)
+    return latencies
+
+
+def _measure_memory(limiter, keys, limit, repeats):
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for _ in range(repeats):
+        for key in keys:
+            limiter.is_allowed(key, limit)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current - baseline, peak - baseline
+
+
+def run(name, make_limiter, keys, limit, repeats):
+    # latency and memory are measured on separate instances: tracemalloc slows every allocation
+    latencies = sorted(_time_calls(make_limiter(), keys, limit, repeats))
+    limiter = make_limiter()
+    current, peak = _measure_memory(limiter, keys, limit, repeats)
+    total_calls = len(latencies)
+    print(
+        f"{name:<28} calls={total_calls:>7} keys_held={len(limiter):>7} "
+        f"mem_mb={current / 1024 / 1024:7.2f} peak_mb={peak / 1024 / 1024:7.2f} "
+        f"mean_us={statistics.fmean(latencies) * 1e6:6.2f} "
+        f"p50_us={latencies[total_calls // 2] * 1e6:6.2f} p99_us={latencies[int(total_calls * 0.99)] * 1e6:6.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ips', type=int, default=100000, help='distinct client IPs')
+    parser.add_argument('--repeats', type=int, default=2, help='requests per IP')
+    parser.add_argument('--limit', type=int, default=120, help='requests per 60s window (status group)')
+    args = parser.parse_args()
+
+    keys = _keys(args.ips, 'status')
+    run('legacy fixed window', LegacyFixedWindowLimiter, keys, args.limit, args.repeats)
+    run('gcra (real clock)', GcraRateLimiter, keys, args.limit, args.repeats)
+    # Scanner traffic: each IP shows up once and goes away; keys expire while the run continues
+    run('gcra (scanner, 1ms/req)', lambda: GcraRateLimiter(clock=SteppingClock(0.001)), keys, args.limit, 1)
+    with tempfile.TemporaryDirectory(dir='/dev/shm' if os.path.isdir('/dev/shm') else None) as directory:
+        paths = iter(os.path.join(directory, f'rate{index}.sqlite3') for index in range(2))
+        run('gcra sqlite (shared)', lambda: SQLiteRateLimiter(next(paths)), keys, args.limit, args.repeats)
+
+
+if __name__ == '__main__':
+    main()
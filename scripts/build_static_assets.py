@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Build fingerprinted, precompressed copies of static/ for immutable caching.
+
+Writes build/static/<name>.<hash>.<ext> (+ .gz, and .br when the brotli package is
+installed) and build/static/manifest.json. app.py picks the manifest up at startup.
+
+    python scripts/build_static_assets.py [--static-dir static] [--output-dir build/static]
+"""
+
+import argparse
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from lib.static_assets import brotli, build_static_assets  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--static-dir', default=os.path.join(REPO_ROOT, 'static'))
+    parser.add_argument('--output-dir', default=os.path.join(REPO_ROOT, 'build', 'static'))
+    args = parser.parse_args()
+
+    manifest = build_static_assets(args.static_dir, args.output_dir)
+    files = manifest['files']
+    compressed = sum(1 for entry in files.values() if entry['encodings'])
+    print(f"static assets: files={len(files)} compressed={compressed} brotli={brotli is not None} output={args.output_dir}")
+    for source in sorted(files):
+        print(f"  {source} -> {files[source]['path']} {','.join(files[source]['encodings'])}")
+
+
+if __name__ == '__main__':
+    main()
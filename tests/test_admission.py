@@ -0,0 +1,71 @@
+from lib.admission import AdaptiveAdmissionController
+
+
+class FakeMeter:
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self):
+        return self.value, 0
+
+
+def test_slots_grow_one_at_a_time_and_shrink_immediately():
+    meter = FakeMeter(200.0)
+    controller = AdaptiveAdmissionController(
+        memory_limit_mb=2000, max_slots=4, default_job_mb=300, reserve_mb=100, measure=meter,
+    )
+    # アイドル時のベースライン 200MB。1 ジョブ 300MB を実測 -> (2000-100-200)//300 = 5 -> 上限 4
+    assert controller.sample(0) == 1
+    meter.value = 500.0
+    assert controller.sample(1) == 2
+    assert controller.sample(1) == 3
+    assert controller.sample(1) == 4
+
+    # 実測で 1 ジョブ 700MB -> (2000-100-200)//700 = 2 に即時縮小
+    meter.value = 900.0
+    assert controller.sample(1) == 2
+    assert controller.per_job_mb() == 700.0
+    assert controller.describe()['recent_changes'][-1]['reason'] == 'shrink_capacity'
+
+
+def test_growth_waits_for_real_headroom_and_keeps_minimum():
+    meter = FakeMeter(100.0)
+    controller = AdaptiveAdmissionController(
+        memory_limit_mb=1000, max_slots=4, default_job_mb=300, reserve_mb=0, window=1, measure=meter,
+    )
+    assert controller.sample(0) == 1
+    meter.value = 400.0
+    assert controller.sample(1) == 2
+    assert controller.sample(1) == 3
+
+    # 3 件実行中に 1 ジョブ 400MB まで膨らむ -> 2 枠へ縮小
+    meter.value = 1300.0
+    assert controller.sample(3) == 2
+
+    # 見積もりが戻っても、実行中 3 件のままで空きが 1 ジョブ分無ければ増やさない
+    meter.value = 850.0
+    assert controller.sample(3) == 2
+    assert controller.describe()['last_reason'] == 'hold_no_headroom'
+
+    # 見積もりが上限を超えても最低 1 枠は維持
+    meter.value = 4000.0
+    assert controller.sample(1) == 1
+
+
+def test_idle_worker_does_not_grow_on_the_default_estimate():
+    meter = FakeMeter(200.0)
+    controller = AdaptiveAdmissionController(
+        memory_limit_mb=4000, max_slots=4, default_job_mb=300, reserve_mb=100, measure=meter,
+    )
+    for _ in range(10):
+        assert controller.sample(0) == 1
+    assert controller.describe()['last_reason'] == 'hold_unmeasured'
+
+    # 1 ジョブ 800MB を実測して初めて増やす
+    meter.value = 1000.0
+    assert controller.sample(1) == 2
+
+    # 実行中が枠より少なくても、今の空き（4000-100-3500=400MB）が 1 ジョブ分無ければ増やさない
+    meter.value = 3500.0
+    assert controller.sample(0) == 2
+    assert controller.describe()['last_reason'] == 'hold_no_headroom'
@@ -0,0 +1,352 @@
+import threading
+import time
+
+import pytest
+
+from lib import amazon_creators
+
+
+@pytest.fixture
+def creators_env(monkeypatch):
+    monkeypatch.setenv('AMAZON_AFFILIATE_ENABLED', '1')
+    monkeypatch.setenv('AMAZON_ASSOCIATE_TAG', 'demo-22')
+    monkeypatch.setenv('AMAZON_CREATORS_CLIENT_ID', 'client')
+    monkeypatch.setenv('AMAZON_CREATORS_CLIENT_SECRET', 'secret')
+    monkeypatch.setenv('AMAZON_MAX_ITEMS', '4')
+    monkeypatch.setattr(amazon_creators, '_get_access_token', lambda settings, deadline=None: 'token')
+    amazon_creators._SEARCH_CACHE.clear()
+    yield monkeypatch
+    amazon_creators._SEARCH_CACHE.clear()
+
+
+def _items(keyword, count=2):
+    return [{'title': f'{keyword} {i}', 'image_url': '', 'url': f'https://example.test/{keyword}/{i}', 'cta': 'x'} for i in range(count)]
+
+
+def test_fan_out_merges_in_keyword_order_regardless_of_completion_order(creators_env):
+    delays = {'a': 0.15, 'b': 0.0, 'c': 0.05}
+
+    def fake_search(settings, token, keyword, deadline=None):
+        time.sleep(delays.get(keyword, 0))
+        return _items(keyword)
+
+    creators_env.setattr(amazon_creators, 'build_keywords', lambda *args, **kwargs: ['a', 'b', 'c'])
+    creators_env.setattr(amazon_creators, '_search_items', fake_search)
+    result = amazon_creators.get_recommendations('/', 'home')
+    assert result['source'] == 'api'
+    assert [item['url'] for item in result['items']] == [
+        'https://example.test/a/0', 'https://example.test/a/1',
+        'https://example.test/b/0', 'https://example.test/b/1',
+    ]
+    assert [item['keyword'] for item in result['items']] == ['a', 'a', 'b', 'b']
+
+
+def test_fan_out_returns_at_deadline_with_finished_keywords(creators_env):
+    creators_env.setenv('AMAZON_CREATORS_SEARCH_DEADLINE_SEC', '0.2')
+    release = threading.Event()
+
+    def fake_search(settings, token, keyword, deadline=None):
+        if keyword == 'slow':
+            release.wait(2)
+        return _items(keyword, 1)
+
+    creators_env.setattr(amazon_creators, 'build_keywords', lambda *args, **kwargs: ['slow', 'fast'])
+    creators_env.setattr(amazon_creators, '_search_items', fake_search)
+    started = time.monotonic()
+    try:
+        result = amazon_creators.get_recommendations('/', 'home')
+    finally:
+        release.set()
+    assert time.monotonic() - started < 1.0
+    assert [item['keyword'] for item in result['items']] == ['fast']
+    entry = next(iter(amazon_creators._SEARCH_CACHE._entries.values()))
+    assert entry.expires_at - time.time() <= amazon_creators._PARTIAL_RESULT_TTL_SEC
+
+
+def test_slow_token_call_shortens_the_search_deadline(creators_env):
+    creators_env.setenv('AMAZON_CREATORS_SEARCH_DEADLINE_SEC', '0.4')
+    release = threading.Event()
+    seen_deadlines = []
+
+    def slow_token(settings, deadline=None):
+        time.sleep(0.3)
+        return 'token'
+
+    def fake_search(settings, token, keyword, deadline=None):
+        seen_deadlines.append(deadline)
+        release.wait(2)
+        return _items(keyword, 1)
+
+    creators_env.setattr(amazon_creators, '_get_access_token', slow_token)
+    creators_env.setattr(amazon_creators, 'build_keywords', lambda *args, **kwargs: ['a'])
+    creators_env.setattr(amazon_creators, '_search_items', fake_search)
+    started = time.monotonic()
+    try:
+        result = amazon_creators.get_recommendations('/', 'home')
+    finally:
+        release.set()
+    assert time.monotonic() - started < 0.6
+    assert result['error'] == 'search_deadline'
+    assert seen_deadlines and seen_deadlines[0] <= started + 0.45
+
+
+@pytest.fixture
+def api_server():
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {'ports': [], 'statuses': []}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            state['ports'].append(self.client_address[1])
+            status = state['statuses'].pop(0) if state['statuses'] else 200
+            status, headers = status if isinstance(status, tuple) else (status, {})
+            body = b'{"ok": true}'
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state['url'] = f'http://127.0.0.1:{server.server_address[1]}/token'
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def test_api_client_reuses_connection_and_retries_5xx(api_server):
+    client = amazon_creators.CreatorsApiClient(pool_maxsize=2, retries=2, backoff_factor=0)
+    try:
+        assert client.post('token', api_server['url'], data={'a': '1'}, timeout=2).status_code == 200
+        assert client.post('token', api_server['url'], data={'a': '1'}, timeout=2).status_code == 200
+        assert len(set(api_server['ports'])) == 1
+
+        api_server['statuses'] = [503]
+        resp = client.post('search', api_server['url'], json={}, timeout=2)
+        assert resp.status_code == 200
+        assert len(api_server['ports']) == 4
+    finally:
+        client.close()
+    text = amazon_creators.AMAZON_API_SECONDS.render()
+    assert any(line.startswith('jobcan_amazon_api_seconds_count{operation="token",outcome="ok"}') for line in text)
+
+
+def test_api_client_does_not_retry_or_wait_on_429(api_server):
+    from lib.circuit_breaker import CircuitBreaker
+
+    breaker = CircuitBreaker('test', failure_threshold=10)
+    client = amazon_creators.CreatorsApiClient(retries=2, backoff_factor=0, breaker=breaker)
+    api_server['statuses'] = [(429, {'Retry-After': '2'})]
+    started = time.monotonic()
+    try:
+        resp = client.post('token', api_server['url'], data={}, timeout=1)
+    finally:
+        client.close()
+    assert resp.status_code == 429
+    assert time.monotonic() - started < 0.5
+    assert len(api_server['ports']) == 1
+    assert breaker.consecutive_failures == 1
+
+
+def test_api_client_connect_retries_stay_within_the_deadline():
+    import socket
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        closed_port = probe.getsockname()[1]
+    client = amazon_creators.CreatorsApiClient(retries=5, backoff_factor=0.3)
+    started = time.monotonic()
+    try:
+        with pytest.raises(Exception):
+            client.post('search', f'http://127.0.0.1:{closed_port}/', json={}, timeout=5, deadline=time.monotonic() + 1.0)
+    finally:
+        client.close()
+    assert time.monotonic() - started < 1.0
+
+
+def test_stale_entry_is_served_while_one_background_refresh_runs(creators_env):
+    calls = []
+    refresh_started = threading.Event()
+    release = threading.Event()
+
+    def fake_search(settings, token, keyword, deadline=None):
+        calls.append(keyword)
+        if len(calls) > 1:
+            refresh_started.set()
+            release.wait(2)
+        return [{'title': f'{keyword} {len(calls)}', 'image_url': '', 'url': f'https://example.test/{len(calls)}', 'cta': 'x'}]
+
+    creators_env.setattr(amazon_creators, 'build_keywords', lambda *args, **kwargs: ['a'])
+    creators_env.setattr(amazon_creators, '_search_items', fake_search)
+    first = amazon_creators.get_recommendations('/', 'home')
+    assert first['items'][0]['url'] == 'https://example.test/1'
+
+    for entry in amazon_creators._SEARCH_CACHE._entries.values():
+        entry.expires_at = time.time() - 1
+    stale = amazon_creators.get_recommendations('/', 'home')
+    again = amazon_creators.get_recommendations('/', 'home')
+    assert stale['source'] == again['source'] == 'cache'
+    assert stale['items'][0]['url'] == 'https://example.test/1'
+    assert refresh_started.wait(2)
+    release.set()
+
+    deadline = time.monotonic() + 2
+    while amazon_creators._REFRESHING and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 2
+    assert amazon_creators.get_recommendations('/', 'home')['items'][0]['url'] == 'https://example.test/2'
+
+
+def test_warm_fills_the_keys_that_page_renders_use(creators_env):
+    searched = []
+    creators_env.setattr(amazon_creators, '_search_items', lambda settings, token, keyword, deadline=None: searched.append(keyword) or _items(keyword, 1))
+    contexts = [
+        {'path': '/autofill', 'page_type': 'trust_sensitive', 'title': 'Jobcan AutoFill', 'tags': ['勤怠', 'Excel']},
+        {'path': '/tools', 'page_type': 'tool_index', 'title': 'Tools', 'tags': ['ツール', '効率化']},
+    ]
+    fetched = amazon_creators.warm_recommendation_cache(contexts)
+    assert fetched == len(amazon_creators._SEARCH_CACHE) > 0
+    searched.clear()
+    assert amazon_creators.warm_recommendation_cache(contexts) == 0
+
+    for context in contexts:
+        result = amazon_creators.get_recommendations(context['path'], context['page_type'], context['title'], context['tags'])
+        assert result['source'] == 'cache'
+    assert searched == []
+
+
+def test_concurrent_misses_share_one_fetch(creators_env):
+    calls = []
+    release = threading.Event()
+
+    def fake_search(settings, token, keyword, deadline=None):
+        calls.append(keyword)
+        release.wait(2)
+        return _items(keyword, 1)
+
+    creators_env.setattr(amazon_creators, 'build_keywords', lambda *args, **kwargs: ['a'])
+    creators_env.setattr(amazon_creators, '_search_items', fake_search)
+    coalesced_before = amazon_creators._SEARCH_CACHE.coalesced
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(amazon_creators.get_recommendations('/', 'home'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 2
+    while amazon_creators._SEARCH_CACHE.coalesced - coalesced_before < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert calls == ['a']
+    assert [result['items'][0]['url'] for result in results] == ['https://example.test/a/0'] * 4
+
+
+def test_caller_that_missed_before_the_leader_stored_does_not_refetch(creators_env):
+    calls = []
+    late_missed = threading.Event()
+    stored = threading.Event()
+    original_cached_get = amazon_creators._cached_get
+
+    def gated_cached_get(cache_key, record=True):
+        result = original_cached_get(cache_key, record=record)
+        if record and threading.current_thread().name == 'late':
+            late_missed.set()
+            stored.wait(2)
+        return result
+
+    creators_env.setattr(amazon_creators, '_cached_get', gated_cached_get)
+    creators_env.setattr(amazon_creators, 'build_keywords', lambda *args, **kwargs: ['a'])
+    creators_env.setattr(amazon_creators, '_search_items', lambda settings, token, keyword, deadline=None: calls.append(keyword) or _items(keyword, 1))
+    results = []
+    late = threading.Thread(target=lambda: results.append(amazon_creators.get_recommendations('/', 'home')), name='late')
+    late.start()
+    try:
+        assert late_missed.wait(2)
+        leader = amazon_creators.get_recommendations('/', 'home')
+    finally:
+        stored.set()
+    late.join(2)
+    assert calls == ['a']
+    assert results[0]['items'] == leader['items']
+
+
+def test_open_circuit_serves_fallback_without_calling_the_api(creators_env):
+    from lib.circuit_breaker import CircuitBreaker
+
+    breaker = CircuitBreaker('test', failure_threshold=1, open_sec=60)
+    breaker.record_failure()
+    creators_env.setattr(amazon_creators, '_API_BREAKER', breaker)
+    creators_env.setattr(amazon_creators, '_get_access_token', lambda settings, deadline=None: (_ for _ in ()).throw(AssertionError('token call while open')))
+
+    result = amazon_creators.get_recommendations('/', 'home')
+    assert result['source'] == 'fallback'
+    assert result['error'] == 'circuit_open'
+    assert result['items'] and all(item['fallback'] for item in result['items'])
+
+
+def test_half_open_probe_keeps_its_slot_past_the_deadline(creators_env):
+    from lib.circuit_breaker import CLOSED, HALF_OPEN, CircuitBreaker
+
+    breaker = CircuitBreaker('test', failure_threshold=1, open_sec=0)
+    breaker.record_failure()
+    creators_env.setattr(amazon_creators, '_API_BREAKER', breaker)
+    creators_env.setitem(amazon_creators._TOKEN_CACHE, 'token', 'cached')
+    creators_env.setitem(amazon_creators._TOKEN_CACHE, 'expires_at', time.time() + 3600)
+    creators_env.setenv('AMAZON_CREATORS_SEARCH_DEADLINE_SEC', '0.2')
+    searched = []
+    release = threading.Event()
+
+    def fake_search(settings, token, keyword, deadline=None):
+        searched.append(keyword)
+        release.wait(2)
+        breaker.record_success(0.1)
+        return _items(keyword, 1)
+
+    creators_env.setattr(amazon_creators, 'build_keywords', lambda *args, **kwargs: ['a', 'b', 'c'])
+    creators_env.setattr(amazon_creators, '_search_items', fake_search)
+    try:
+        first = amazon_creators.get_recommendations('/', 'home')
+        assert first['error'] == 'search_deadline'
+        assert searched == ['a']
+        assert breaker.state == HALF_OPEN
+
+        second = amazon_creators.get_recommendations('/', 'home')
+        assert second['error'] == 'circuit_open'
+        assert searched == ['a']
+    finally:
+        release.set()
+    deadline = time.monotonic() + 2
+    while breaker.state != CLOSED and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_with_no_items_reports_an_empty_response(creators_env):
+    from lib.circuit_breaker import CLOSED, CircuitBreaker
+
+    breaker = CircuitBreaker('test', failure_threshold=1, open_sec=0)
+    breaker.record_failure()
+    creators_env.setattr(amazon_creators, '_API_BREAKER', breaker)
+    creators_env.setitem(amazon_creators._TOKEN_CACHE, 'token', 'cached')
+    creators_env.setitem(amazon_creators._TOKEN_CACHE, 'expires_at', time.time() + 3600)
+
+    def fake_search(settings, token, keyword, deadline=None):
+        breaker.record_success(0.1)
+        return []
+
+    creators_env.setattr(amazon_creators, 'build_keywords', lambda *args, **kwargs: ['a', 'b'])
+    creators_env.setattr(amazon_creators, '_search_items', fake_search)
+    result = amazon_creators.get_recommendations('/', 'home')
+    assert result['error'] == 'empty_response'
+    assert breaker.state == CLOSED
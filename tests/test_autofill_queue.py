@@ -1,15 +1,17 @@
 import io
 import os
 import time
-from collections import deque
 
 import pytest
 
 import app as app_module
+from lib.rate_limit import GcraRateLimiter
 
 
 @pytest.fixture
-def client():
+def client(monkeypatch):
+    # アップロードのレート制限（連続 5 件）はテストをまたいで共有しない
+    monkeypatch.setattr(app_module, '_rate_limiter', GcraRateLimiter(window_sec=60))
     app_module.app.config['TESTING'] = True
     with app_module.app.test_client() as client:
         yield client
@@ -20,10 +22,7 @@ def _reset_queue_state():
     with app_module.jobs_lock:
         for job_info in app_module.jobs.values():
             cleanup_targets.append((job_info.get('file_path'), job_info.get('session_id')))
-        app_module.jobs.clear()
-        app_module.job_queue = deque()
-        app_module.queued_job_params.clear()
-        app_module.queue_identity_index.clear()
+        app_module.job_registry.clear()
 
     with app_module.session_manager['session_lock']:
         app_module.session_manager['active_sessions'].clear()
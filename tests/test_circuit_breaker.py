@@ -0,0 +1,56 @@
+from lib.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_opens_after_consecutive_failures_and_half_opens_with_one_probe():
+    clock = FakeClock()
+    transitions = []
+    breaker = CircuitBreaker('demo', failure_threshold=3, open_sec=30, clock=clock,
+                             on_transition=lambda old, new, reason: transitions.append(new))
+    breaker.record_failure(1.0)
+    breaker.record_success(0.1)  # success resets the streak
+    for _ in range(3):
+        assert breaker.allow() == CLOSED
+        breaker.record_failure(1.0)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now += 31
+    assert breaker.allow() == HALF_OPEN  # this caller is the probe
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_failure(5.0)
+    assert breaker.state == OPEN
+
+    clock.now += 31
+    assert breaker.allow()
+    breaker.record_success(0.2)
+    assert breaker.state == CLOSED
+    assert transitions == [OPEN, HALF_OPEN, OPEN, HALF_OPEN, CLOSED]
+
+
+def test_opens_on_high_p95_latency():
+    breaker = CircuitBreaker('demo', failure_threshold=100, latency_p95_sec=1.0, latency_window=20, min_samples=10)
+    for _ in range(9):
+        breaker.record_success(0.1)
+    for _ in range(2):
+        breaker.record_success(4.0)
+    assert breaker.state == OPEN
+    assert breaker.describe()['rejected'] == 0
+
+
+def test_unfinished_probe_frees_the_slot():
+    clock = FakeClock()
+    breaker = CircuitBreaker('demo', failure_threshold=1, open_sec=10, clock=clock)
+    breaker.record_failure()
+    clock.now += 11
+    assert breaker.allow()
+    breaker.end_probe()
+    assert breaker.allow()
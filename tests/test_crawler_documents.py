@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client():
+    app_module.app.config['TESTING'] = True
+    app_module.reload_crawler_documents(reason='test')
+    with app_module.app.test_client() as client:
+        yield client
+    app_module.reload_crawler_documents(reason='test')
+
+
+def test_sitemap_is_built_once_and_revalidated_with_etag(client, monkeypatch):
+    first = client.get('/sitemap.xml')
+    assert first.status_code == 200
+    assert first.mimetype == 'application/xml'
+    assert b'<loc>' in first.data
+    assert first.headers['Last-Modified']
+    etag = first.headers['ETag']
+
+    def fail_build(*args, **kwargs):
+        raise AssertionError('sitemap must be served from the cache')
+
+    monkeypatch.setitem(app_module._CRAWLER_DOCUMENT_BUILDERS, 'sitemap.xml', ('application/xml', fail_build))
+    assert client.get('/sitemap.xml').data == first.data
+    cached = client.get('/sitemap.xml', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+
+
+def test_robots_txt_follows_base_url(client, monkeypatch):
+    monkeypatch.setenv('BASE_URL', 'https://example.test/')
+    body = client.get('/robots.txt').data.decode()
+    assert 'Sitemap: https://example.test/sitemap.xml' in body
+
+
+def test_manifest_change_is_picked_up_by_refresh(client, monkeypatch, tmp_path):
+    manifest_path = tmp_path / 'sitemap_lastmod.json'
+    manifest_path.write_text(json.dumps({'faq.html': '2024-01-01'}), encoding='utf-8')
+    monkeypatch.setattr(app_module, 'SITEMAP_LASTMOD_MANIFEST_PATH', str(manifest_path))
+    app_module.reload_crawler_documents(reason='test')
+    assert b'2024-01-01' in client.get('/sitemap.xml').data
+    assert app_module.refresh_crawler_documents_if_stale() == 0
+
+    manifest_path.write_text(json.dumps({'faq.html': '2025-02-03', 'about.html': '2025-02-03'}), encoding='utf-8')
+    assert app_module.refresh_crawler_documents_if_stale() == 1
+    assert b'2025-02-03' in client.get('/sitemap.xml').data
@@ -0,0 +1,27 @@
+from lib.deadline_scheduler import DeadlineScheduler
+from lib.job_registry import JobRegistry
+
+
+def test_pop_due_skips_superseded_deadlines():
+    scheduler = DeadlineScheduler()
+    scheduler.schedule('a', 10)
+    scheduler.schedule('b', 20)
+    scheduler.schedule('a', 30)  # heartbeat で延長
+
+    assert scheduler.pop_due(25) == ['b']
+    assert scheduler.next_deadline() == 30
+    scheduler.cancel('a')
+    assert scheduler.pop_due(100) == []
+    assert len(scheduler) == 0
+
+
+def test_registry_field_watch_reports_direct_writes():
+    registry = JobRegistry()
+    seen = []
+    registry.watch_fields(('lease_expires_at',), lambda job_id, key, job: seen.append((job_id, key, job[key])))
+    registry.jobs['a'] = {'status': 'queued', 'lease_expires_at': 1}
+
+    registry.jobs['a']['lease_expires_at'] = 5
+    registry.jobs['a']['progress'] = 10
+
+    assert seen == [('a', 'lease_expires_at', 5)]
@@ -0,0 +1,96 @@
+import json
+import pickle
+from collections import deque
+
+from lib.job_log_buffer import JobLogBuffer, JobLogRecord
+from utils import MAX_JOB_LOG_BYTES, add_job_log
+
+
+def test_evicts_oldest_entries_by_count_and_bytes():
+    buffer = JobLogBuffer(maxlen=3, max_bytes=8)
+    for entry in ('aa', 'bb', 'cc', 'dd'):
+        buffer.append(entry)
+    # 件数上限
+    assert list(buffer) == ['bb', 'cc', 'dd']
+    assert buffer.total_bytes == 6
+    assert buffer.first_seq == 2
+
+    # バイト上限
+    buffer.append('eeeee')
+    assert list(buffer) == ['dd', 'eeeee']
+    assert buffer.total_bytes == 7
+    assert buffer.total_count == 5
+    assert buffer.first_seq == 4
+
+    # 上限より長い 1 行でも最新行は残す
+    buffer.append('x' * 20)
+    assert list(buffer) == ['x' * 20]
+    assert buffer.total_bytes == 20
+
+
+def test_byte_total_counts_utf8():
+    buffer = JobLogBuffer(max_bytes=7)
+    buffer.append('あ')
+    buffer.append('い')
+    assert buffer.total_bytes == 6
+    buffer.append('う')
+    assert list(buffer) == ['い', 'う']
+
+
+def test_since_reads_after_cursor_and_reports_eviction():
+    buffer = JobLogBuffer(maxlen=3)
+    buffer.extend(['a', 'b', 'c', 'd', 'e'])
+    assert buffer.since(3) == (['d', 'e'], 4, False)
+    assert buffer.since(5) == ([], None, False)
+    assert buffer.since(0) == (['c', 'd', 'e'], 3, True)
+    assert buffer.since(9) == (['c', 'd', 'e'], 3, True)
+    assert buffer.tail(2) == ['d', 'e']
+    assert buffer[-1] == 'e'
+
+
+def test_pickle_keeps_entries_and_sequence():
+    buffer = JobLogBuffer(['a', 'b'], maxlen=5, max_bytes=100, total_count=10)
+    restored = pickle.loads(pickle.dumps(buffer))
+    assert list(restored) == ['a', 'b']
+    assert restored.total_count == 10
+    assert restored.total_bytes == 2
+    assert restored.maxlen == 5
+
+
+def test_add_job_log_converts_plain_deque_and_stays_under_byte_cap():
+    jobs = {'job': {'logs': deque(['[t] old'], maxlen=500)}}
+    add_job_log('job', 'first', jobs)
+    logs = jobs['job']['logs']
+    assert isinstance(logs, JobLogBuffer)
+    assert logs.maxlen == 500
+    assert logs.total_count == 2
+
+    message = 'x' * 1900
+    for _ in range(200):
+        add_job_log('job', message, jobs)
+    assert logs.total_bytes <= MAX_JOB_LOG_BYTES
+    assert logs.total_bytes == sum(len(entry.encode('utf-8')) for entry in logs)
+    assert logs.total_count == 202
+
+
+def test_add_job_log_stores_unrendered_records_and_renders_once_on_read():
+    jobs = {'job': {}}
+    add_job_log('job', '📝 データ %s/%s: %s', jobs, 1, 3, 'user@example.com')
+    add_job_log('job', '❌ password=secret で失敗', jobs)
+    logs = jobs['job']['logs']
+    first, second = logs.records()
+    assert isinstance(first, JobLogRecord)
+    assert first._rendered is None and first.args == (1, 3, 'user@example.com')
+
+    line = logs[0]
+    assert line.endswith('📝 データ 1/3: [EMAIL]')
+    assert logs[0] is line
+    assert 'secret' not in logs[1]
+
+    exported = [json.loads(row) for row in logs.to_jsonl().splitlines()]
+    assert [row['seq'] for row in exported] == [1, 2]
+    assert exported[0]['level'] == 'info'
+    assert exported[0]['code'] == '📝 データ %s/%s: %s'
+    assert exported[1]['level'] == 'error'
+    assert exported[1]['message'] == '❌ password="[PASSWORD]" で失敗'
+    assert [row['seq'] for row in map(json.loads, logs.to_jsonl(since=1).splitlines())] == [2]
@@ -0,0 +1,88 @@
+import time
+
+from lib import job_process
+from utils import create_job_log_buffer
+
+
+def _fake_automation(job_id, jobs, email=None, sleep_sec=0, **kwargs):
+    """子プロセス側で automation.py と同じ書き方でジョブを更新する。"""
+    from utils import add_job_log, update_progress
+    add_job_log(job_id, f"start {email}", jobs)
+    update_progress(job_id, 2, "working", jobs, current_data=1, total_data=3)
+    time.sleep(sleep_sec)
+    jobs[job_id]['status'] = 'completed'
+    jobs[job_id]['end_time'] = time.time()
+
+
+def _chatty_automation(job_id, jobs, email=None, sleep_sec=0, **kwargs):
+    """poll 間隔より頻繁にログを送り続ける子。"""
+    from utils import add_job_log
+    deadline = time.time() + sleep_sec
+    while time.time() < deadline:
+        add_job_log(job_id, "tick", jobs)
+        time.sleep(0.1)
+    jobs[job_id]['status'] = 'completed'
+
+
+def _run(executor, sleep_sec=0, timeout_sec=0):
+    # 子プロセスからは未整形の JobLogRecord が届く（親の JobLogBuffer が読み出し時に整形する）
+    job = {'status': 'running', 'logs': create_job_log_buffer(), 'start_time': time.time()}
+    messages = []
+
+    def on_message(message):
+        messages.append(message)
+        if message[0] == job_process.MSG_SET:
+            job[message[1]] = message[2]
+        elif message[0] == job_process.MSG_LOG:
+            job['logs'].append(message[1])
+
+    outcome = executor.run(
+        'job-1', {'status': 'running', 'start_time': job['start_time']},
+        {'email': 'user@example.com', 'sleep_sec': sleep_sec},
+        on_message, timeout_sec=timeout_sec,
+    )
+    return outcome, job
+
+
+def test_child_process_streams_progress_and_logs_back():
+    executor = job_process.ProcessJobExecutor(prewarm=0, target='test_job_process:_fake_automation')
+    try:
+        outcome, job = _run(executor)
+    finally:
+        executor.shutdown()
+
+    assert outcome == (job_process.EXIT_DONE, None)
+    assert job['status'] == 'completed'
+    assert job['step_name'] == 'working'
+    assert job['total_data'] == 3
+    assert job['logs'] and job['logs'][0].endswith('start [EMAIL]')
+
+
+def test_child_process_is_killed_after_hard_timeout():
+    executor = job_process.ProcessJobExecutor(
+        prewarm=0, kill_grace_sec=0.5, poll_interval_sec=0.1, target='test_job_process:_fake_automation',
+    )
+    try:
+        started = time.time()
+        outcome, job = _run(executor, sleep_sec=30, timeout_sec=1)
+    finally:
+        executor.shutdown()
+
+    assert outcome == (job_process.EXIT_TIMEOUT, None)
+    assert time.time() - started < 15
+    assert job['status'] == 'running'
+
+
+def test_chatty_child_process_is_still_killed_after_hard_timeout():
+    executor = job_process.ProcessJobExecutor(
+        prewarm=0, kill_grace_sec=0.5, target='test_job_process:_chatty_automation',
+    )
+    try:
+        started = time.time()
+        outcome, job = _run(executor, sleep_sec=30, timeout_sec=1)
+    finally:
+        executor.shutdown()
+
+    assert outcome == (job_process.EXIT_TIMEOUT, None)
+    assert time.time() - started < 15
+    assert len(job['logs']) > 5
@@ -0,0 +1,47 @@
+from lib.job_registry import JobQueue, JobRegistry
+
+
+def test_status_index_tracks_direct_status_mutation():
+    registry = JobRegistry()
+    registry.jobs['a'] = {'status': 'queued'}
+    registry.jobs['b'] = {'status': 'running'}
+    registry.queue.append('a')
+    registry.queued_params['a'] = {'email': 'x'}
+
+    assert registry.running_count() == 1
+    assert registry.count('queued') == 1
+
+    # automation.py と同じく dict を直接書き換える
+    registry.jobs['b']['status'] = 'completed'
+    registry.jobs['a']['status'] = 'running'
+
+    assert registry.running_count() == 1
+    assert registry.ids_with_status('completed') == ['b']
+    assert 'a' not in registry.queue
+    assert 'a' not in registry.queued_params
+
+    del registry.jobs['b']
+    assert registry.status_counts() == {'running': 1}
+
+    registry.clear()
+    assert registry.status_counts() == {}
+    assert len(registry.queue) == 0
+
+
+def test_job_queue_positions_survive_popleft_and_middle_removal():
+    queue = JobQueue()
+    for job_id in ('a', 'b', 'c', 'd'):
+        queue.append(job_id)
+    queue.append('b')  # 重複は無視
+
+    assert len(queue) == 4
+    assert queue.position('c') == 3
+
+    assert queue.popleft() == 'a'
+    assert queue.position('c') == 2
+
+    queue.remove('b')
+    assert queue.position('c') == 1
+    assert queue.position('d') == 2
+    assert queue.position('b') is None
+    assert list(queue) == ['c', 'd']
@@ -0,0 +1,74 @@
+import time
+
+from lib.job_registry import JobRegistry
+from lib.job_store import ADMIT_FULL, ADMIT_QUEUED, ADMIT_RUNNING, MemoryJobStore, SQLiteJobStore
+
+
+def _stores(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    return SQLiteJobStore(path, owner='worker-a'), SQLiteJobStore(path, owner='worker-b')
+
+
+def test_sqlite_store_enforces_one_global_fifo_and_slot_count(tmp_path):
+    worker_a, worker_b = _stores(tmp_path)
+    lease = time.time() + 60
+
+    assert worker_a.admit('job-1', 'key-1', 1, 2, lease)[0] == ADMIT_RUNNING
+    assert worker_b.admit('job-2', 'key-2', 1, 2, lease)[0] == ADMIT_QUEUED
+    assert worker_a.admit('job-3', 'key-3', 1, 2, lease)[0] == ADMIT_QUEUED
+    decision, running_count, queue_size = worker_b.admit('job-4', 'key-4', 1, 2, lease)
+    assert (decision, running_count, queue_size) == (ADMIT_FULL, 1, 2)
+
+    assert worker_a.queue_position('job-3') == 2
+    assert worker_b.find_live('key-1') == 'job-1'
+
+    # 先頭は worker-b の job-2。枠が空くまでは誰も開始できない
+    assert worker_b.try_claim('job-2', 1) is False
+    worker_a.release('job-1', 'completed')
+    assert worker_a.try_claim('job-3', 1) is False
+    assert worker_b.try_claim('job-2', 1) is True
+    assert worker_a.running_count() == 1
+    assert worker_a.queue_position('job-3') == 1
+
+
+def test_sqlite_store_reaps_jobs_of_dead_worker_and_shares_snapshots(tmp_path):
+    worker_a, worker_b = _stores(tmp_path)
+    worker_a.owner_stale_sec = 0.01
+    lease = time.time() + 60
+
+    assert worker_b.admit('job-1', 'key-1', 1, 3, lease)[0] == ADMIT_RUNNING
+    worker_b.publish('job-1', {'status': 'running', 'progress': 40, 'logs': ['a']})
+    snapshot = worker_a.load('job-1')
+    assert snapshot['progress'] == 40
+    assert snapshot['owner'] == 'worker-b'
+
+    time.sleep(0.05)
+    # worker-b の生存確認が途絶えたので枠は解放される
+    assert worker_a.admit('job-2', 'key-2', 1, 3, lease)[0] == ADMIT_RUNNING
+    assert worker_a.load('job-1')['status'] == 'expired'
+
+
+def test_sqlite_store_remote_cancel_and_lease_pull(tmp_path):
+    worker_a, worker_b = _stores(tmp_path)
+    now = time.time()
+    worker_a.admit('job-1', 'key-1', 0, 3, now + 30)
+    worker_a.admit('job-2', 'key-2', 0, 3, now + 30)
+
+    worker_b.touch('job-1', now + 90)
+    assert worker_b.request_cancel('job-2') == 'cancelled'
+
+    states = worker_a.heartbeat_owner(['job-1', 'job-2'])
+    assert states['job-1']['lease_expires_at'] == now + 90
+    assert states['job-2']['status'] == 'cancelled'
+
+
+def test_memory_store_uses_registry_counts():
+    registry = JobRegistry()
+    store = MemoryJobStore(registry)
+    registry.jobs['a'] = {'status': 'running'}
+
+    assert store.admit('b', 'key', 1, 1, 0)[0] == ADMIT_QUEUED
+    registry.jobs['b'] = {'status': 'queued'}
+    registry.queue.append('b')
+    assert store.admit('c', 'key', 1, 1, 0)[0] == ADMIT_FULL
+    assert store.queue_position('b') == 1
@@ -0,0 +1,61 @@
+import os
+import time
+
+import app as app_module
+from lib.maintenance import MaintenanceRunner
+
+
+def test_runner_runs_due_tasks_and_records_failures():
+    calls = []
+    runner = MaintenanceRunner(name='test-maintenance')
+    runner.add_task('ok', lambda: calls.append('ok'), 60, backlog=lambda: 3, initial_delay_sec=0)
+    runner.add_task('boom', lambda: 1 / 0, 60, initial_delay_sec=0)
+    runner.add_task('later', lambda: calls.append('later'), 60)
+
+    ran = runner.run_pending()
+
+    assert sorted(ran) == ['boom', 'ok']
+    assert calls == ['ok']
+    snapshot = runner.snapshot()['tasks']
+    assert snapshot['ok']['backlog'] == 3
+    assert snapshot['ok']['last_duration_ms'] is not None
+    assert snapshot['boom']['failures'] == 1
+    assert 'division' in snapshot['boom']['last_error']
+    assert runner.run_pending() == []
+
+
+def test_runner_thread_starts_and_stops():
+    runner = MaintenanceRunner(name='test-maintenance-thread', max_sleep_sec=0.05)
+    runner.add_task('tick', lambda: None, 0.01, initial_delay_sec=0)
+    runner.start()
+    time.sleep(0.1)
+    runner.stop(timeout=1)
+
+    assert not runner.is_running()
+    assert runner.snapshot()['tasks']['tick']['runs'] >= 1
+
+
+def test_health_maintenance_reports_tasks():
+    app_module.app.config['TESTING'] = True
+    response = app_module.app.test_client().get('/health/maintenance')
+    data = response.get_json()
+
+    assert {'prune_jobs', 'session_cleanup', 'temp_sweep'} <= set(data['tasks'])
+    assert 'backlog' in data['tasks']['prune_jobs']
+
+
+def test_temp_sweep_keeps_referenced_and_recent_session_dirs():
+    now = time.time()
+    orphan_id = f'sweep-orphan-{os.getpid()}'
+    recent_id = f'sweep-recent-{os.getpid()}'
+    orphan_dir = app_module.get_user_session_dir(orphan_id)
+    recent_dir = app_module.get_user_session_dir(recent_id)
+    old = now - app_module.TEMP_SWEEP_MAX_AGE_SEC - 60
+    os.utime(orphan_dir, (old, old))
+    try:
+        app_module.sweep_temp_files_once(current_time=now)
+        assert not os.path.exists(orphan_dir)
+        assert os.path.exists(recent_dir)
+    finally:
+        app_module.cleanup_user_session(orphan_id)
+        app_module.cleanup_user_session(recent_id)
@@ -0,0 +1,67 @@
+import pytest
+
+import app as app_module
+from lib import metrics
+from lib.metrics import MetricsRegistry, StepTimer
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram('demo_seconds', 'Demo latency.', ('route',), buckets=(0.1, 1.0))
+    latency.observe(0.05, '/a')
+    latency.observe(0.5, '/a')
+    latency.observe(3, '/a')
+    registry.counter('demo_total', 'Demo counter.', ('group',)).inc('api', amount=2)
+    registry.gauge('demo_depth', 'Demo gauge.', func=lambda: 7)
+
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="/a"} 3' in text
+    assert 'demo_total{group="api"} 2' in text
+    assert 'demo_depth 7' in text
+
+
+def test_step_timer_uses_metric_sink():
+    observed = []
+    now = iter([0.0, 1.0, 1.5, 4.0])
+    metrics.set_metric_sink(lambda name, labelvalues, value: observed.append((labelvalues, value)))
+    try:
+        timer = StepTimer(clock=lambda: next(now))
+        timer.mark('navigate')
+        timer.mark('wait_inputs')
+        timer.finish_row()
+    finally:
+        metrics.set_metric_sink(None)
+    assert observed == [(('navigate',), 1.0), (('wait_inputs',), 0.5), (('row_total',), 4.0)]
+
+
+@pytest.fixture
+def client():
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        yield client
+
+
+def test_metrics_endpoint_requires_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', '')
+    assert client.get('/metrics').status_code == 404
+
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+
+def test_metrics_endpoint_reports_request_latency_by_route(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 'secret')
+    client.get('/status/does-not-exist')
+
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert 'jobcan_http_request_duration_seconds_count{route="/status/<job_id>",method="GET",status="404"}' in text
+    assert 'jobcan_job_queue_depth ' in text
+    assert 'jobcan_jobs_running ' in text
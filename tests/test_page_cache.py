@@ -0,0 +1,82 @@
+import gzip
+
+import pytest
+from werkzeug.http import dump_cookie
+
+import app as app_module
+from lib.page_cache import PageCache
+
+
+@pytest.fixture
+def client(monkeypatch):
+    app_module.app.config['TESTING'] = True
+    monkeypatch.setattr(app_module, 'PAGE_CACHE_ENABLED', True)
+    app_module.page_cache.clear()
+    # クローラー相当（Cookie を持ち回らない）。履歴 Cookie を付けるテストはヘッダーで明示する
+    with app_module.app.test_client(use_cookies=False) as client:
+        yield client
+    app_module.page_cache.clear()
+
+
+def test_second_request_is_served_from_cache_with_gzip(client, monkeypatch):
+    first = client.get('/faq', headers={'Accept-Encoding': 'gzip'})
+    assert first.status_code == 200
+    assert first.headers['X-Page-Cache'] == 'MISS'
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['Cache-Control'] == 'no-cache'
+    plain_html = gzip.decompress(first.data)
+
+    def fail_render(*args, **kwargs):
+        raise AssertionError('cached page must not be rendered again')
+
+    monkeypatch.setattr(app_module, 'render_template', fail_render)
+    second = client.get('/faq', headers={'Accept-Encoding': 'gzip'})
+    assert second.headers['X-Page-Cache'] == 'HIT'
+    assert gzip.decompress(second.data) == plain_html
+    assert second.headers['ETag'] == first.headers['ETag']
+
+    identity = client.get('/faq')
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.data == plain_html
+
+
+def test_if_none_match_returns_304(client):
+    first = client.get('/about')
+    etag = first.headers['ETag']
+    cached = client.get('/about', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+
+def test_history_cookie_changes_cache_key(client):
+    client.get('/tools')
+    cookie = dump_cookie(app_module.AMAZON_RECENT_HISTORY_COOKIE, '[{"path":"/faq","page_type":"info","keywords":["desk"]}]')
+    with_history = client.get('/tools', headers={'Cookie': cookie.split(';')[0]})
+    assert with_history.headers['X-Page-Cache'] == 'MISS'
+    # 履歴 Cookie の更新はヒット時も返す
+    again = client.get('/tools', headers={'Cookie': cookie.split(';')[0]})
+    assert again.headers['X-Page-Cache'] == 'HIT'
+    assert app_module.AMAZON_RECENT_HISTORY_COOKIE in again.headers.get('Set-Cookie', '')
+
+
+def test_disabled_cache_keeps_no_store(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'PAGE_CACHE_ENABLED', False)
+    response = client.get('/faq')
+    assert 'X-Page-Cache' not in response.headers
+    assert response.headers['Cache-Control'] == 'no-store, max-age=0'
+
+
+def test_page_cache_expires_and_evicts_by_bytes():
+    now = [1000.0]
+    cache = PageCache(max_entries=10, max_bytes=3000, ttl_sec=60, clock=lambda: now[0])
+    cache.put('a', b'x' * 500, 'text/html')
+    cache.put('b', b'y' * 500, 'text/html')
+    assert cache.get('a') is not None
+
+    cache.put('c', b'z' * 2500, 'text/html')
+    assert cache.get('b') is None
+    assert cache.describe()['evictions'] >= 1
+
+    now[0] += 61
+    assert cache.get('c') is None
+    assert cache.describe()['expired'] == 1
@@ -0,0 +1,123 @@
+import sqlite3
+
+import pytest
+
+import app as app_module
+from lib.rate_limit import GcraRateLimiter, SQLiteRateLimiter, create_rate_limiter
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_allows_burst_then_spaces_requests_evenly():
+    clock = FakeClock()
+    limiter = GcraRateLimiter(window_sec=60, stripes=4, clock=clock)
+    # 上限 6 件 / 60 秒: 連続で 3 件、その後は 15 秒ごとに 1 件
+    assert all(limiter.is_allowed('1.2.3.4:api', 6)[0] for _ in range(3))
+    assert limiter.is_allowed('1.2.3.4:api', 6) == (False, 15)
+
+    clock.now += 14.5
+    assert limiter.is_allowed('1.2.3.4:api', 6) == (False, 1)
+    clock.now += 0.5
+    assert limiter.is_allowed('1.2.3.4:api', 6) == (True, 0)
+    # 別キーは独立
+    assert limiter.is_allowed('5.6.7.8:api', 6) == (True, 0)
+
+
+def test_idle_keys_are_dropped_without_changing_decisions():
+    clock = FakeClock()
+    limiter = GcraRateLimiter(window_sec=60, stripes=1, clock=clock)
+    for index in range(100):
+        limiter.is_allowed(f'10.0.0.{index}:status', 120)
+    assert len(limiter) == 100
+
+    clock.now += 1
+    limiter.is_allowed('10.0.1.1:status', 120)
+    assert len(limiter) == 1
+    assert limiter.describe()['evicted_idle'] == 100
+
+    assert limiter.sweep() == 0
+    clock.now += 10
+    assert limiter.sweep() == 1
+    assert len(limiter) == 0
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 10, 120])
+def test_no_window_admits_more_than_the_limit(limit):
+    clock = FakeClock(now=0.0)
+    limiter = GcraRateLimiter(window_sec=60, clock=clock)
+    admitted = []
+    for step in range(4000):
+        clock.now = step * 0.1
+        if limiter.is_allowed('1.2.3.4:upload', limit)[0]:
+            admitted.append(clock.now)
+
+    start = 0
+    busiest = 0
+    for index, at in enumerate(admitted):
+        while at - admitted[start] >= 60 - 1e-6:
+            start += 1
+        busiest = max(busiest, index - start + 1)
+    assert busiest == limit
+
+
+def test_stripe_size_is_capped_by_lru():
+    limiter = GcraRateLimiter(window_sec=60, stripes=1, max_keys_per_stripe=10, clock=FakeClock())
+    for index in range(25):
+        limiter.is_allowed(f'ip{index}:api', 60)
+    assert len(limiter) == 10
+    assert limiter.describe()['evicted_lru'] == 15
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, '_rate_limiter', GcraRateLimiter(window_sec=60))
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        yield client
+
+
+def test_status_group_answers_429_with_retry_after(client):
+    statuses = [client.get('/status/no-such-job').status_code for _ in range(60)]
+    assert set(statuses) == {404}
+    response = client.get('/status/no-such-job')
+    assert response.status_code == 429
+    assert response.get_json()['error_code'] == 'RATE_LIMIT_EXCEEDED'
+    assert 1 <= int(response.headers['Retry-After']) <= 60
+
+
+def test_sqlite_backend_shares_one_budget_between_workers(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / 'rate.sqlite3')
+    worker_a = SQLiteRateLimiter(path, window_sec=60, clock=clock)
+    worker_b = SQLiteRateLimiter(path, window_sec=60, clock=clock)
+    decisions = [(worker_a if index % 2 else worker_b).is_allowed('1.2.3.4:upload', 10)[0] for index in range(5)]
+    assert all(decisions)
+    assert worker_a.is_allowed('1.2.3.4:upload', 10) == (False, 10)
+    assert worker_b.is_allowed('1.2.3.4:upload', 10) == (False, 10)
+    assert worker_a.fallback_count == 0
+
+    clock.now += 61
+    assert worker_b.sweep() == 1
+    assert len(worker_a) == 0
+
+
+def test_sqlite_backend_falls_back_to_in_process_limiter(tmp_path, monkeypatch):
+    limiter = create_rate_limiter(backend='sqlite', path=str(tmp_path / 'rate.sqlite3'))
+    assert isinstance(limiter, SQLiteRateLimiter)
+
+    def broken_connect():
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(limiter, '_connect', broken_connect)
+    assert [limiter.is_allowed('9.9.9.9:upload', 2)[0] for _ in range(3)] == [True, False, False]
+    assert limiter.fallback_count == 3
+
+    missing_dir = tmp_path / 'missing' / 'rate.sqlite3'
+    assert isinstance(create_rate_limiter(backend='sqlite', path=str(missing_dir)), GcraRateLimiter)
+    assert isinstance(create_rate_limiter(backend='memory'), GcraRateLimiter)
@@ -0,0 +1,54 @@
+import os
+
+from lib.resource_sampler import ResourceSampler
+
+
+def _counting_sampler(**kwargs):
+    sampler = ResourceSampler(**kwargs)
+    calls = []
+    real_measure = sampler._measure
+
+    def measure(now):
+        calls.append(now)
+        return real_measure(now)
+
+    sampler._measure = measure
+    return sampler, calls
+
+
+def test_latest_reuses_snapshot_until_it_goes_stale():
+    sampler, calls = _counting_sampler(max_age_sec=10)
+    first = sampler.latest(now=1000.0)
+    assert first['available'] is True
+    assert first['memory_mb'] > 0
+    assert first['process_tree_mb'] >= first['memory_mb']
+    assert sampler.latest(now=1009.0) is first
+    assert len(calls) == 1
+
+    refreshed = sampler.latest(now=1011.0)
+    assert refreshed is not first
+    assert len(calls) == 2
+    assert sampler.inline_samples == 2
+
+
+def test_history_is_bounded_and_process_is_reused():
+    sampler = ResourceSampler(history=3)
+    for index in range(5):
+        sampler.sample_once(now=float(index))
+    assert [snapshot['sampled_at'] for snapshot in sampler.history()] == [2.0, 3.0, 4.0]
+    assert sampler._process_pid == os.getpid()
+    process = sampler._process
+    sampler.sample_once()
+    assert sampler._process is process
+    tree_mb, children = sampler.process_tree_mb()
+    assert tree_mb == sampler.history()[-1]['process_tree_mb']
+    assert children == sampler.history()[-1]['children_count']
+
+
+def test_on_sample_hook_errors_do_not_break_sampling():
+    def hook(snapshot):
+        raise ValueError('boom')
+
+    sampler = ResourceSampler(on_sample=hook)
+    assert sampler.sample_once()['available'] is True
+    assert sampler.describe()['samples'] == 1
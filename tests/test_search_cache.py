@@ -0,0 +1,58 @@
+from lib.search_cache import SearchResultCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _items(n):
+    return [{'title': f't{n}', 'url': f'https://example.test/{n}'}]
+
+
+def test_lru_eviction_by_count_and_bytes():
+    cache = SearchResultCache(max_entries=2, max_bytes=10 ** 6)
+    cache.put('a', _items(1), 60)
+    cache.put('b', _items(2), 60)
+    assert cache.get('a') is not None  # a becomes most recently used
+    cache.put('c', _items(3), 60)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.evictions == 1
+
+    small = SearchResultCache(max_entries=100, max_bytes=200)
+    for key in 'abcdef':
+        small.put(key, _items(key), 60)
+    info = small.describe()
+    assert info['bytes'] <= 200
+    assert info['entries'] < 6
+
+
+def test_stale_grace_and_sweep():
+    clock = FakeClock()
+    cache = SearchResultCache(clock=clock)
+    cache.put('a', _items(1), 60, stale_grace_sec=30)
+    cache.put('b', _items(2), 600)
+    assert cache.get('a') == (_items(1), True)
+    clock.now += 70
+    assert cache.get('a') == (_items(1), False)
+    clock.now += 30
+    assert cache.sweep() == 1
+    assert cache.get('a') is None
+    assert len(cache) == 1
+    info = cache.describe()
+    assert (info['hits'], info['stale_hits'], info['misses'], info['expired']) == (1, 1, 1, 1)
+
+
+def test_single_flight_propagates_errors():
+    cache = SearchResultCache()
+    try:
+        cache.single_flight('a', lambda: 1 / 0)
+    except ZeroDivisionError:
+        pass
+    else:
+        raise AssertionError('loader error must propagate')
+    assert cache.single_flight('a', lambda: 'ok') == 'ok'
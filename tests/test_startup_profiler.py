@@ -0,0 +1,99 @@
+import builtins
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+from lib.startup_profiler import StartupProfiler
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_profiler_records_imports_and_phases(tmp_path, monkeypatch):
+    (tmp_path / 'startup_probe_child.py').write_text('VALUE = 1\n', encoding='utf-8')
+    (tmp_path / 'startup_probe_parent.py').write_text('import startup_probe_child\n', encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    original_import = builtins.__import__
+
+    profiler = StartupProfiler(enabled=True)
+    profiler.start()
+    try:
+        with profiler.phase('probe'):
+            import startup_probe_parent  # noqa: F401
+        profiler.checkpoint('after_probe')
+    finally:
+        report = profiler.finish()
+        sys.modules.pop('startup_probe_parent', None)
+        sys.modules.pop('startup_probe_child', None)
+
+    assert builtins.__import__ is original_import
+    cumulative, self_sec = profiler.imports['startup_probe_parent']
+    assert cumulative >= self_sec >= 0
+    assert 'startup_probe_child' in profiler.imports
+    assert [name for name, _, _ in profiler.phases] == ['probe', 'after_probe']
+    assert 'startup_probe_parent' in report
+
+
+def test_profiler_unhooks_imports_when_the_owner_module_fails_to_import(tmp_path, monkeypatch):
+    (tmp_path / 'startup_probe_broken.py').write_text(
+        'import startup_probe_profiler\n'
+        'startup_probe_profiler.profiler.start(owner=__name__)\n'
+        'raise RuntimeError("boom")\n',
+        encoding='utf-8',
+    )
+    probe = types.ModuleType('startup_probe_profiler')
+    probe.profiler = StartupProfiler(enabled=True)
+    monkeypatch.setitem(sys.modules, 'startup_probe_profiler', probe)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    original_import = builtins.__import__
+
+    try:
+        import startup_probe_broken  # noqa: F401
+    except RuntimeError:
+        pass
+    import json  # noqa: F401
+
+    assert builtins.__import__ is original_import
+    assert probe.profiler.total_sec is not None
+    assert 'startup_probe_broken' not in sys.modules
+
+
+def test_disabled_profiler_does_not_hook_imports():
+    profiler = StartupProfiler(enabled=False)
+    profiler.start()
+    assert builtins.__import__ is not profiler._timed_import
+    with profiler.phase('noop'):
+        pass
+    assert profiler.finish() is None
+    assert profiler.phases == []
+
+
+def test_web_modules_do_not_import_excel_or_http_libraries():
+    code = (
+        "import sys, utils, lib.amazon_creators; "
+        "print(sorted(m for m in ('openpyxl', 'pandas', 'requests') if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    assert output == '[]'
+
+
+def test_installed_but_broken_pandas_falls_back_to_openpyxl(tmp_path, monkeypatch):
+    openpyxl = pytest.importorskip('openpyxl')
+    import utils
+
+    workbook = openpyxl.Workbook()
+    workbook.active.append(['日付', '開始時刻', '終了時刻'])
+    workbook.active.append(['2026-10-01', '09:00', '18:00'])
+    path = tmp_path / 'attendance.xlsx'
+    workbook.save(path)
+    monkeypatch.setattr(utils, 'pandas_available', True)
+    monkeypatch.setitem(sys.modules, 'pandas', None)  # import pandas が ImportError になる
+
+    data, total = utils.load_excel_data(str(path))
+    assert total == 1
+    assert hasattr(data, 'active')
+    assert utils.pandas_available is False
@@ -0,0 +1,53 @@
+import gzip
+
+import pytest
+from flask import url_for
+
+import app as app_module
+from lib.static_assets import StaticAssetManifest, build_static_assets
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    static_dir = tmp_path / 'static'
+    (static_dir / 'css').mkdir(parents=True)
+    (static_dir / 'css' / 'site.css').write_text('body { color: #333; }\n' * 200, encoding='utf-8')
+    (static_dir / 'logo.png').write_bytes(b'\x89PNG' + b'\x00' * 2000)
+    build_static_assets(str(static_dir), str(tmp_path / 'build'))
+    loaded = StaticAssetManifest.load(str(tmp_path / 'build'))
+    monkeypatch.setattr(app_module, 'static_manifest', loaded)
+    return loaded
+
+
+def test_build_writes_hashed_and_compressed_files(manifest):
+    hashed = manifest.hashed_filename('css/site.css')
+    assert hashed.startswith('css/site.') and hashed.endswith('.css') and hashed != 'css/site.css'
+    source, encodings = manifest.resolve(hashed)
+    assert source == 'css/site.css'
+    assert 'gzip' in encodings
+    # 画像は圧縮しない
+    assert manifest.resolve(manifest.hashed_filename('logo.png'))[1] == ()
+
+
+def test_url_for_and_immutable_precompressed_serving(manifest):
+    with app_module.app.test_request_context('/'):
+        url = url_for('static', filename='css/site.css')
+        missing = url_for('static', filename='css/unknown.css')
+    assert url == '/static/' + manifest.hashed_filename('css/site.css')
+    assert missing == '/static/css/unknown.css'
+
+    client = app_module.app.test_client()
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.status_code == 200
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert compressed.headers['Vary'] == 'Accept-Encoding'
+    assert compressed.mimetype == 'text/css'
+
+    identity = client.get(url)
+    assert 'Content-Encoding' not in identity.headers
+    assert gzip.decompress(compressed.data) == identity.data
+
+
+def test_missing_manifest_keeps_default_static_serving(tmp_path):
+    assert StaticAssetManifest.load(str(tmp_path)) is None
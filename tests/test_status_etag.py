@@ -0,0 +1,60 @@
+import time
+from collections import deque
+
+import pytest
+
+import app as app_module
+from utils import add_job_log, update_progress
+
+
+@pytest.fixture
+def client():
+    app_module.app.config['TESTING'] = True
+    app_module.job_registry.clear()
+    with app_module.app.test_client() as client:
+        yield client
+    app_module.job_registry.clear()
+
+
+def test_status_returns_304_until_job_changes(client, monkeypatch):
+    job_id = 'etag-job'
+    app_module.jobs[job_id] = {'status': 'running', 'logs': deque(maxlen=500), 'progress': 0, 'start_time': time.time()}
+    add_job_log(job_id, 'started', app_module.jobs)
+    update_progress(job_id, 1, '初期化中...', app_module.jobs)
+
+    first = client.get(f'/status/{job_id}')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+
+    resource_calls = []
+    monkeypatch.setattr(app_module, 'get_system_resources', lambda: resource_calls.append(1) or {})
+    cached = client.get(f'/status/{job_id}', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+    assert resource_calls == []
+
+    # 同じ値の再代入では変わらない
+    update_progress(job_id, 1, '初期化中...', app_module.jobs)
+    app_module.jobs[job_id]['progress'] = 0
+    assert client.get(f'/status/{job_id}', headers={'If-None-Match': etag}).status_code == 304
+
+    add_job_log(job_id, 'row 1', app_module.jobs)
+    changed = client.get(f'/status/{job_id}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    etag = changed.headers['ETag']
+
+    update_progress(job_id, 2, 'Jobcan 入力', app_module.jobs)
+    assert client.get(f'/status/{job_id}', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_status_etag_depends_on_query_and_skips_heartbeat_fields(client):
+    job_id = 'etag-query'
+    now = time.time()
+    app_module.jobs[job_id] = {'status': 'running', 'logs': deque(maxlen=500), 'start_time': now}
+    etag = client.get(f'/status/{job_id}').headers['ETag']
+
+    assert client.get(f'/status/{job_id}?since=0', headers={'If-None-Match': etag}).status_code == 200
+    app_module.jobs[job_id]['last_heartbeat_at'] = now + 1
+    assert client.get(f'/status/{job_id}', headers={'If-None-Match': etag}).status_code == 304
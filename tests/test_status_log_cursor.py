@@ -0,0 +1,93 @@
+import json
+import time
+from collections import deque
+
+import pytest
+
+import app as app_module
+from utils import add_job_log
+
+
+@pytest.fixture
+def client():
+    app_module.app.config['TESTING'] = True
+    app_module.job_registry.clear()
+    with app_module.app.test_client() as client:
+        yield client
+    app_module.job_registry.clear()
+
+
+def _running_job(job_id, maxlen=500):
+    app_module.jobs[job_id] = {'status': 'running', 'logs': deque(maxlen=maxlen), 'progress': 0, 'start_time': time.time()}
+
+
+def _messages(lines):
+    return [line.split('] ', 1)[1] for line in lines]
+
+
+def test_since_returns_only_new_lines_and_next_cursor(client):
+    job_id = 'cursor-job'
+    _running_job(job_id)
+    for message in ('a', 'b', 'c'):
+        add_job_log(job_id, message, app_module.jobs)
+
+    first = client.get(f'/status/{job_id}').get_json()
+    assert _messages(first['logs']) == ['a', 'b', 'c']
+    assert first['log_cursor'] == 3
+
+    add_job_log(job_id, 'd', app_module.jobs)
+    second = client.get(f"/status/{job_id}?since={first['log_cursor']}").get_json()
+    assert _messages(second['logs']) == ['d']
+    assert second['log_cursor'] == 4
+    assert second['log_first_seq'] == 4
+    assert second['logs_truncated'] is False
+
+    third = client.get(f"/status/{job_id}?since={second['log_cursor']}").get_json()
+    assert third['logs'] == []
+    assert third['log_cursor'] == 4
+    assert third['log_first_seq'] is None
+
+
+def test_since_falls_back_to_retained_lines_when_cursor_was_evicted(client):
+    job_id = 'cursor-evicted'
+    _running_job(job_id, maxlen=3)
+    for message in ('a', 'b', 'c', 'd', 'e'):
+        add_job_log(job_id, message, app_module.jobs)
+
+    data = client.get(f'/status/{job_id}?since=1').get_json()
+    assert _messages(data['logs']) == ['c', 'd', 'e']
+    assert data['log_first_seq'] == 3
+    assert data['logs_truncated'] is True
+    assert data['log_cursor'] == 5
+
+    # 未来のカーソル（別ジョブ・再起動前の値）も保持分をすべて返す
+    data = client.get(f'/status/{job_id}?since=99').get_json()
+    assert _messages(data['logs']) == ['c', 'd', 'e']
+    assert data['logs_truncated'] is True
+
+
+def test_since_with_last_n_keeps_newest_lines(client):
+    job_id = 'cursor-last-n'
+    _running_job(job_id)
+    for message in ('a', 'b', 'c', 'd'):
+        add_job_log(job_id, message, app_module.jobs)
+
+    data = client.get(f'/status/{job_id}?since=0&last_n=2').get_json()
+    assert _messages(data['logs']) == ['c', 'd']
+    assert data['log_first_seq'] == 3
+    assert data['logs_truncated'] is True
+
+
+def test_logs_jsonl_export(client):
+    job_id = 'cursor-export'
+    _running_job(job_id)
+    add_job_log(job_id, '⚠️ slow', app_module.jobs)
+    add_job_log(job_id, 'row %s', app_module.jobs, 2)
+
+    response = client.get(f'/status/{job_id}/logs.jsonl?since=1')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Log-Cursor'] == '2'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(row['seq'], row['message'], row['level']) for row in rows] == [(2, 'row 2', 'info')]
+    assert client.get('/status/missing/logs.jsonl').status_code == 404
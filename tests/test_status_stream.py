@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+from collections import deque
+
+import pytest
+
+import app as app_module
+from utils import add_job_log
+
+
+@pytest.fixture
+def client():
+    app_module.app.config['TESTING'] = True
+    app_module.job_registry.clear()
+    with app_module.app.test_client() as client:
+        yield client
+    app_module.job_registry.clear()
+
+
+def _events(chunks):
+    events = []
+    for block in ''.join(chunks).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data']), fields.get('id')))
+    return events
+
+
+def _read_stream(response):
+    try:
+        return [chunk.decode('utf-8') for chunk in response.response]
+    finally:
+        # 実サーバーと同じく close で SSE の同時接続枠が解放される
+        response.close()
+
+
+def test_stream_pushes_new_log_lines_and_ends_on_terminal_status(client):
+    job_id = 'stream-job'
+    now = time.time()
+    app_module.jobs[job_id] = {'status': 'running', 'logs': deque(maxlen=500), 'progress': 0, 'start_time': now}
+    add_job_log(job_id, 'first line', app_module.jobs)
+
+    def finish():
+        time.sleep(0.2)
+        add_job_log(job_id, 'second line', app_module.jobs)
+        app_module.jobs[job_id]['progress'] = 100
+        app_module.jobs[job_id]['status'] = 'completed'
+        app_module.jobs[job_id]['end_time'] = time.time()
+
+    worker = threading.Thread(target=finish)
+    worker.start()
+    response = client.get(f'/status/{job_id}/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    events = _events(_read_stream(response))
+    worker.join()
+
+    log_lines = [line for name, data, _ in events if name == 'log' for line in data['lines']]
+    assert [line.split('] ', 1)[1] for line in log_lines] == ['first line', 'second line']
+    statuses = [data for name, data, _ in events if name == 'status']
+    assert 'logs' not in statuses[0]
+    assert statuses[-1]['status'] == 'completed'
+    assert events[-1][0] == 'end'
+    # 通算件数が cursor / id になる（再接続時は Last-Event-ID から続きだけを受け取る）
+    assert events[-1][2] == '2'
+
+
+def test_stream_resumes_from_last_event_id_and_acts_as_heartbeat(client):
+    job_id = 'stream-resume'
+    app_module.jobs[job_id] = {'status': 'queued', 'logs': deque(maxlen=500), 'queued_at': time.time(), 'lease_expires_at': time.time() + 1}
+    for message in ('a', 'b', 'c'):
+        add_job_log(job_id, message, app_module.jobs)
+    app_module.jobs[job_id]['status'] = 'cancelled'
+
+    response = client.get(f'/status/{job_id}/stream', headers={'Last-Event-ID': '2'}, buffered=False)
+    events = _events(_read_stream(response))
+    assert [data['lines'] for name, data, _ in events if name == 'log'] == [[app_module.jobs[job_id]['logs'][-1]]]
+
+    app_module.jobs[job_id]['status'] = 'queued'
+    app_module.jobs[job_id]['lease_expires_at'] = time.time() + 1
+    stream = client.get(f'/status/{job_id}/stream', buffered=False)
+    first_chunks = iter(stream.response)
+    next(first_chunks)  # retry
+    next(first_chunks)  # 最初の status
+    assert app_module.jobs[job_id]['lease_expires_at'] > time.time() + 60
+    stream.close()
+    # 切断したら disconnect hint が立つ（猶予後に prune で失効）
+    assert app_module.jobs[job_id]['disconnect_hint_at'] is not None
+
+
+def test_stream_limits_concurrent_streams(client, monkeypatch):
+    monkeypatch.setattr(app_module, '_sse_slots', threading.BoundedSemaphore(1))
+    app_module._sse_slots.acquire()
+    app_module.jobs['busy'] = {'status': 'running', 'logs': deque()}
+
+    response = client.get('/status/busy/stream')
+
+    assert response.status_code == 503
+    assert response.get_json()['status_url'] == '/status/busy'
+    assert client.get('/status/missing/stream').status_code == 404
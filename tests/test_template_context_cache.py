@@ -0,0 +1,68 @@
+import pytest
+from werkzeug.http import dump_cookie
+
+import app as app_module
+
+
+@pytest.fixture
+def fresh_cache():
+    app_module.clear_template_context_cache()
+    yield
+    app_module.clear_template_context_cache()
+
+
+def test_static_context_is_built_once_per_path(fresh_cache, monkeypatch):
+    calls = []
+    original = app_module.get_seo_defaults
+    monkeypatch.setattr(app_module, 'get_seo_defaults', lambda path: calls.append(path) or original(path))
+
+    first = app_module.get_static_template_context('/tools')
+    second = app_module.get_static_template_context('/tools')
+    app_module.get_static_template_context('/faq')
+
+    assert first is second
+    assert calls == ['/tools', '/faq']
+    assert first['app_version'] == app_module.APP_VERSION
+
+
+def test_env_change_rebuilds_static_context(fresh_cache, monkeypatch):
+    monkeypatch.setenv('GA_MEASUREMENT_ID', 'G-OLD')
+    before = app_module.get_static_template_context('/faq')
+    monkeypatch.setenv('GA_MEASUREMENT_ID', 'G-NEW')
+    after = app_module.get_static_template_context('/faq')
+
+    assert before['GA_MEASUREMENT_ID'] == 'G-OLD'
+    assert after['GA_MEASUREMENT_ID'] == 'G-NEW'
+
+
+def test_cache_is_bounded(fresh_cache, monkeypatch):
+    monkeypatch.setattr(app_module, 'TEMPLATE_CONTEXT_CACHE_MAX_PATHS', 2)
+    for path in ('/a', '/b', '/c'):
+        app_module.get_static_template_context(path)
+
+    stats = app_module.describe_template_context_cache()
+    assert stats['paths'] == 2
+    assert stats['evictions'] == 1
+
+
+def test_context_processor_keeps_dynamic_part_per_request(fresh_cache, monkeypatch):
+    seen_history = []
+    monkeypatch.setattr(
+        app_module, 'build_amazon_rotating_theme_cards',
+        lambda **kwargs: seen_history.append(kwargs['recent_history']) or [],
+    )
+    # 実運用と同じく set_cookie 相当の形式（JSON をクォート）で送る
+    cookie = dump_cookie(app_module.AMAZON_RECENT_HISTORY_COOKIE, '[{"path":"/faq","page_type":"info","keywords":["desk"]}]')
+
+    with app_module.app.test_request_context('/tools'):
+        plain = app_module.inject_env_vars()
+    with app_module.app.test_request_context('/tools', headers={'Cookie': cookie.split(';')[0]}):
+        with_history = app_module.inject_env_vars()
+
+    assert '_amazon_tags' not in plain
+    assert plain['seo_page_defaults'] is with_history['seo_page_defaults']
+    assert seen_history[0] == []
+    assert seen_history[2][0]['path'] == '/faq'
+    # 毎回コピーを返すのでキャッシュ本体は書き換わらない
+    plain['amazon_affiliate_items'] = ['mutated']
+    assert 'amazon_affiliate_items' not in app_module.get_static_template_context('/tools')
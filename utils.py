@@ -9,19 +9,40 @@ import uuid
 import importlib.util
 from typing import Tuple, List, Optional
 
-# ライブラリの利用可能性をチェック
-try:
-    import pandas as pd
-    pandas_available = True
-except ImportError:
-    pandas_available = False
+from lib.job_log_buffer import JobLogBuffer, JobLogRecord, sanitize_log_text
 
-try:
-    import openpyxl
-    from openpyxl import Workbook
-    openpyxl_available = True
-except ImportError:
-    openpyxl_available = False
+# ライブラリの利用可能性をチェック
+# pandas / openpyxl は Excel を扱うときだけ使うので、ここでは存在確認だけして import は使う関数内で行う
+# （Web ワーカーの起動時間と常駐メモリを減らすため）
+# 入っていても import に失敗する（依存の不整合など）場合は、最初に使うときに False にして従来どおりフォールバックする
+pandas_available = importlib.util.find_spec("pandas") is not None
+openpyxl_available = importlib.util.find_spec("openpyxl") is not None
+
+
+def _import_pandas():
+    """pandas モジュール。使えない場合は None"""
+    global pandas_available
+    if not pandas_available:
+        return None
+    try:
+        import pandas
+    except ImportError:
+        pandas_available = False
+        return None
+    return pandas
+
+
+def _import_openpyxl():
+    """openpyxl モジュール。使えない場合は None"""
+    global openpyxl_available
+    if not openpyxl_available:
+        return None
+    try:
+        import openpyxl
+    except ImportError:
+        openpyxl_available = False
+        return None
+    return openpyxl
 
 try:
     import jpholiday
@@ -97,7 +118,8 @@ def validate_excel_data(data_source, pandas_available, job_id, jobs):
     warnings = []
     
     try:
-        if pandas_available:
+        pd = _import_pandas() if pandas_available else None
+        if pd is not None:
             # pandasを使用した検証
             if len(data_source) == 0:
                 errors.append("Excelファイルにデータが含まれていません")
@@ -333,80 +355,63 @@ def allowed_file(filename):
 
 # P1: ログの上限設定（メモリ最適化）。監査対応で500に短縮し単調増加を抑制
 MAX_JOB_LOGS = 500  # 最大ログ件数（1ジョブあたり）
-MAX_LOG_CHARS = 2000  # 1ログエントリの最大文字数
+MAX_LOG_CHARS = 2000  # 1ログエントリの最大文字数（lib.job_log_buffer.MAX_LOG_CHARS と同期）
 MAX_JOB_LOG_BYTES = 200 * 1024  # 最大ログサイズ（200KB、バイト単位）
 
-def add_job_log(job_id: str, message: str, jobs: dict):
+def create_job_log_buffer(entries=(), maxlen=None, total_count=None):
+    """ジョブ用のログバッファ（件数 MAX_JOB_LOGS・バイト数 MAX_JOB_LOG_BYTES 上限）を作る"""
+    return JobLogBuffer(entries, maxlen=maxlen or MAX_JOB_LOGS, max_bytes=MAX_JOB_LOG_BYTES, total_count=total_count)
+
+
+def add_job_log(job_id: str, message: str, jobs: dict, *args, level: Optional[str] = None):
     """
     ジョブのログを追加（P1: メモリ上限設定付き）
     
     Args:
         job_id: ジョブID
-        message: ログメッセージ
+        message: ログメッセージ（args を渡す場合は logging と同じ %-形式のテンプレート）
         jobs: ジョブ辞書
+        *args: テンプレートに埋め込む値（整形は読み出し時）
+        level: 'info' / 'warning' / 'error'。省略時は先頭の絵文字から推定する
     
     Note:
-        - collections.deque(maxlen=MAX_JOB_LOGS)を使用して固定長ログを実現
-        - ログサイズがMAX_JOB_LOG_BYTESを超えた場合、古いログから削除
+        - 時刻・引数・個人情報マスクは JobLogRecord として保持し、クライアントが読むときに 1 回だけ整形する
+        - JobLogBuffer が件数（MAX_JOB_LOGS）とバイト数（MAX_JOB_LOG_BYTES）の上限を保ち、
+          超過分は古いログから捨てる（合計バイト数を保持しているので追記は償却 O(1)）
         - JSON返却時はlist()に変換して互換性を維持
     """
     if job_id not in jobs:
         return
     
-    from collections import deque
+    if not isinstance(message, str):
+        message = str(message)
+    # P1: メッセージ長制限（マスク後の最終的な切り詰めは整形時に行う）
+    if len(message) > MAX_LOG_CHARS:
+        message = message[:MAX_LOG_CHARS - 3] + "..."
     
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    sanitized_message = sanitize_log_message(message)
+    log_entry = JobLogRecord(message, args, level)
     
-    # P1: メッセージ長制限
-    if len(sanitized_message) > MAX_LOG_CHARS:
-        sanitized_message = sanitized_message[:MAX_LOG_CHARS - 3] + "..."
+    logs = jobs[job_id].get('logs')
+    # JobLogBuffer でない場合は変換（既存データ・素の deque / list との互換性）
+    if not isinstance(logs, JobLogBuffer):
+        logs = create_job_log_buffer(
+            logs or (),
+            maxlen=getattr(logs, 'maxlen', None),
+            total_count=getattr(jobs[job_id], 'log_count', None),
+        )
+        jobs[job_id]['logs'] = logs
     
-    log_entry = f"[{timestamp}] {sanitized_message}"
-    
-    # P1: dequeを使用して固定長ログを実現（効率的なメモリ管理）
-    if 'logs' not in jobs[job_id]:
-        jobs[job_id]['logs'] = deque(maxlen=MAX_JOB_LOGS)
-    
-    # dequeでない場合は変換（既存データの互換性）
-    if not isinstance(jobs[job_id]['logs'], deque):
-        jobs[job_id]['logs'] = deque(jobs[job_id]['logs'], maxlen=MAX_JOB_LOGS)
-    
-    # ログを追加（maxlenにより自動的に古いログが削除される）
-    jobs[job_id]['logs'].append(log_entry)
-    
-    # P1: ログサイズ制限（バイト単位）
-    # ログサイズが上限を超えた場合、古いログから削除
-    total_bytes = sum(len(log.encode('utf-8')) for log in jobs[job_id]['logs'])
-    if total_bytes > MAX_JOB_LOG_BYTES:
-        # 古いログから削除（末尾のみ保持）
-        logs_list = list(jobs[job_id]['logs'])
-        current_bytes = 0
-        keep_logs = []
-        
-        # 末尾から逆順に追加（新しいログを優先）
-        for log in reversed(logs_list):
-            log_bytes = len(log.encode('utf-8'))
-            if current_bytes + log_bytes <= MAX_JOB_LOG_BYTES:
-                keep_logs.insert(0, log)
-                current_bytes += log_bytes
-            else:
-                break
-        
-        jobs[job_id]['logs'] = deque(keep_logs, maxlen=MAX_JOB_LOGS)
+    # 上限を超えた分は古いログから自動的に削除される
+    logs.append(log_entry)
+
+    # app.py の JobTable なら通算ログ件数・version を進めて SSE 等へ通知する（素の dict では何もしない）
+    mark_changed = getattr(jobs, 'mark_changed', None)
+    if mark_changed is not None:
+        mark_changed(job_id, logs_appended=1)
 
 def sanitize_log_message(message):
-    """ログメッセージから個人情報を除去"""
-    # メールアドレスを除去
-    message = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[EMAIL]', message)
-    
-    # パスワードを除去
-    message = re.sub(r'password["\']?\s*[:=]\s*["\']?[^"\s]+["\']?', 'password="[PASSWORD]"', message, flags=re.IGNORECASE)
-    
-    # クレジットカード番号を除去
-    message = re.sub(r'\b\d{4}[- ]?\d{4}[- ]?\d{4}[- ]?\d{4}\b', '[CARD_NUMBER]', message)
-    
-    return message
+    """ログメッセージから個人情報を除去（パターンは lib.job_log_buffer で事前コンパイル済み）"""
+    return sanitize_log_text(message)
 
 def update_progress(job_id: str, step: int, step_name: str, jobs: dict, current_data: int = 0, total_data: int = 0):
     """ジョブの進捗を更新"""
@@ -442,9 +447,10 @@ def create_template_excel():
         print(f"サンプルデータ作成完了: {len(sample_data)}件")
         
         # テンプレートファイルを作成
-        if openpyxl_available:
+        openpyxl = _import_openpyxl()
+        if openpyxl is not None:
             print("openpyxlを使用してテンプレート作成")
-            wb = Workbook()
+            wb = openpyxl.Workbook()
             ws = wb.active
             ws.title = "勤怠データ"
             
@@ -527,9 +533,10 @@ def create_previous_month_template_excel():
         print(f"先月サンプルデータ作成完了: {len(sample_data)}件")
         
         # テンプレートファイルを作成
-        if openpyxl_available:
+        openpyxl = _import_openpyxl()
+        if openpyxl is not None:
             print("openpyxlを使用して先月テンプレート作成")
-            wb = Workbook()
+            wb = openpyxl.Workbook()
             ws = wb.active
             ws.title = "勤怠データ"
             
@@ -588,17 +595,17 @@ def create_previous_month_template_excel():
 def load_excel_data(file_path):
     """Excelファイルを読み込み"""
     try:
-        if pandas_available:
+        pd = _import_pandas()
+        openpyxl = _import_openpyxl() if pd is None else None
+        if pd is not None:
             # pandasを使用して読み込み
-            import pandas as pd
             data = pd.read_excel(file_path)
             # 有効なデータ行数をカウント（ヘッダー行を除く、空白行も除外）
             valid_rows = data.dropna(subset=['日付'], how='all').dropna(subset=['日付', '開始時刻', '終了時刻'], how='all')
             return data, len(valid_rows)
-        elif openpyxl_available:
+        elif openpyxl is not None:
             # openpyxlを使用して読み込み
-            from openpyxl import load_workbook
-            wb = load_workbook(file_path)
+            wb = openpyxl.load_workbook(file_path)
             ws = wb.active
             
             # 有効なデータ行数をカウント（ヘッダー行を除く、空白行も除外）